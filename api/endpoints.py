@@ -1,40 +1,61 @@
-from fastapi import APIRouter, HTTPException, status
+import json
+import asyncio
+from typing import Dict, List, Set, Union
+
+from fastapi import APIRouter, Depends, Header, HTTPException, status
+from fastapi import Request as HTTPRequest
 from fastapi.encoders import jsonable_encoder
-import httpx, asyncio
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from pydantic import ValidationError
 from models.request_models import Request, Submission
+from models.job_models import JobStage, JobAccepted, JobStatus
 from core.verifier import verify_secret
+from core.job_queue import Job, JobQueue, QueueFullError
+from core.idempotency import IdempotencyStore, idempotency_key
+from core.notifier import NotificationOutbox
+from core.container import ServiceContainer, get_builder, get_services
+from services.circuit_breaker import BreakerState
+from utils.attachment import AttachmentTooLargeError, check_attachment_limits
+from utils.config import get_settings
+from utils.metrics import get_metrics
 import logging
 
 router = APIRouter(prefix="", tags=["student-agent"])
 logger = logging.getLogger("llm_agent.api.endpoints")
 
-from core.builder import Builder
 
-@router.post("/build", status_code=status.HTTP_200_OK, response_model=Submission)
-async def build_endpoint(request: Request):
-    # 1️⃣ Verify secret
-    verify_secret(request.secret)
-    logger.info(f"✅ Build request accepted for project: {request.task}")
+async def process_build_job(job: Job) -> Submission:
+    """
+    Worker-side body of a /build request: run the pipeline, wait for Pages to go live,
+    then queue the evaluator notification.
+    """
+    request = job.request
+    builder = get_builder()
 
-    builder = Builder()
+    # 1️⃣ Handle round 1 vs round 2
+    with job.stage_timer(JobStage.BUILDING, "build"):
+        if request.round == 1:
+            result = await builder.run_full_pipeline(
+                task=request.task,
+                brief=request.brief,
+                checks=request.checks,
+                attachments=request.attachments,
+                bypass_cache=request.bypass_cache,
+            )
+        else:  # round 2
+            result = await builder.run_revision_pipeline(
+                task=request.task,
+                brief=request.brief,
+                checks=request.checks,
+                attachments=request.attachments,
+                bypass_cache=request.bypass_cache,
+            )
 
-    # 2️⃣ Handle round 1 vs round 2
-    if request.round == 1:
-        result = await builder.run_full_pipeline(
-            task=request.task,
-            brief=request.brief,
-            checks=request.checks,
-            attachments=request.attachments
-        )
-    else:  # round 2
-        result = await builder.run_revision_pipeline(
-            task=request.task,
-            brief=request.brief,
-            checks=request.checks,
-            attachments=request.attachments
-        )
+    output = result.get("build_output") or result.get("revision_output") or {}
+    if output.get("time_to_first_file") is not None:
+        job.timings["first_file"] = output["time_to_first_file"]
 
-    # 3️⃣ Prepare Submission object (type-safe)
+    # 2️⃣ Prepare Submission object (type-safe)
     eval_payload = Submission(
         email=request.email,
         task=request.task,
@@ -44,34 +65,312 @@ async def build_endpoint(request: Request):
         commit_sha=result["deployment"]["commit_sha"],
         pages_url=result["deployment"]["pages_url"]
     )
+    job.submission = eval_payload
+
+    # 3️⃣ Hold the notification until Pages actually serves this commit (bounded by PAGES_READY_TIMEOUT)
+    deployment = result["deployment"]
+    if request.evaluation_url and settings.PAGES_WAIT_ENABLED and deployment["pages_url"].startswith("http"):
+        with job.stage_timer(JobStage.PUBLISHING, "pages"):
+            pages = await builder.deployer.github.wait_for_pages(
+                deployment["repo_name"], deployment["commit_sha"], deployment["pages_url"]
+            )
+        if not pages.ready:
+            logger.warning(f"Notifying evaluator for {request.task} although Pages is not live yet: {pages.error}")
 
-    # 4️⃣ POST to evaluator URL with exponential backoff
+    # 4️⃣ Hand the submission to the durable outbox; delivery and retries happen in the background
     if request.evaluation_url:
-        delay = 1
-        notified = False
-        for attempt in range(9):
-            try:
-                async with httpx.AsyncClient() as client:
-                    payload_dict = jsonable_encoder(eval_payload) 
-                    response = await client.post(
-                        str(request.evaluation_url),
-                        json=payload_dict,
-                        headers={"Content-Type": "application/json"},
-                        timeout=10
-                    )
-                if response.status_code == 200:
-                    logger.info(f"✅ Notified evaluator successfully: {request.evaluation_url}")
-                    notified = True
-                    break
-                else:
-                    logger.warning(f"Evaluator responded {response.status_code}: {response.text}")
-            except Exception as e:
-                logger.warning(f"Attempt {attempt+1} failed to notify evaluator: {e}")
-            await asyncio.sleep(delay)
-            delay *= 2
-        if not notified:
-            logger.error(f"❌ Failed to notify evaluator after all attempts: {request.evaluation_url}")
+        with job.stage_timer(JobStage.NOTIFYING, "notify"):
+            await outbox.enqueue(str(request.evaluation_url), eval_payload)
     else:
         logger.warning("No evaluation_url provided; skipping notification")
 
     return eval_payload
+
+
+settings = get_settings()
+job_queue = JobQueue(
+    handler=process_build_job,
+    workers=settings.JOB_WORKERS,
+    maxsize=settings.JOB_QUEUE_MAXSIZE,
+    retention_seconds=settings.JOB_RETENTION_SECONDS,
+)
+idempotency = IdempotencyStore(ttl_seconds=settings.IDEMPOTENCY_TTL_SECONDS)
+outbox = NotificationOutbox.from_settings()
+
+
+def submit_or_attach(request: Request) -> Job:
+    """
+    Return the job already handling this (task, round, nonce), or queue a new one.
+    Raises HTTPException(503) if the queue is full.
+    """
+    key = idempotency_key(request)
+    existing = idempotency.get(key)
+    if existing is not None:
+        return existing
+
+    try:
+        job = job_queue.submit(request)
+    except QueueFullError as e:
+        logger.warning(f"Rejecting build for {request.task}: {e}")
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail=str(e))
+    idempotency.remember(key, job)
+    return job
+
+
+async def submit_or_wait(request: Request) -> Job:
+    """
+    Like `submit_or_attach`, but waits for queue space instead of answering 503.
+    """
+    key = idempotency_key(request)
+    existing = idempotency.get(key)
+    if existing is not None:
+        return existing
+    job = await job_queue.submit_wait(request)
+    idempotency.remember(key, job)
+    return job
+
+
+def parse_batch_body(body: bytes) -> List[Union[dict, str]]:
+    """
+    Split a /build/batch body into raw items: either a JSON array or NDJSON
+    (one request object per line). Unparseable lines become error strings so
+    the rest of the batch still runs. Raises ValueError if a JSON array body is malformed.
+    """
+    text = body.decode("utf-8").strip()
+    if text.startswith("["):
+        items = json.loads(text)
+    else:
+        items = []
+        for number, line in enumerate(text.splitlines(), start=1):
+            if not line.strip():
+                continue
+            try:
+                items.append(json.loads(line))
+            except json.JSONDecodeError as e:
+                items.append(f"Line {number} is not valid JSON: {e.msg}")
+    return [item if isinstance(item, (dict, str)) else "Batch items must be JSON objects" for item in items]
+
+
+def validate_batch_item(item: Union[dict, str]) -> Request:
+    """
+    Apply the same checks as /build to one batch item. Raises ValueError with
+    the reason the item was rejected.
+    """
+    if isinstance(item, str):
+        raise ValueError(item)
+    try:
+        request = Request.model_validate(item)
+    except ValidationError as e:
+        raise ValueError(f"Invalid request: {e.error_count()} validation error(s): {e.errors()[0]['msg']}")
+    try:
+        verify_secret(request.secret)
+    except HTTPException as e:
+        raise ValueError(e.detail)
+    check_attachment_limits([att.dict() for att in request.attachments])
+    return request
+
+
+# Batch submissions still waiting for queue space; held here so they finish after a client disconnects
+_batch_submissions: Set[asyncio.Task] = set()
+
+
+async def stream_batch_results(requests: List[Union[Request, str]]):
+    """
+    Queue every valid request (waiting for queue space as needed) and yield one
+    NDJSON line per item as soon as its job finishes. Rejected items are
+    reported first. If the client disconnects, only the result watchers stop:
+    items still waiting for queue space are submitted anyway and every job runs.
+    """
+    results: asyncio.Queue = asyncio.Queue()
+    jobs: Dict[str, asyncio.Task] = {}
+
+    async def run_item(index: int, request: Request, submitted: asyncio.Task) -> None:
+        try:
+            job = await asyncio.shield(submitted)
+            await job.wait()
+            line = {"index": index, **jsonable_encoder(job.to_status())}
+        except Exception as e:
+            line = {"index": index, "task": request.task, "stage": JobStage.FAILED.value, "error": repr(e)}
+        await results.put(line)
+
+    tasks = []
+    for index, request in enumerate(requests):
+        if isinstance(request, str):
+            yield json.dumps({"index": index, "stage": JobStage.FAILED.value, "error": request}) + "\n"
+            continue
+        # Duplicates inside one batch share a job, like retries of /build do
+        key = idempotency_key(request)
+        if key not in jobs:
+            jobs[key] = asyncio.create_task(submit_or_wait(request))
+            _batch_submissions.add(jobs[key])
+            jobs[key].add_done_callback(_batch_submissions.discard)
+        tasks.append(asyncio.create_task(run_item(index, request, jobs[key])))
+
+    try:
+        for _ in range(len(tasks)):
+            yield json.dumps(await results.get()) + "\n"
+    finally:
+        for task in tasks:
+            task.cancel()
+
+
+@router.post(
+    "/build",
+    status_code=status.HTTP_202_ACCEPTED,
+    response_model=JobAccepted,
+    responses={status.HTTP_200_OK: {"model": Submission, "description": "Duplicate of a completed request"}},
+)
+async def build_endpoint(request: Request):
+    # Verify secret before anything is queued
+    verify_secret(request.secret)
+
+    # Reject oversized attachments up front instead of failing inside a worker
+    try:
+        check_attachment_limits([att.dict() for att in request.attachments])
+    except AttachmentTooLargeError as e:
+        raise HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail=str(e))
+
+    job = submit_or_attach(request)
+
+    # Duplicate of a finished build: hand back the stored Submission immediately
+    if job.stage == JobStage.COMPLETED and job.submission is not None:
+        return JSONResponse(status_code=status.HTTP_200_OK, content=jsonable_encoder(job.submission))
+
+    logger.info(f"✅ Build request accepted for project: {request.task} (job {job.id})")
+    return JobAccepted(job_id=job.id, stage=job.stage, status_url=f"/jobs/{job.id}")
+
+
+@router.post("/build/batch", response_class=StreamingResponse)
+async def build_batch_endpoint(http_request: HTTPRequest):
+    """
+    Queue many build requests at once, sent as a JSON array or NDJSON. Streams
+    back one NDJSON line per item (`index` plus the job status) as each finishes.
+    """
+    try:
+        items = parse_batch_body(await http_request.body())
+    except (UnicodeDecodeError, ValueError) as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Malformed batch body: {e}")
+    if not items:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Batch contains no requests.")
+    if len(items) > settings.BATCH_MAX_ITEMS:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"Batch has {len(items)} requests; the limit is {settings.BATCH_MAX_ITEMS}.",
+        )
+
+    requests: List[Union[Request, str]] = []
+    for item in items:
+        try:
+            requests.append(validate_batch_item(item))
+        except ValueError as e:
+            requests.append(str(e))
+
+    accepted = sum(isinstance(r, Request) for r in requests)
+    logger.info(f"📦 Batch of {len(requests)} request(s) received, {accepted} accepted")
+    return StreamingResponse(stream_batch_results(requests), media_type="application/x-ndjson")
+
+
+@router.get("/jobs/{job_id}", response_model=JobStatus)
+async def job_status_endpoint(job_id: str):
+    job = job_queue.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Job '{job_id}' not found.")
+    return job.to_status()
+
+
+@router.get("/internal/status", tags=["internal"])
+async def internal_status_endpoint(services: ServiceContainer = Depends(get_services)):
+    """
+    Operational snapshot: LLM provider breakers, hedging, response cache, GitHub
+    metadata cache, per-origin rate-limit budgets, job queue, pipeline stage limits,
+    Pages readiness polling, spare repo pool and notification outbox.
+    """
+    return {
+        "llm_providers": services.llm.breakers.status(),
+        "hedging": services.llm.hedging.stats(),
+        "llm_cache": services.llm.cache.stats(),
+        "github_cache": services.github.client.cache.stats(),
+        "rate_limits": services.http_pool.rate_limiter.status(),
+        "jobs": {"queued": job_queue.depth, "in_flight": job_queue.in_flight},
+        "stages": services.stage_limits.stats(),
+        "pages": services.github.pages_poller.stats(),
+        "repo_pool": services.github.repo_pool.stats(),
+        "notifications": await outbox.stats(),
+    }
+
+
+@router.get("/internal/notifications/dead", tags=["internal"])
+async def dead_letters_endpoint(limit: int = 50):
+    """Most recently dead-lettered evaluator notifications, with their last error."""
+    return {"dead": await outbox.dead_letters(limit=min(max(limit, 1), 500))}
+
+
+@router.post("/internal/notifications/{notification_id}/requeue", tags=["internal"])
+async def requeue_notification_endpoint(notification_id: int, x_student_secret: str = Header("")):
+    """Give a dead-lettered notification a fresh attempt budget. Requires the `X-Student-Secret` header."""
+    verify_secret(x_student_secret)
+    if not await outbox.requeue(notification_id):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"No dead-lettered notification with id {notification_id}.",
+        )
+    logger.info(f"📮 Requeued dead-lettered notification {notification_id}")
+    return {"id": notification_id, "status": "pending"}
+
+
+def _update_status_gauges(services: ServiceContainer, notifications: Dict[str, int]) -> None:
+    """Copy the current queue, stage, cache, breaker, rate-limit, Pages and outbox state into gauges."""
+    metrics = get_metrics()
+    metrics.gauge("jobs_queued", "Jobs waiting for a worker.").set(job_queue.depth)
+    metrics.gauge("jobs_in_flight", "Builds currently being processed.").set(job_queue.in_flight)
+
+    stage_slots = metrics.gauge("stage_slots", "Pipeline stage slots by state (limit, active, waiting).", ["stage", "state"])
+    for stage, stats in services.stage_limits.stats().items():
+        for state, value in stats.items():
+            stage_slots.set(value, stage=stage, state=state)
+
+    llm_cache = services.llm.cache.stats()
+    llm_lookups = metrics.gauge("llm_cache_lookups", "LLM response cache lookups since start, by result.", ["result"])
+    llm_lookups.set(llm_cache["hits"], result="hit")
+    llm_lookups.set(llm_cache["misses"], result="miss")
+    github_cache = services.github.client.cache.stats()
+    github_lookups = metrics.gauge("github_cache_lookups", "GitHub metadata cache lookups since start, by result.", ["result"])
+    for result in ("hits", "revalidated", "misses"):
+        github_lookups.set(github_cache[result], result=result.rstrip("s"))
+
+    hedging = services.llm.hedging.stats()
+    hedge = metrics.gauge("llm_hedge_requests", "Raced LLM requests since start (all, hedged, won by the hedge).", ["kind"])
+    hedge.set(hedging["requests"], kind="all")
+    hedge.set(hedging["hedged"], kind="hedged")
+    hedge.set(hedging["hedge_wins"], kind="hedge_won")
+
+    breaker_state = metrics.gauge("llm_breaker_state", "1 for the current circuit breaker state of each provider.", ["provider", "state"])
+    breaker_rejected = metrics.gauge("llm_breaker_rejected", "Calls rejected by an open breaker since start.", ["provider"])
+    for provider, status in services.llm.breakers.status().items():
+        for state in BreakerState:
+            breaker_state.set(1 if status["state"] == state.value else 0, provider=provider, state=state.value)
+        breaker_rejected.set(status["rejected"], provider=provider)
+
+    remaining = metrics.gauge("rate_limit_remaining", "Requests left in the current rate-limit window.", ["origin"])
+    throttled = metrics.gauge("rate_limit_events", "Requests delayed by the local budget or answered 429/403 since start.", ["origin", "kind"])
+    for origin, budget in services.http_pool.rate_limiter.status().items():
+        if budget["remaining"] is not None:
+            remaining.set(budget["remaining"], origin=origin)
+        throttled.set(budget["throttled"], origin=origin, kind="throttled")
+        throttled.set(budget["rate_limited"], origin=origin, kind="rate_limited")
+
+    metrics.gauge("pages_watching", "Deploys waiting for GitHub Pages to go live.").set(services.github.pages_poller.stats()["watching"])
+    metrics.gauge("repo_pool_ready", "Spare repositories ready to be claimed.").set(services.github.repo_pool.stats()["ready"])
+    outbox_gauge = metrics.gauge("notifications", "Evaluator notifications in the outbox, by status.", ["status"])
+    for notification_status, count in notifications.items():
+        outbox_gauge.set(count, status=notification_status)
+
+
+@router.get("/metrics", tags=["internal"])
+async def metrics_endpoint(services: ServiceContainer = Depends(get_services)):
+    """
+    Prometheus text exposition: per-stage latency histograms, LLM and GitHub call
+    latencies, prompt/response sizes, fallbacks, and the queue and service gauges.
+    """
+    _update_status_gauges(services, await outbox.stats())
+    return PlainTextResponse(get_metrics().render(), media_type="text/plain; version=0.0.4; charset=utf-8")
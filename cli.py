@@ -0,0 +1,56 @@
+"""
+Command-line client for the agent API.
+
+    python cli.py batch requests.ndjson --url http://localhost:8000
+
+Sends a JSON array or NDJSON file of build requests to /build/batch and prints
+each result line as the server streams it back.
+"""
+import sys
+import json
+import argparse
+
+import httpx
+
+
+def run_batch(path: str, url: str, timeout: float) -> int:
+    with open(path, "rb") as fh:
+        body = fh.read()
+
+    failed = 0
+    # Builds take minutes; only the connect step gets a short timeout
+    timeouts = httpx.Timeout(timeout, connect=10.0, read=None)
+    with httpx.Client(base_url=url, timeout=timeouts) as client:
+        with client.stream(
+            "POST", "/build/batch", content=body, headers={"Content-Type": "application/x-ndjson"}
+        ) as response:
+            if response.status_code != 200:
+                response.read()
+                print(f"❌ Batch rejected ({response.status_code}): {response.text}", file=sys.stderr)
+                return 1
+            for line in response.iter_lines():
+                if not line.strip():
+                    continue
+                print(line, flush=True)
+                if json.loads(line).get("stage") != "completed":
+                    failed += 1
+    return 1 if failed else 0
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="LLM Student Agent client")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    batch = commands.add_parser("batch", help="Submit many build requests and stream their results")
+    batch.add_argument("file", help="JSON array or NDJSON file of build requests")
+    batch.add_argument("--url", default="http://localhost:8000", help="Base URL of the agent API")
+    batch.add_argument("--timeout", type=float, default=30.0, help="Write/pool timeout in seconds")
+
+    args = parser.parse_args(argv)
+    if args.command == "batch":
+        return run_batch(args.file, args.url, args.timeout)
+    return 2
+
+
+if __name__ == "__main__":
+    sys.exit(main())
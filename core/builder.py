@@ -1,7 +1,10 @@
 import logging
+from typing import Optional
 from core.generator import CodeGenerator
 from core.reviser import Reviser
 from core.deployer import Deployer
+from core.stage_limits import StageLimits, get_stage_limits
+from utils.metrics import time_stage
 
 logger = logging.getLogger("llm_agent.core.builder")
 
@@ -9,13 +12,22 @@ logger = logging.getLogger("llm_agent.core.builder")
 class Builder:
     """
     Full Build → Deploy → Notify orchestrator.
+    The LLM and GitHub steps each run under their own stage concurrency limit.
     """
 
-    def __init__(self):
-        self.generator = CodeGenerator()
-        self.deployer = Deployer()
+    def __init__(
+        self,
+        limits: Optional[StageLimits] = None,
+        generator: Optional[CodeGenerator] = None,
+        reviser: Optional[Reviser] = None,
+        deployer: Optional[Deployer] = None,
+    ):
+        self.generator = generator or CodeGenerator()
+        self.deployer = deployer or Deployer()
+        self.reviser = reviser or Reviser(llm_service=self.generator.llm_service, github=self.deployer.github)
+        self.limits = limits or get_stage_limits()
 
-    async def run_full_pipeline(self, task, brief, checks, attachments):
+    async def run_full_pipeline(self, task, brief, checks, attachments, bypass_cache=False):
         """
         Step 1. Generate project code
         Step 2. Deploy to GitHub
@@ -23,8 +35,12 @@ class Builder:
         """
         logger.info(f"🧠 Running full build pipeline for {task}")
 
-        build_metadata = await self.generator.orchestrate_build(task, brief, checks, attachments)
-        deploy_metadata = await self.deployer.deploy_to_github(build_metadata)
+        async with self.limits.stage("llm"):
+            with time_stage("generate"):
+                build_metadata = await self.generator.orchestrate_build(task, brief, checks, attachments, bypass_cache)
+        async with self.limits.stage("github"):
+            with time_stage("deploy"):
+                deploy_metadata = await self.deployer.deploy_to_github(build_metadata)
 
         final = {
             "project": task,
@@ -35,7 +51,7 @@ class Builder:
         logger.info(f"🎯 Pipeline completed for {task}")
         return final
     
-    async def run_revision_pipeline(self, task, brief, checks, attachments):
+    async def run_revision_pipeline(self, task, brief, checks, attachments, bypass_cache=False):
         """
         Step 1. Apply revision/refactor
         Step 2. Push changes to GitHub
@@ -43,14 +59,15 @@ class Builder:
         """
         logger.info(f"🔁 Running revision pipeline for {task}")
 
-        reviser = Reviser()
-        deployer = Deployer()
-
         # Step 1: Refactor code
-        revision_metadata = await reviser.apply_revision(task, brief, checks, attachments)
+        async with self.limits.stage("llm"):
+            with time_stage("revise"):
+                revision_metadata = await self.reviser.apply_revision(task, brief, checks, attachments, bypass_cache)
 
         # Step 2: Push updated files & redeploy Pages
-        deployment_metadata = await deployer.deploy_to_github(revision_metadata)
+        async with self.limits.stage("github"):
+            with time_stage("deploy"):
+                deployment_metadata = await self.deployer.deploy_to_github(revision_metadata)
 
         result = {
             "project": task,
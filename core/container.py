@@ -0,0 +1,81 @@
+import logging
+from dataclasses import dataclass
+from typing import Optional
+
+from core.builder import Builder
+from core.deployer import Deployer
+from core.generator import CodeGenerator
+from core.reviser import Reviser
+from core.stage_limits import StageLimits, get_stage_limits
+from services.github_service import GitHubService
+from services.http_clients import HTTPClientPool, get_http_pool
+from services.llm_service import LLMService
+from services.prompt_registry import PromptRegistry, get_prompt_registry
+
+logger = logging.getLogger("llm_agent.core.container")
+
+
+@dataclass
+class ServiceContainer:
+    """
+    The long-lived services a build needs, created once per process and shared
+    by every request and job worker. The HTTP pool, caches, breakers and
+    rate-limit budgets inside them therefore live as long as the app.
+    """
+    http_pool: HTTPClientPool
+    prompts: PromptRegistry
+    stage_limits: StageLimits
+    llm: LLMService
+    github: GitHubService
+    generator: CodeGenerator
+    reviser: Reviser
+    deployer: Deployer
+    builder: Builder
+
+    @classmethod
+    def create(cls, workspace_dir: str = "workspace") -> "ServiceContainer":
+        http_pool = get_http_pool()
+        prompts = get_prompt_registry()
+        stage_limits = get_stage_limits()
+        llm = LLMService(http_pool=http_pool, prompts=prompts)
+        github = GitHubService(http_pool=http_pool)
+        generator = CodeGenerator(workspace_dir, llm_service=llm)
+        reviser = Reviser(workspace_dir, llm_service=llm, github=github)
+        deployer = Deployer(github=github)
+        builder = Builder(stage_limits, generator=generator, reviser=reviser, deployer=deployer)
+        return cls(http_pool, prompts, stage_limits, llm, github, generator, reviser, deployer, builder)
+
+
+_container: Optional[ServiceContainer] = None
+
+
+def init_services() -> ServiceContainer:
+    """
+    Build the process-wide container (called at startup so configuration
+    errors such as a missing GITHUB_TOKEN surface before any request).
+    """
+    global _container
+    if _container is None:
+        _container = ServiceContainer.create()
+        logger.info("🧩 Service container initialised")
+    return _container
+
+
+def get_services() -> ServiceContainer:
+    """
+    FastAPI dependency returning the shared container, building it on first use.
+    """
+    return init_services()
+
+
+def get_builder() -> Builder:
+    """
+    FastAPI dependency returning the shared Builder.
+    """
+    return get_services().builder
+
+
+def reset_services() -> None:
+    """Drop the container so the next use rebuilds it (e.g. after shutdown)."""
+    global _container
+    _container = None
@@ -1,36 +1,52 @@
+import asyncio
 import logging
-from typing import Dict, Any
+from typing import Dict, Any, Optional
 from services.github_service import GitHubService
+from services.github_client import count_api_calls
+from utils.bundle import FileBundle
 
 logger = logging.getLogger("llm_agent.core.deployer")
 
 
+def repo_name_for(task: str) -> str:
+    """GitHub repository name used for a task."""
+    return task.strip().replace(" ", "-")
+
+
 class Deployer:
     """
     Handles deployment of generated project to GitHub Pages.
     """
 
-    def __init__(self):
-        self.github = GitHubService()
+    def __init__(self, github: Optional[GitHubService] = None):
+        self.github = github or GitHubService()
 
     async def deploy_to_github(self, metadata: Dict[str, Any]) -> Dict[str, Any]:
         """
         Deploy generated files to GitHub and enable Pages.
         """
-        repo_name = metadata["task"].strip().replace(" ", "-")
-        files = metadata["saved_files"]
+        repo_name = repo_name_for(metadata["task"])
+        # Commit the in-memory bundle; only older metadata without one is read back from disk
+        bundle = metadata.get("bundle")
+        if bundle is None:
+            bundle = await asyncio.to_thread(FileBundle.from_paths, metadata["saved_files"])
 
         logger.info(f"🚀 Starting deployment for {repo_name}...")
 
-        repo_url = await self.github.get_or_create_repo(repo_name)
-        commit_sha = self.github.upload_all_files_single_commit(repo_name, files)
-        pages_url = self.github.enable_pages(repo_name)
+        with count_api_calls() as api_calls:
+            repo_url = await self.github.get_or_create_repo(repo_name)
+            commit = await self.github.upload_bundle(repo_name, bundle)
+            pages_url = await self.github.enable_pages(repo_name)
 
         deployment_info = {
             "repo_name": repo_name,
-            "commit_sha": commit_sha,
+            "commit_sha": commit.sha,
             "repo_url": repo_url,
             "pages_url": pages_url,
+            "commit_api_calls": commit.api_calls,
+            "files_changed": commit.files_changed,
+            "commit_skipped": commit.skipped,
+            "api_calls": api_calls.total,
         }
 
         logger.info(f"✅ Deployment complete: {deployment_info}")
@@ -1,29 +1,60 @@
+import time
 import logging
 import asyncio
 from pathlib import Path
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional
 from models.request_models import Attachment
 from datetime import datetime
 from services.llm_service import LLMService
-from utils.attachment import copy_required_attachments
+from utils.attachment import decode_attachments, materialize_attachments, write_attachment_manifest
+from utils.bundle import FileBundle
+from utils.workspace import StreamingWorkspaceWriter, write_in_background
 
 logger = logging.getLogger("llm_agent.core.generator")
 
 
+async def bundle_files(files: Dict[str, str], decoded: List[dict]) -> FileBundle:
+    """
+    Final file set of a build/revision in memory: generated files plus attachment
+    bytes from the content-addressed store (attachments win on a name clash,
+    as they do in the workspace).
+    """
+    bundle = FileBundle().update(files)
+    if decoded:
+        contents = await asyncio.to_thread(lambda: [Path(att["path"]).read_bytes() for att in decoded])
+        for att, data in zip(decoded, contents):
+            bundle.add(att["name"], data)
+    return bundle
+
+
+async def sync_workspace(writer: StreamingWorkspaceWriter, files: Dict[str, str], decoded: List[dict], manifest_name: str) -> None:
+    """
+    Bring the workspace in line with the final files and link attachments into it.
+    Runs in the background; the deploy commits from the in-memory bundle.
+    """
+    await writer.finalize(files)
+    if decoded:
+        await asyncio.to_thread(materialize_attachments, writer.root, decoded)
+        await asyncio.to_thread(write_attachment_manifest, decoded, manifest_name)
+
+
 class CodeGenerator:
     """
     Coordinates LLM generation and output management.
     """
 
-    def __init__(self, workspace_dir: str = "workspace"):
+    def __init__(self, workspace_dir: str = "workspace", llm_service: Optional[LLMService] = None):
         self.workspace_dir = Path(workspace_dir)
-        self.llm_service = LLMService()
+        self.llm_service = llm_service or LLMService()
 
-    async def orchestrate_build(self, task: str, brief: str, checks: List[str], attachments: List[Attachment]) -> Dict[str, Any]:
+    async def orchestrate_build(
+        self, task: str, brief: str, checks: List[str], attachments: List[Attachment], bypass_cache: bool = False
+    ) -> Dict[str, Any]:
         """
         Orchestrate code generation:
-        - Calls LLMService
-        - Saves generated files under workspace/task_id/
+        - Calls LLMService (skipping its response cache if `bypass_cache` is set)
+        - Bundles the generated files (and attachments) in memory for the deployer
+        - Mirrors them under workspace/task_id/ in the background
         - Returns metadata about generated artifacts
         """
         logger.info(f"Starting code generation for task: {task}")
@@ -31,38 +62,34 @@ class CodeGenerator:
         output_dir = self.workspace_dir / task
         output_dir.mkdir(parents=True, exist_ok=True)
 
-        # Step 1: Generate files
-        generated_files = await self.llm_service.generate_code(task, brief, checks, attachments)
-
-
-        # Step 2: Save them locally
-        saved_files = []
-        for filename, content in generated_files.items():
-            file_path = output_dir / filename
-            file_path.write_text(content, encoding="utf-8")
-            saved_files.append(str(file_path))
-            logger.debug(f"Saved generated file: {file_path}")
-        
-        # ✅ Step 3: Copy relevant attachments
-        # extract names (Attachment model likely has .name)
-        attachment_names = [a.name for a in attachments if getattr(a, "name", None)]
-        if attachment_names:
-            logger.info(f"Copying {len(attachment_names)} attachment(s) into workspace for task {task}")
-            try:
-                copy_required_attachments(output_dir, attachment_names)
-                # Add copied attachments to the list of files to commit
-                for name in attachment_names:
-                    attachment_path = output_dir / name
-                    if attachment_path.exists():
-                        saved_files.append(str(attachment_path))
-            except Exception as e:
-                logger.error(f"Attachment copy failed: {e}")
+        # Decode attachments once into the content-addressed store
+        decoded = await asyncio.to_thread(decode_attachments, [a.dict() for a in attachments])
+
+        # Step 1: Generate files; when streaming, each one is written as soon as it is complete
+        writer = StreamingWorkspaceWriter(output_dir)
+        generated_files = await self.llm_service.generate_code(
+            task, brief, checks, attachments, bypass_cache=bypass_cache,
+            on_file=writer.on_file, decoded_attachments=decoded,
+        )
+        generation_seconds = round(time.perf_counter() - writer.started_at, 3)
+
+        # Step 2: Keep the final files in memory; the deployer commits straight from the bundle
+        bundle = await bundle_files(generated_files, decoded)
+        saved_files = [str(output_dir / name) for name in bundle.files]
+
+        # Step 3: Reconcile the workspace and link attachments in the background (it is only a cache)
+        write_in_background(output_dir, sync_workspace(writer, generated_files, decoded, f"{task}-build"))
 
         metadata = {
             "task": task,
             "saved_files": saved_files,
+            "bundle": bundle,
             "timestamp": datetime.utcnow().isoformat(),
             "output_dir": str(output_dir.resolve()),
+            "time_to_first_file": writer.time_to_first_file,
+            "generation_seconds": generation_seconds,
+            "attachments": {att["name"]: att["sha256"] for att in decoded},
+            "prompt": self.llm_service.last_prompt.report() if self.llm_service.last_prompt else None,
         }
 
         logger.info(f"Generation completed for {task}, {len(saved_files)} files created.")
@@ -0,0 +1,53 @@
+import logging
+from datetime import datetime
+from typing import Dict, Optional, Tuple
+
+from models.request_models import Request
+from models.job_models import JobStage
+from core.job_queue import Job
+
+logger = logging.getLogger("llm_agent.core.idempotency")
+
+IdempotencyKey = Tuple[str, int, str]
+
+
+def idempotency_key(request: Request) -> IdempotencyKey:
+    """Evaluator retries reuse the same (task, round, nonce)."""
+    return (request.task, request.round, request.nonce)
+
+
+class IdempotencyStore:
+    """
+    Remembers which job owns each (task, round, nonce) so duplicate POSTs attach
+    to the in-flight job or get its stored Submission instead of starting a new build.
+    Failed jobs are forgotten so a retry after a failure runs again.
+    """
+
+    def __init__(self, ttl_seconds: int = 86400):
+        self.ttl_seconds = ttl_seconds
+        self._jobs: Dict[IdempotencyKey, Job] = {}
+        self.duplicates = 0
+
+    def get(self, key: IdempotencyKey) -> Optional[Job]:
+        self._prune()
+        job = self._jobs.get(key)
+        if job is None:
+            return None
+        if job.stage == JobStage.FAILED:
+            del self._jobs[key]
+            return None
+        self.duplicates += 1
+        logger.info(f"♻️ Duplicate request for {key} matched job {job.id} ({job.stage.value})")
+        return job
+
+    def remember(self, key: IdempotencyKey, job: Job) -> None:
+        self._jobs[key] = job
+
+    def _prune(self) -> None:
+        now = datetime.utcnow()
+        expired = [
+            key for key, job in self._jobs.items()
+            if job.done and job.finished_at and (now - job.finished_at).total_seconds() > self.ttl_seconds
+        ]
+        for key in expired:
+            del self._jobs[key]
@@ -0,0 +1,189 @@
+import time
+import uuid
+import asyncio
+import logging
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Awaitable, Callable, Dict, List, Optional
+
+from models.request_models import Request, Submission
+from models.job_models import JobStage, JobStatus
+from utils.metrics import STAGE_SECONDS, get_metrics
+
+logger = logging.getLogger("llm_agent.core.job_queue")
+
+_jobs_total = get_metrics().counter("jobs_total", "Jobs finished by the queue workers.", ["outcome"])
+
+
+class QueueFullError(Exception):
+    """Raised when the job queue cannot accept more work."""
+
+
+@dataclass
+class Job:
+    """
+    A single /build request travelling through the queue.
+    """
+    request: Request
+    id: str = field(default_factory=lambda: uuid.uuid4().hex)
+    stage: JobStage = JobStage.QUEUED
+    created_at: datetime = field(default_factory=datetime.utcnow)
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    timings: Dict[str, float] = field(default_factory=dict)
+    submission: Optional[Submission] = None
+    error: Optional[str] = None
+    _finished: asyncio.Event = field(default_factory=asyncio.Event, repr=False)
+
+    @property
+    def done(self) -> bool:
+        return self.stage in (JobStage.COMPLETED, JobStage.FAILED)
+
+    async def wait(self) -> "Job":
+        """Block until the job has completed or failed."""
+        await self._finished.wait()
+        return self
+
+    @contextmanager
+    def stage_timer(self, stage: JobStage, name: str):
+        """
+        Move the job into `stage` and record the seconds spent under `timings[name]`
+        (also exported as `stage_duration_seconds{stage=name}`).
+        """
+        self.stage = stage
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            self.timings[name] = round(elapsed, 3)
+            STAGE_SECONDS.observe(elapsed, stage=name)
+
+    def to_status(self) -> JobStatus:
+        return JobStatus(
+            job_id=self.id,
+            task=self.request.task,
+            round=self.request.round,
+            stage=self.stage,
+            created_at=self.created_at,
+            started_at=self.started_at,
+            finished_at=self.finished_at,
+            timings=self.timings,
+            submission=self.submission,
+            error=self.error,
+        )
+
+
+JobHandler = Callable[[Job], Awaitable[Submission]]
+
+
+class JobQueue:
+    """
+    In-process FIFO of build jobs drained by a bounded pool of worker tasks.
+    Finished jobs are kept for `retention_seconds` so their status can be polled.
+    """
+
+    def __init__(self, handler: JobHandler, workers: int = 4, maxsize: int = 100, retention_seconds: int = 3600):
+        self.handler = handler
+        self.worker_count = max(1, workers)
+        self.retention_seconds = retention_seconds
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=maxsize)
+        self._jobs: Dict[str, Job] = {}
+        self._workers: List[asyncio.Task] = []
+        self._in_flight = 0
+
+    @property
+    def depth(self) -> int:
+        """Number of jobs waiting for a worker."""
+        return self._queue.qsize()
+
+    @property
+    def in_flight(self) -> int:
+        """Number of jobs currently being processed."""
+        return self._in_flight
+
+    async def start(self) -> None:
+        if self._workers:
+            return
+        self._workers = [
+            asyncio.create_task(self._worker(i), name=f"job-worker-{i}")
+            for i in range(self.worker_count)
+        ]
+        logger.info(f"🧵 Job queue started with {self.worker_count} worker(s)")
+
+    async def stop(self) -> None:
+        for task in self._workers:
+            task.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+        logger.info("🧵 Job queue stopped")
+
+    def submit(self, request: Request) -> Job:
+        """
+        Queue a request for processing and return its Job immediately.
+        Raises QueueFullError if the queue is at capacity.
+        """
+        self._prune()
+        job = Job(request=request)
+        try:
+            self._queue.put_nowait(job)
+        except asyncio.QueueFull:
+            raise QueueFullError(f"Job queue is full ({self._queue.maxsize} pending)")
+        return self._track(job)
+
+    async def submit_wait(self, request: Request) -> Job:
+        """
+        Like `submit`, but waits for space instead of failing when the queue is full.
+        Used by batch submissions, which apply backpressure rather than reject items.
+        """
+        self._prune()
+        job = Job(request=request)
+        await self._queue.put(job)
+        return self._track(job)
+
+    def _track(self, job: Job) -> Job:
+        self._jobs[job.id] = job
+        logger.info(f"📥 Queued job {job.id} for {job.request.task} (round {job.request.round}), depth={self.depth}")
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        return self._jobs.get(job_id)
+
+    async def _worker(self, index: int) -> None:
+        while True:
+            job = await self._queue.get()
+            self._in_flight += 1
+            job.started_at = datetime.utcnow()
+            STAGE_SECONDS.observe((job.started_at - job.created_at).total_seconds(), stage="queue_wait")
+            start = time.perf_counter()
+            try:
+                job.submission = await self.handler(job)
+                job.stage = JobStage.COMPLETED
+                logger.info(f"✅ Job {job.id} completed for {job.request.task}")
+            except asyncio.CancelledError:
+                job.stage = JobStage.FAILED
+                job.error = "Job cancelled during shutdown"
+                raise
+            except Exception as e:
+                job.stage = JobStage.FAILED
+                job.error = repr(e)
+                logger.exception(f"❌ Job {job.id} failed for {job.request.task}: {e}")
+            finally:
+                job.finished_at = datetime.utcnow()
+                job.timings["total"] = round(time.perf_counter() - start, 3)
+                STAGE_SECONDS.observe(job.timings["total"], stage="job")
+                _jobs_total.inc(outcome="completed" if job.stage == JobStage.COMPLETED else "failed")
+                job._finished.set()
+                self._in_flight -= 1
+                self._queue.task_done()
+
+    def _prune(self) -> None:
+        """Drop finished jobs older than the retention window."""
+        now = datetime.utcnow()
+        expired = [
+            job_id for job_id, job in self._jobs.items()
+            if job.done and job.finished_at and (now - job.finished_at).total_seconds() > self.retention_seconds
+        ]
+        for job_id in expired:
+            del self._jobs[job_id]
@@ -0,0 +1,304 @@
+import json
+import time
+import random
+import asyncio
+import logging
+import sqlite3
+import threading
+from collections import defaultdict
+from pathlib import Path
+from typing import Dict, List, Optional
+from urllib.parse import urlsplit
+
+from fastapi.encoders import jsonable_encoder
+from models.request_models import Submission
+from services.http_clients import HTTPClientPool, get_http_pool
+from utils.config import get_settings
+from utils.metrics import get_metrics
+
+logger = logging.getLogger("llm_agent.core.notifier")
+
+PENDING = "pending"
+DELIVERING = "delivering"
+DELIVERED = "delivered"
+DEAD = "dead"
+
+_attempt_seconds = get_metrics().histogram(
+    "notification_attempt_duration_seconds", "Evaluator notification POSTs by outcome.", ["outcome"]
+)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS notifications (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    dedupe_key TEXT UNIQUE,
+    url TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    status TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_attempt_at REAL NOT NULL,
+    last_error TEXT,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS notifications_due ON notifications (status, next_attempt_at);
+"""
+
+
+class NotificationOutbox:
+    """
+    Durable outbox for evaluator notifications, backed by SQLite.
+
+    `enqueue` persists the Submission and returns immediately; a background
+    dispatcher delivers due rows with the pooled HTTP client. Failed attempts
+    are rescheduled with jittered exponential backoff and rows that exhaust
+    `max_attempts` are kept as dead letters. Deliveries are capped at
+    `workers` overall and `per_host_limit` per evaluator host. Rows left
+    mid-delivery by a crash are picked up again on start.
+    """
+
+    def __init__(
+        self,
+        db_path: str = "data/outbox.db",
+        workers: int = 8,
+        per_host_limit: int = 2,
+        max_attempts: int = 9,
+        base_delay: float = 1.0,
+        max_delay: float = 300.0,
+        timeout: float = 10.0,
+        http_pool: Optional[HTTPClientPool] = None,
+    ):
+        self.db_path = Path(db_path)
+        self.workers = max(1, workers)
+        self.per_host_limit = max(1, per_host_limit)
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.timeout = timeout
+        self.http_pool = http_pool
+        self._conn: Optional[sqlite3.Connection] = None
+        self._db_lock = threading.Lock()
+        self._wakeup: Optional[asyncio.Event] = None
+        self._dispatcher: Optional[asyncio.Task] = None
+        self._deliveries: Dict[int, asyncio.Task] = {}
+        self._host_inflight: Dict[str, int] = defaultdict(int)
+
+    @classmethod
+    def from_settings(cls) -> "NotificationOutbox":
+        settings = get_settings()
+        return cls(
+            db_path=settings.OUTBOX_DB_PATH,
+            workers=settings.OUTBOX_WORKERS,
+            per_host_limit=settings.OUTBOX_PER_HOST_LIMIT,
+            max_attempts=settings.OUTBOX_MAX_ATTEMPTS,
+            base_delay=settings.OUTBOX_BASE_DELAY,
+            max_delay=settings.OUTBOX_MAX_DELAY,
+        )
+
+    # --- storage (runs in a worker thread) ---
+
+    def _db(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self.db_path.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(str(self.db_path), check_same_thread=False, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(_SCHEMA)
+            self._conn = conn
+        return self._conn
+
+    def _execute(self, sql: str, params=()):
+        with self._db_lock:
+            cursor = self._db().execute(sql, params)
+            return cursor.fetchall(), cursor.rowcount
+
+    async def _query(self, sql: str, params=()) -> List[sqlite3.Row]:
+        rows, _ = await asyncio.to_thread(self._execute, sql, params)
+        return rows
+
+    async def _write(self, sql: str, params=()) -> int:
+        """Run a write statement and return the number of rows it changed."""
+        _, count = await asyncio.to_thread(self._execute, sql, params)
+        return count
+
+    # --- public API ---
+
+    async def enqueue(self, url: str, submission: Submission) -> None:
+        """
+        Persist a notification for delivery. Re-enqueueing the same
+        (task, round, nonce) is a no-op, so retried builds notify once.
+        """
+        payload = json.dumps(jsonable_encoder(submission))
+        now = time.time()
+        key = f"{submission.task}:{submission.round}:{submission.nonce}:{url}"
+        await self._write(
+            "INSERT OR IGNORE INTO notifications (dedupe_key, url, payload, status, next_attempt_at, created_at, updated_at) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (key, url, payload, PENDING, now, now, now),
+        )
+        logger.info(f"📮 Queued evaluator notification for {submission.task} (round {submission.round}) -> {url}")
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    async def start(self) -> None:
+        if self._dispatcher is not None:
+            return
+        recovered = await self._write(
+            "UPDATE notifications SET status = ? WHERE status = ?", (PENDING, DELIVERING)
+        )
+        if recovered:
+            logger.info(f"📮 Recovered {recovered} notification(s) interrupted by a restart")
+        self._wakeup = asyncio.Event()
+        self._dispatcher = asyncio.create_task(self._dispatch_loop(), name="outbox-dispatcher")
+        logger.info("📮 Notification outbox started")
+
+    async def stop(self) -> None:
+        tasks = [t for t in (self._dispatcher, *self._deliveries.values()) if t is not None]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._dispatcher = None
+        self._deliveries.clear()
+        # Anything cancelled mid-delivery is retried on the next start
+        await self._write("UPDATE notifications SET status = ? WHERE status = ?", (PENDING, DELIVERING))
+        with self._db_lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+        logger.info("📮 Notification outbox stopped")
+
+    async def stats(self) -> Dict[str, int]:
+        rows = await self._query("SELECT status, COUNT(*) AS n FROM notifications GROUP BY status")
+        counts = {PENDING: 0, DELIVERING: 0, DELIVERED: 0, DEAD: 0}
+        counts.update({row["status"]: row["n"] for row in rows})
+        return counts
+
+    async def dead_letters(self, limit: int = 50) -> List[Dict]:
+        rows = await self._query(
+            "SELECT id, url, attempts, last_error, updated_at FROM notifications WHERE status = ? "
+            "ORDER BY updated_at DESC LIMIT ?",
+            (DEAD, limit),
+        )
+        return [dict(row) for row in rows]
+
+    async def requeue(self, notification_id: int) -> bool:
+        """Move a dead letter back to pending with a fresh attempt budget."""
+        changed = await self._write(
+            "UPDATE notifications SET status = ?, attempts = 0, next_attempt_at = ?, updated_at = ? "
+            "WHERE id = ? AND status = ?",
+            (PENDING, time.time(), time.time(), notification_id, DEAD),
+        )
+        if changed and self._wakeup is not None:
+            self._wakeup.set()
+        return bool(changed)
+
+    # --- delivery ---
+
+    def _backoff(self, attempts: int) -> float:
+        """Exponential backoff with equal jitter: half fixed, half random."""
+        delay = min(self.max_delay, self.base_delay * (2 ** (attempts - 1)))
+        return delay / 2 + random.uniform(0, delay / 2)
+
+    async def _dispatch_loop(self) -> None:
+        while True:
+            self._wakeup.clear()
+            try:
+                next_due = await self._dispatch_due()
+            except Exception as e:
+                logger.exception(f"Outbox dispatch failed: {e}")
+                next_due = time.time() + self.base_delay
+            now = time.time()
+            if next_due is None or (next_due <= now and self._deliveries):
+                # Overdue rows are only held back by the worker/per-host limits, and every
+                # finishing delivery sets _wakeup, so there is nothing to poll for
+                timeout = None
+            else:
+                timeout = max(0.05, next_due - now)
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=timeout)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _dispatch_due(self) -> Optional[float]:
+        """
+        Start deliveries for due rows within the concurrency limits; return when the next row is due.
+        Due rows are read a page at a time, past any held back by `per_host_limit`, so one
+        saturated host cannot keep other hosts' rows waiting while workers are free.
+        """
+        now = time.time()
+        after = (-1.0, 0)  # (next_attempt_at, id) of the last row seen
+        while len(self._deliveries) < self.workers:
+            rows = await self._query(
+                "SELECT id, url, payload, attempts, next_attempt_at FROM notifications "
+                "WHERE status = ? AND next_attempt_at <= ? AND (next_attempt_at, id) > (?, ?) "
+                "ORDER BY next_attempt_at, id LIMIT ?",
+                (PENDING, now, *after, (self.workers - len(self._deliveries)) * 4),
+            )
+            if not rows:
+                break
+            after = (rows[-1]["next_attempt_at"], rows[-1]["id"])
+            for row in rows:
+                if len(self._deliveries) >= self.workers:
+                    break
+                host = urlsplit(row["url"]).netloc.lower()
+                if row["id"] in self._deliveries or self._host_inflight[host] >= self.per_host_limit:
+                    continue
+                await self._write(
+                    "UPDATE notifications SET status = ?, updated_at = ? WHERE id = ?",
+                    (DELIVERING, time.time(), row["id"]),
+                )
+                self._host_inflight[host] += 1
+                self._deliveries[row["id"]] = asyncio.create_task(self._deliver(dict(row), host))
+
+        rows = await self._query(
+            "SELECT MIN(next_attempt_at) AS due FROM notifications WHERE status = ?", (PENDING,)
+        )
+        return rows[0]["due"] if rows else None
+
+    async def _deliver(self, row: Dict, host: str) -> None:
+        try:
+            await self._attempt(row)
+        finally:
+            self._host_inflight[host] -= 1
+            self._deliveries.pop(row["id"], None)
+            if self._wakeup is not None:
+                self._wakeup.set()
+
+    async def _attempt(self, row: Dict) -> None:
+        """POST one notification and record the outcome (delivered, rescheduled or dead)."""
+        url = row["url"]
+        attempts = row["attempts"] + 1
+        start = time.perf_counter()
+        try:
+            client = (self.http_pool or get_http_pool()).client_for(url)
+            response = await client.post(
+                url,
+                content=row["payload"],
+                headers={"Content-Type": "application/json"},
+                timeout=self.timeout,
+            )
+            error = None if response.status_code == 200 else f"HTTP {response.status_code}: {response.text[:200]}"
+        except Exception as e:
+            error = repr(e)
+        _attempt_seconds.observe(time.perf_counter() - start, outcome="delivered" if error is None else "failed")
+
+        now = time.time()
+        if error is None:
+            await self._write(
+                "UPDATE notifications SET status = ?, attempts = ?, last_error = NULL, updated_at = ? WHERE id = ?",
+                (DELIVERED, attempts, now, row["id"]),
+            )
+            logger.info(f"✅ Notified evaluator successfully: {url}")
+        elif attempts >= self.max_attempts:
+            await self._write(
+                "UPDATE notifications SET status = ?, attempts = ?, last_error = ?, updated_at = ? WHERE id = ?",
+                (DEAD, attempts, error, now, row["id"]),
+            )
+            logger.error(f"❌ Failed to notify evaluator after {attempts} attempts, dead-lettered: {url} ({error})")
+        else:
+            delay = self._backoff(attempts)
+            await self._write(
+                "UPDATE notifications SET status = ?, attempts = ?, last_error = ?, next_attempt_at = ?, updated_at = ? "
+                "WHERE id = ?",
+                (PENDING, attempts, error, now + delay, now, row["id"]),
+            )
+            logger.warning(f"Attempt {attempts} failed to notify evaluator ({error}); retrying in {delay:.1f}s")
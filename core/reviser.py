@@ -1,9 +1,19 @@
+import time
+import asyncio
 import logging
-from typing import List
+from typing import Dict, List, Optional, Set, Tuple
 from pathlib import Path
 from services.llm_service import LLMService
 from models import Attachment
-from utils.attachment import copy_required_attachments
+from core.deployer import repo_name_for
+from core.generator import bundle_files, sync_workspace
+from services.github_client import GitHubAPIError
+from services.github_service import GitHubService
+from utils.attachment import decode_attachments, read_attachment_manifest
+from utils.workspace import StreamingWorkspaceWriter, wait_for_workspace, write_in_background, write_workspace_files
+from utils.patcher import PatchError, apply_edits, parse_edits
+from utils.config import get_settings
+from utils.metrics import LLM_FALLBACKS, time_stage
 
 logger = logging.getLogger("llm_agent.core.reviser")
 
@@ -13,50 +23,202 @@ class Reviser:
     Handles round 2 / revision requests.
     """
 
-    def __init__(self, workspace_dir: str = "workspace"):
+    def __init__(
+        self,
+        workspace_dir: str = "workspace",
+        mode: Optional[str] = None,
+        llm_service: Optional[LLMService] = None,
+        github: Optional[GitHubService] = None,
+    ):
         self.workspace_dir = Path(workspace_dir)
-        self.llm_service = LLMService()
+        self.llm_service = llm_service or LLMService()
+        self.mode = mode or get_settings().REVISION_MODE
+        self._github = github
 
-    async def apply_revision(self, task: str, brief: str, checks: List[str], attachments: List[Attachment]) -> dict:
+    @property
+    def github(self) -> GitHubService:
+        # Only needed to rehydrate a missing workspace, so created on first use
+        if self._github is None:
+            self._github = GitHubService()
+        return self._github
+
+    async def _load_existing(self, task: str, task_dir: Path) -> Dict[str, bytes]:
+        """
+        Current project files as bytes. Read from the workspace when it exists;
+        otherwise (e.g. after a restart on an ephemeral disk) fetched from the
+        task repo's HEAD and mirrored into the workspace in the background.
+        """
+        # The previous round may still be mirroring its files into the workspace
+        await wait_for_workspace(task_dir)
+        if task_dir.exists():
+            def read() -> Dict[str, bytes]:
+                return {
+                    fpath.name: fpath.read_bytes()
+                    for fpath in task_dir.iterdir()
+                    if fpath.is_file() and not fpath.name.startswith(".")
+                }
+            return await asyncio.to_thread(read)
+
+        repo_name = repo_name_for(task)
+        logger.info(f"📥 Workspace for {task} missing; rehydrating from GitHub repo {repo_name}")
+        start = time.perf_counter()
+        try:
+            with time_stage("rehydrate"):
+                commit_sha, bundle = await asyncio.wait_for(
+                    # LICENSE is added at deploy time, it is not part of the project sources
+                    self.github.fetch_snapshot(repo_name, exclude=("LICENSE",)),
+                    timeout=get_settings().REVISION_REHYDRATE_TIMEOUT,
+                )
+        except GitHubAPIError as e:
+            if e.status == 404:
+                raise FileNotFoundError(f"Workspace for task '{task}' not found and repo '{repo_name}' does not exist.")
+            raise
+        files = bundle.contents()
+        write_in_background(task_dir, asyncio.to_thread(write_workspace_files, task_dir, files))
+        logger.info(
+            f"📥 Rehydrated {len(files)} file(s) for {task} from {commit_sha[:7]} "
+            f"in {time.perf_counter() - start:.2f}s"
+        )
+        return files
+
+    async def _patch_files(
+        self,
+        existing_files: Dict[str, str],
+        task: str,
+        brief: str,
+        checks: List[str],
+        attachments: List[Attachment],
+        decoded: List[dict],
+        previous_attachments: Set[str],
+        bypass_cache: bool = False,
+    ) -> Optional[Tuple[Dict[str, str], List[str]]]:
         """
-        Load existing files from workspace, refactor them, and save.
+        Ask the model for edits and apply them locally.
+        Returns (changed files, files whose edits could not be applied),
+        or None if no edits could be obtained at all.
+        """
+        try:
+            response = await self.llm_service.patch_code(
+                existing_files, task, brief, checks, attachments, bypass_cache=bypass_cache,
+                decoded_attachments=decoded, attachment_names=previous_attachments,
+            )
+        except Exception as e:
+            logger.warning(f"Patch revision failed for {task}: {e!r}. Regenerating all files.")
+            LLM_FALLBACKS.inc(kind="patch_to_full")
+            return None
+
+        # Files the model only saw as outlines must not be rewritten from them
+        prompt = self.llm_service.last_prompt
+        outlined = prompt.outlined if prompt else set()
+
+        changed: Dict[str, str] = {}
+        failed: List[str] = []
+        with time_stage("parse"):
+            for filename, body in response.items():
+                try:
+                    edits = parse_edits(body)
+                except PatchError as e:
+                    logger.warning(f"Could not parse edits for {filename}: {e}")
+                    if filename in existing_files:
+                        failed.append(filename)
+                    continue
+                if edits is None:
+                    if filename in outlined:
+                        logger.warning(f"Rejecting full rewrite of {filename}, which the model only saw as an outline")
+                        failed.append(filename)
+                        continue
+                    # Full content: a new file
+                    if existing_files.get(filename) != body:
+                        changed[filename] = body
+                elif filename not in existing_files:
+                    logger.warning(f"Ignoring edits for unknown file {filename}")
+                else:
+                    try:
+                        patched = apply_edits(existing_files[filename], edits)
+                    except PatchError as e:
+                        logger.warning(f"Could not apply {len(edits)} edit(s) to {filename}: {e}")
+                        failed.append(filename)
+                        continue
+                    if patched != existing_files[filename]:
+                        changed[filename] = patched
+        if failed:
+            LLM_FALLBACKS.inc(len(failed), kind="patch_file_regenerated")
+        return changed, failed
+
+    async def apply_revision(
+        self, task: str, brief: str, checks: List[str], attachments: List[Attachment], bypass_cache: bool = False
+    ) -> dict:
+        """
+        Load existing files from workspace (or the task repo if the workspace is
+        gone), refactor them, and save.
+
+        In "patch" mode (REVISION_MODE) the model returns edits that are applied
+        locally; files whose edits fail are regenerated in full. If no edits come
+        back at all, every file is regenerated as in "full" mode.
+        `bypass_cache` makes every model call skip the LLM response cache.
         """
         task_dir = self.workspace_dir / task
-        if not task_dir.exists():
-            raise FileNotFoundError(f"Workspace for task '{task}' not found.")
 
-        # Load current files
+        # Load current text files; binaries (e.g. image attachments) cannot go into the prompt
         existing_files = {}
-        for fpath in task_dir.iterdir():
-            if fpath.is_file():
-                existing_files[fpath.name] = fpath.read_text(encoding="utf-8")
-
-        # Refactor via LLM
-        updated_files = await self.llm_service.refactor_code(existing_files, task, brief, checks, attachments)
-
-        # Save back updated files
-        saved_files = []
-        for fname, content in updated_files.items():
-            file_path = task_dir / fname
-            file_path.write_text(content, encoding="utf-8")
-            saved_files.append(str(file_path))
-            logger.debug(f"Refactored file saved: {file_path}")
-
-    # ✅ Step 4: Copy attachments into the workspace (if any)
-        attachment_names = [a.name for a in attachments if getattr(a, "name", None)]
-        if attachment_names:
+        for name, data in (await self._load_existing(task, task_dir)).items():
             try:
-                copy_required_attachments(task_dir, attachment_names)
-                for name in attachment_names:
-                    attachment_path = task_dir / name
-                    if attachment_path.exists():
-                        saved_files.append(str(attachment_path))
-                logger.info(f"Copied {len(attachment_names)} attachments for revision of {task}")
-            except Exception as e:
-                logger.error(f"Attachment copy failed during revision: {e}")
+                existing_files[name] = data.decode("utf-8")
+            except UnicodeDecodeError:
+                logger.info(f"Skipping binary workspace file for revision prompt: {name}")
+
+        # Attachments from earlier rounds are inputs, not code to refactor
+        previous_attachments = set(read_attachment_manifest(f"{task}-build")) | set(read_attachment_manifest(f"{task}-revision"))
+
+        # Decode attachments once into the content-addressed store
+        decoded = await asyncio.to_thread(decode_attachments, [a.dict() for a in attachments])
+
+        writer = StreamingWorkspaceWriter(task_dir)
+        patched: Dict[str, str] = {}
+        regenerate: List[str] = []
+        result = None
+        if self.mode == "patch":
+            result = await self._patch_files(
+                existing_files, task, brief, checks, attachments, decoded, previous_attachments, bypass_cache
+            )
+
+        if result is None:
+            # Full mode: refactor via LLM; when streaming, each file is saved as soon as it is complete
+            updated_files = await self.llm_service.refactor_code(
+                existing_files, task, brief, checks, attachments, bypass_cache=bypass_cache,
+                on_file=writer.on_file, decoded_attachments=decoded, attachment_names=previous_attachments,
+            )
+        else:
+            patched, regenerate = result
+            updated_files = dict(patched)
+            if regenerate:
+                # Only the files whose edits did not apply are regenerated in full
+                logger.info(f"Regenerating {len(regenerate)} file(s) in full for {task}: {regenerate}")
+                regenerated = await self.llm_service.refactor_code(
+                    {name: existing_files[name] for name in regenerate if name in existing_files},
+                    task, brief, checks, attachments, bypass_cache=bypass_cache,
+                    decoded_attachments=decoded, attachment_names=previous_attachments,
+                )
+                updated_files.update({name: regenerated[name] for name in regenerate if name in regenerated})
+            logger.info(f"🩹 Patched {len(patched)} file(s) for {task}")
+
+        generation_seconds = round(time.perf_counter() - writer.started_at, 3)
+        bundle = await bundle_files(updated_files, decoded)
+        saved_files = [str(task_dir / name) for name in bundle.files]
+
+        # ✅ Step 4: Update the workspace and link attachments in the background
+        write_in_background(task_dir, sync_workspace(writer, updated_files, decoded, f"{task}-revision"))
 
         return {
             "task": task,
             "saved_files": saved_files,
+            "bundle": bundle,
             "output_dir": str(task_dir.resolve()),
+            "time_to_first_file": writer.time_to_first_file,
+            "generation_seconds": generation_seconds,
+            "revision_mode": "patch" if result is not None else "full",
+            "patched_files": sorted(patched),
+            "regenerated_files": regenerate,
+            "attachments": {att["name"]: att["sha256"] for att in decoded},
+            "prompt": self.llm_service.last_prompt.report() if self.llm_service.last_prompt else None,
         }
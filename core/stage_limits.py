@@ -0,0 +1,78 @@
+import time
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+from typing import Dict, Optional
+
+from utils.config import get_settings
+from utils.metrics import get_metrics
+
+logger = logging.getLogger("llm_agent.core.stage_limits")
+
+_wait_seconds = get_metrics().histogram("stage_slot_wait_seconds", "Time spent waiting for a free stage slot.", ["stage"])
+
+
+class StageLimits:
+    """
+    Separate concurrency caps for the pipeline stages, so many jobs can be in
+    flight while LLM generation and GitHub deployment each stay within their
+    own provider's limits.
+    """
+
+    def __init__(self, limits: Dict[str, int]):
+        self.limits = {name: max(1, n) for name, n in limits.items()}
+        self.active: Dict[str, int] = {name: 0 for name in self.limits}
+        self.waiting: Dict[str, int] = {name: 0 for name in self.limits}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._semaphores: Dict[str, asyncio.Semaphore] = {}
+
+    def _semaphore(self, stage: str) -> asyncio.Semaphore:
+        # Semaphores belong to one event loop; rebuild them if the loop changes
+        loop = asyncio.get_running_loop()
+        if loop is not self._loop:
+            self._loop = loop
+            self._semaphores = {name: asyncio.Semaphore(n) for name, n in self.limits.items()}
+        return self._semaphores[stage]
+
+    @asynccontextmanager
+    async def stage(self, stage: str):
+        semaphore = self._semaphore(stage)
+        self.waiting[stage] += 1
+        start = time.perf_counter()
+        try:
+            await semaphore.acquire()
+        finally:
+            self.waiting[stage] -= 1
+        waited = time.perf_counter() - start
+        _wait_seconds.observe(waited, stage=stage)
+        if waited > 1:
+            logger.info(f"⏳ Waited {waited:.1f}s for a free {stage} slot")
+        self.active[stage] += 1
+        try:
+            yield
+        finally:
+            self.active[stage] -= 1
+            semaphore.release()
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        return {
+            name: {"limit": limit, "active": self.active[name], "waiting": self.waiting[name]}
+            for name, limit in self.limits.items()
+        }
+
+
+_limits: Optional[StageLimits] = None
+
+
+def get_stage_limits() -> StageLimits:
+    """
+    Returns the process-wide stage limits configured from settings.
+    """
+    global _limits
+    if _limits is None:
+        settings = get_settings()
+        _limits = StageLimits({
+            "llm": settings.LLM_STAGE_CONCURRENCY,
+            "github": settings.GITHUB_STAGE_CONCURRENCY,
+        })
+    return _limits
@@ -6,7 +6,12 @@ from dotenv import load_dotenv
 
 from utils.config import get_settings
 from utils.logger import configure_logging
-from api.endpoints import router as api_router
+from api.endpoints import router as api_router, job_queue, outbox
+from core.container import get_services, init_services, reset_services
+from services.http_clients import get_http_pool, close_http_pool
+from services.prompt_registry import get_prompt_registry
+from services.pages_poller import get_pages_poller
+from utils.workspace import drain_background_writes
 
 load_dotenv(".env")  # Forces .env variables into os.environ
 
@@ -28,12 +33,23 @@ def create_app() -> FastAPI:
         print("DEBUG: Current working directory:", os.getcwd())
         print("DEBUG: GITHUB_TOKEN =", os.getenv("GITHUB_TOKEN"))
 
-        # Potential future: init DB, metrics, or a connection pool here
+        get_http_pool()  # open the app-scoped HTTP client pool before any build runs
+        get_prompt_registry().load_all()  # fail fast on missing/empty prompt templates
+        services = init_services()  # build the shared LLM/GitHub services once for all requests
+        await services.github.repo_pool.start()  # no-op unless REPO_POOL_SIZE > 0
+        await outbox.start()  # resumes notifications left pending by a previous run
+        await job_queue.start()
 
     @app.on_event("shutdown")
     async def on_shutdown():
         logger.info("Shutting down LLM Student Agent")
-        # Potential future: cleanup resources
+        await job_queue.stop()
+        await drain_background_writes()
+        await get_services().github.repo_pool.stop()
+        await get_pages_poller().stop()
+        await outbox.stop()
+        await close_http_pool()
+        reset_services()
 
     # lightweight health endpoint (can be hit by instructor infra)
     @app.get("/health", tags=["health"])
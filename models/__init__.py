@@ -1,3 +1,4 @@
 from .request_models import Request, Attachment, Submission
+from .job_models import JobStage, JobAccepted, JobStatus
 
-__all__ = ['Request', 'Attachment', 'Submission']
+__all__ = ['Request', 'Attachment', 'Submission', 'JobStage', 'JobAccepted', 'JobStatus']
@@ -0,0 +1,40 @@
+from datetime import datetime
+from enum import Enum
+from pydantic import BaseModel, Field
+from typing import Optional, Dict
+
+from .request_models import Submission
+
+
+class JobStage(str, Enum):
+    QUEUED = "queued"
+    BUILDING = "building"
+    PUBLISHING = "publishing"
+    NOTIFYING = "notifying"
+    COMPLETED = "completed"
+    FAILED = "failed"
+
+
+class JobAccepted(BaseModel):
+    """
+    Returned by /build once the request has been queued.
+    """
+    job_id: str = Field(..., description="Identifier to poll at /jobs/{job_id}")
+    stage: JobStage = Field(..., description="Current stage of the job")
+    status_url: str = Field(..., description="Relative URL of the job status resource")
+
+
+class JobStatus(BaseModel):
+    """
+    Progress and outcome of a queued build/revision job.
+    """
+    job_id: str = Field(..., description="Job identifier")
+    task: str = Field(..., description="Copy from initial request")
+    round: int = Field(..., description="Copy from initial request")
+    stage: JobStage = Field(..., description="Current stage of the job")
+    created_at: datetime = Field(..., description="When the job was queued (UTC)")
+    started_at: Optional[datetime] = Field(None, description="When a worker picked the job up (UTC)")
+    finished_at: Optional[datetime] = Field(None, description="When the job completed or failed (UTC)")
+    timings: Dict[str, float] = Field(default_factory=dict, description="Seconds spent per stage")
+    submission: Optional[Submission] = Field(None, description="Final payload sent to the evaluator")
+    error: Optional[str] = Field(None, description="Failure reason if the job failed")
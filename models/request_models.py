@@ -19,6 +19,7 @@ class Request(BaseModel):
     checks: List[str] = Field(..., description="mention how it will be evaluated")
     evaluation_url: Optional[HttpUrl] = Field(..., description="Send repo & commit details to the URL below")
     attachments: List[Attachment]
+    bypass_cache: bool = Field(False, description="Ask the model again instead of reusing a cached LLM response")
     
 class Submission(BaseModel):
     """
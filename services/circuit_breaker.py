@@ -0,0 +1,210 @@
+import time
+import asyncio
+import logging
+from collections import deque
+from contextlib import contextmanager
+from enum import Enum
+from typing import Deque, Dict, Optional, Tuple
+
+from utils.config import get_settings
+
+logger = logging.getLogger("llm_agent.services.circuit_breaker")
+
+
+class BreakerState(str, Enum):
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+
+class CircuitOpenError(Exception):
+    """Raised when a call is refused because the provider's breaker is open."""
+
+    def __init__(self, name: str, retry_in: float):
+        super().__init__(f"Circuit for '{name}' is open (retry in {retry_in:.0f}s)")
+        self.name = name
+        self.retry_in = retry_in
+
+
+class CircuitBreaker:
+    """
+    Closed / open / half-open breaker for one provider.
+
+    Outcomes of the last `window` calls are kept. Once at least `min_calls` are
+    recorded, the breaker opens if the failure rate reaches `error_rate` or the
+    share of calls slower than `slow_call_seconds` reaches `slow_rate`. After
+    `open_seconds` it lets a single probe through (half-open): success closes
+    it, failure re-opens it.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        window: int = 20,
+        min_calls: int = 5,
+        error_rate: float = 0.5,
+        slow_call_seconds: float = 90.0,
+        slow_rate: float = 0.8,
+        open_seconds: float = 60.0,
+    ):
+        self.name = name
+        self.min_calls = min_calls
+        self.error_rate = error_rate
+        self.slow_call_seconds = slow_call_seconds
+        self.slow_rate = slow_rate
+        self.open_seconds = open_seconds
+        self.state = BreakerState.CLOSED
+        self.opened_at: Optional[float] = None
+        self.outcomes: Deque[Tuple[bool, bool]] = deque(maxlen=window)  # (ok, slow)
+        self.probe_in_flight = False
+        self.times_opened = 0
+        self.rejected = 0
+        self.last_error: Optional[str] = None
+
+    def _retry_in(self) -> float:
+        if self.opened_at is None:
+            return 0.0
+        return max(0.0, self.open_seconds - (time.monotonic() - self.opened_at))
+
+    def available(self) -> bool:
+        """Whether a call would currently be let through (does not reserve a probe)."""
+        if self.state == BreakerState.CLOSED:
+            return True
+        if self.state == BreakerState.OPEN:
+            return self._retry_in() == 0
+        return not self.probe_in_flight
+
+    def allow(self) -> bool:
+        """Reserve the right to make one call; moves an expired open breaker to half-open."""
+        if self.state == BreakerState.OPEN and self._retry_in() == 0:
+            self._transition(BreakerState.HALF_OPEN)
+        if self.state == BreakerState.CLOSED:
+            return True
+        if self.state == BreakerState.HALF_OPEN and not self.probe_in_flight:
+            self.probe_in_flight = True
+            return True
+        self.rejected += 1
+        return False
+
+    def record(self, ok: bool, seconds: float, error: Optional[str] = None) -> None:
+        slow = seconds >= self.slow_call_seconds
+        if not ok:
+            self.last_error = error
+
+        if self.state == BreakerState.HALF_OPEN:
+            self.probe_in_flight = False
+            if ok and not slow:
+                self.outcomes.clear()
+                self._transition(BreakerState.CLOSED)
+            else:
+                self._transition(BreakerState.OPEN)
+            return
+
+        self.outcomes.append((ok, slow))
+        if self.state == BreakerState.CLOSED and len(self.outcomes) >= self.min_calls:
+            failure_rate, slow_share = self._rates()
+            if failure_rate >= self.error_rate or slow_share >= self.slow_rate:
+                self._transition(BreakerState.OPEN)
+
+    def release(self) -> None:
+        """Give back a reserved probe without recording an outcome (e.g. a cancelled hedge)."""
+        self.probe_in_flight = False
+
+    @contextmanager
+    def guard(self):
+        """
+        Wrap one provider call: raises CircuitOpenError if refused, otherwise records
+        success/failure and latency. A quick cancellation is not counted against the provider.
+        """
+        if not self.allow():
+            raise CircuitOpenError(self.name, self._retry_in())
+        start = time.perf_counter()
+        try:
+            yield
+        except asyncio.CancelledError:
+            # A cancelled hedge loser still tells us the provider was slow
+            elapsed = time.perf_counter() - start
+            if elapsed >= self.slow_call_seconds:
+                self.record(True, elapsed)
+            else:
+                self.release()
+            raise
+        except Exception as e:
+            self.record(False, time.perf_counter() - start, repr(e))
+            raise
+        else:
+            self.record(True, time.perf_counter() - start)
+
+    def _rates(self) -> Tuple[float, float]:
+        total = len(self.outcomes)
+        if not total:
+            return 0.0, 0.0
+        failures = sum(1 for ok, _ in self.outcomes if not ok)
+        slow = sum(1 for _, is_slow in self.outcomes if is_slow)
+        return failures / total, slow / total
+
+    def _transition(self, state: BreakerState) -> None:
+        if state == self.state:
+            return
+        if state == BreakerState.OPEN:
+            self.opened_at = time.monotonic()
+            self.times_opened += 1
+            logger.warning(f"🔌 Circuit for {self.name} opened; skipping it for {self.open_seconds:.0f}s")
+        elif state == BreakerState.CLOSED:
+            self.opened_at = None
+            logger.info(f"🔌 Circuit for {self.name} closed")
+        else:
+            logger.info(f"🔌 Circuit for {self.name} half-open; sending a probe request")
+        self.state = state
+
+    def status(self) -> Dict[str, object]:
+        failure_rate, slow_share = self._rates()
+        return {
+            "state": self.state.value,
+            "calls": len(self.outcomes),
+            "error_rate": round(failure_rate, 3),
+            "slow_rate": round(slow_share, 3),
+            "retry_in": round(self._retry_in(), 1) if self.state == BreakerState.OPEN else 0.0,
+            "times_opened": self.times_opened,
+            "rejected": self.rejected,
+            "last_error": self.last_error,
+        }
+
+
+class BreakerRegistry:
+    """
+    One CircuitBreaker per provider name, created on first use with shared settings.
+    """
+
+    def __init__(self, **breaker_kwargs):
+        self.breaker_kwargs = breaker_kwargs
+        self.breakers: Dict[str, CircuitBreaker] = {}
+
+    def get(self, name: str) -> CircuitBreaker:
+        if name not in self.breakers:
+            self.breakers[name] = CircuitBreaker(name, **self.breaker_kwargs)
+        return self.breakers[name]
+
+    def status(self) -> Dict[str, Dict[str, object]]:
+        return {name: breaker.status() for name, breaker in self.breakers.items()}
+
+
+_registry: Optional[BreakerRegistry] = None
+
+
+def get_breaker_registry() -> BreakerRegistry:
+    """
+    Returns the process-wide LLM provider breakers configured from settings.
+    """
+    global _registry
+    if _registry is None:
+        settings = get_settings()
+        _registry = BreakerRegistry(
+            window=settings.LLM_BREAKER_WINDOW,
+            min_calls=settings.LLM_BREAKER_MIN_CALLS,
+            error_rate=settings.LLM_BREAKER_ERROR_RATE,
+            slow_call_seconds=settings.LLM_BREAKER_SLOW_CALL_SECONDS,
+            slow_rate=settings.LLM_BREAKER_SLOW_RATE,
+            open_seconds=settings.LLM_BREAKER_OPEN_SECONDS,
+        )
+    return _registry
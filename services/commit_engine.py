@@ -0,0 +1,182 @@
+import time
+import base64
+import hashlib
+import asyncio
+import logging
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional
+
+from services.github_client import AsyncGitHubClient, GitHubAPIError, count_api_calls
+
+logger = logging.getLogger("llm_agent.services.commit_engine")
+
+
+def git_blob_sha(data: bytes) -> str:
+    """SHA-1 git assigns to a blob with this content (`git hash-object`)."""
+    return hashlib.sha1(b"blob %d\0" % len(data) + data).hexdigest()
+
+
+@dataclass
+class CommitResult:
+    """Outcome of a single-commit upload."""
+    sha: str
+    files: int
+    api_calls: int
+    blobs_created: int
+    seconds: float
+    files_changed: int = 0
+    skipped: bool = False
+
+
+class CommitEngine:
+    """
+    Pushes a set of files to a branch as one commit with a constant number of
+    round-trips: one branch lookup (head commit + tree), one base tree listing,
+    one tree, one commit, one ref update. Text files are sent inline in the tree
+    request; only binary or oversized files need blobs, and those are created
+    concurrently.
+
+    Git blob SHAs are computed locally and compared with the base tree, so files
+    whose content is already in the repo are never re-sent, and a push that
+    changes nothing skips the commit altogether.
+    """
+
+    def __init__(self, client: AsyncGitHubClient, blob_concurrency: int = 8, inline_max_bytes: int = 512 * 1024):
+        self.client = client
+        self.blob_concurrency = max(1, blob_concurrency)
+        self.inline_max_bytes = inline_max_bytes
+
+    async def get_head(self, owner: str, repo: str, branch: str) -> Dict[str, str]:
+        """
+        Return {"commit": sha, "tree": sha} for the branch head in a single call.
+        Empty repositories get an initial README commit first.
+        """
+        try:
+            data = await self.client.get_branch(owner, repo, branch)
+        except GitHubAPIError as e:
+            # Repo is empty or the branch does not exist yet
+            if e.status not in (404, 409):
+                raise
+            logger.warning(f"⚠️ Repo empty, creating initial commit on '{branch}' branch...")
+            await self.client.create_file(
+                owner,
+                repo,
+                path="README.md",
+                message="Initial commit",
+                content=f"# {repo}\nInitial scaffold",
+                branch=branch,
+            )
+            data = await self.client.get_branch(owner, repo, branch)
+        return {"commit": data["commit"]["sha"], "tree": data["commit"]["commit"]["tree"]["sha"]}
+
+    def _inline_text(self, data: bytes) -> Optional[str]:
+        """Return the file as text if it can travel inline in the tree request."""
+        if len(data) > self.inline_max_bytes:
+            return None
+        try:
+            return data.decode("utf-8")
+        except UnicodeDecodeError:
+            return None
+
+    async def get_tree_blobs(self, owner: str, repo: str, tree_sha: str) -> Dict[str, Dict[str, str]]:
+        """Map of path -> {"sha", "mode"} for every blob in the tree."""
+        tree = await self.client.get_tree(owner, repo, tree_sha, recursive=True)
+        if tree.get("truncated"):
+            logger.warning(f"⚠️ Base tree listing for {repo} truncated; unchanged-file detection is partial")
+        return {
+            e["path"]: {"sha": e["sha"], "mode": e.get("mode", "100644")}
+            for e in tree.get("tree", []) if e.get("type") == "blob"
+        }
+
+    async def get_tree_shas(self, owner: str, repo: str, tree_sha: str) -> Dict[str, str]:
+        """Map of path -> blob SHA for every blob in the tree."""
+        blobs = await self.get_tree_blobs(owner, repo, tree_sha)
+        return {path: blob["sha"] for path, blob in blobs.items()}
+
+    async def _tree_entries(
+        self,
+        owner: str,
+        repo: str,
+        files: Dict[str, bytes],
+        known_shas: Dict[str, str],
+        modes: Dict[str, str],
+    ) -> List[Dict[str, Any]]:
+        semaphore = asyncio.Semaphore(self.blob_concurrency)
+
+        async def entry(path: str, data: bytes) -> Dict[str, Any]:
+            mode = modes.get(path, "100644")
+            sha = known_shas.get(path)
+            if sha is not None:
+                # Content already exists in the repo under another path: reference it
+                return {"path": path, "mode": mode, "type": "blob", "sha": sha}
+            text = self._inline_text(data)
+            if text is not None:
+                return {"path": path, "mode": mode, "type": "blob", "content": text}
+            async with semaphore:
+                blob = await self.client.create_blob(owner, repo, base64.b64encode(data).decode("ascii"), "base64")
+            logger.debug(f"📦 Uploaded blob for {path}")
+            return {"path": path, "mode": mode, "type": "blob", "sha": blob["sha"], "uploaded": True}
+
+        return list(await asyncio.gather(*(entry(path, data) for path, data in files.items())))
+
+    async def commit_files(
+        self,
+        owner: str,
+        repo: str,
+        files: Dict[str, bytes],
+        message: str,
+        branch: str = "main",
+        modes: Optional[Dict[str, str]] = None,
+    ) -> CommitResult:
+        """
+        Commit `files` ({path: bytes}) on top of the branch head and move the branch.
+        `modes` gives git file modes per path (default "100644").
+        """
+        modes = modes or {}
+        start = time.perf_counter()
+        with count_api_calls() as counter:
+            head = await self.get_head(owner, repo, branch)
+            base = await self.get_tree_blobs(owner, repo, head["tree"])
+            base_shas = {path: blob["sha"] for path, blob in base.items()}
+
+            local_shas = {path: git_blob_sha(data) for path, data in files.items()}
+            changed = {
+                path: data for path, data in files.items()
+                if base_shas.get(path) != local_shas[path]
+                or (path in base and base[path]["mode"] != modes.get(path, "100644"))
+            }
+            if not changed:
+                result = CommitResult(
+                    sha=head["commit"],
+                    files=len(files),
+                    api_calls=counter.total,
+                    blobs_created=0,
+                    seconds=round(time.perf_counter() - start, 3),
+                    skipped=True,
+                )
+                logger.info(f"⏭️ No changes for {repo}; keeping {result.sha} ({result.api_calls} API calls)")
+                return result
+
+            existing = set(base_shas.values())
+            known_shas = {path: local_shas[path] for path in changed if local_shas[path] in existing}
+            tree_entries = await self._tree_entries(owner, repo, changed, known_shas, modes)
+            blobs_created = sum(1 for e in tree_entries if e.pop("uploaded", False))
+            new_tree = await self.client.create_tree(owner, repo, tree_entries, head["tree"])
+            logger.debug(f"🌲 Created new Git tree ({len(changed)}/{len(files)} files changed).")
+
+            new_commit = await self.client.create_commit(owner, repo, message, new_tree["sha"], [head["commit"]])
+            await self.client.update_ref(owner, repo, f"heads/{branch}", new_commit["sha"])
+
+        result = CommitResult(
+            sha=new_commit["sha"],
+            files=len(files),
+            api_calls=counter.total,
+            blobs_created=blobs_created,
+            seconds=round(time.perf_counter() - start, 3),
+            files_changed=len(changed),
+        )
+        logger.info(
+            f"✅ Pushed {result.files_changed}/{result.files} changed files in single commit ({result.sha}) "
+            f"with {result.api_calls} API calls in {result.seconds}s"
+        )
+        return result
@@ -0,0 +1,119 @@
+import copy
+import time
+import hashlib
+import logging
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, Optional, Tuple
+
+from utils.config import get_settings
+
+logger = logging.getLogger("llm_agent.services.github_cache")
+
+
+@dataclass
+class CachedResource:
+    data: Any
+    etag: Optional[str]
+    expires_at: float  # monotonic
+
+    @property
+    def fresh(self) -> bool:
+        return time.monotonic() < self.expires_at
+
+
+class GitHubMetadataCache:
+    """
+    In-memory cache of slow-changing GitHub resources (the token's login, repo
+    objects, branch heads), shared by every GitHubService in the process.
+
+    Entries are served without a request while within their TTL. Once stale,
+    they are revalidated with `If-None-Match` on their ETag; a 304 costs no
+    rate-limit budget and just extends the entry. Our own writes invalidate
+    the entries they affect. Keys include a token fingerprint so different
+    credentials never share entries.
+    """
+
+    def __init__(
+        self,
+        user_ttl: float = 3600.0,
+        repo_ttl: float = 600.0,
+        ref_ttl: float = 0.0,
+        max_entries: int = 1024,
+        enabled: bool = True,
+    ):
+        self.ttls = {"user": user_ttl, "repo": repo_ttl, "ref": ref_ttl}
+        self.max_entries = max_entries
+        self.enabled = enabled
+        self._entries: "OrderedDict[Tuple[str, str], CachedResource]" = OrderedDict()
+        self.hits = 0
+        self.revalidated = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    @staticmethod
+    def fingerprint(token: str) -> str:
+        return hashlib.sha256(token.encode("utf-8")).hexdigest()[:16]
+
+    def ttl(self, kind: str) -> float:
+        return self.ttls[kind]
+
+    def get(self, scope: str, path: str) -> Optional[CachedResource]:
+        if not self.enabled:
+            return None
+        entry = self._entries.get((scope, path))
+        if entry is not None:
+            self._entries.move_to_end((scope, path))
+        return entry
+
+    def put(self, scope: str, path: str, data: Any, etag: Optional[str], ttl: float) -> None:
+        if not self.enabled:
+            return
+        self._entries[(scope, path)] = CachedResource(copy.deepcopy(data), etag, time.monotonic() + ttl)
+        self._entries.move_to_end((scope, path))
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def extend(self, entry: CachedResource, ttl: float) -> None:
+        """Mark a revalidated (304) entry fresh again."""
+        entry.expires_at = time.monotonic() + ttl
+        self.revalidated += 1
+
+    def invalidate(self, scope: str, *paths: str) -> None:
+        for path in paths:
+            if self._entries.pop((scope, path), None) is not None:
+                self.invalidations += 1
+                logger.debug(f"🧹 Invalidated cached GitHub metadata for {path}")
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.revalidated + self.misses
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "revalidated": self.revalidated,
+            "misses": self.misses,
+            "invalidations": self.invalidations,
+            "hit_rate": round((self.hits + self.revalidated) / lookups, 3) if lookups else 0.0,
+        }
+
+
+_cache: Optional[GitHubMetadataCache] = None
+
+
+def get_github_cache() -> GitHubMetadataCache:
+    """
+    Returns the process-wide GitHub metadata cache configured from settings.
+    """
+    global _cache
+    if _cache is None:
+        settings = get_settings()
+        _cache = GitHubMetadataCache(
+            user_ttl=settings.GITHUB_CACHE_USER_TTL,
+            repo_ttl=settings.GITHUB_CACHE_REPO_TTL,
+            ref_ttl=settings.GITHUB_CACHE_REF_TTL,
+            enabled=settings.GITHUB_CACHE_ENABLED,
+        )
+    return _cache
@@ -0,0 +1,270 @@
+import copy
+import time
+import base64
+import logging
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+
+import httpx
+
+from services.github_cache import GitHubMetadataCache, get_github_cache
+from services.http_clients import HTTPClientPool, get_http_pool
+from utils.metrics import get_metrics
+
+logger = logging.getLogger("llm_agent.services.github_client")
+
+GITHUB_API = "https://api.github.com"
+
+_request_seconds = get_metrics().histogram(
+    "github_request_duration_seconds", "GitHub REST calls by endpoint template and status.", ["method", "endpoint", "status"]
+)
+
+# Segments followed by a git object SHA, and segments after which the rest of the path is a name
+_SHA_SEGMENTS = {"blobs", "trees", "commits"}
+_NAME_SEGMENTS = {"contents": "{path}", "ref": "{ref}", "refs": "{ref}", "branches": "{branch}"}
+
+
+def endpoint_template(path: str) -> str:
+    """
+    Replace owners, repo names, SHAs and refs in a REST path with placeholders
+    (`/repos/{owner}/{repo}/git/blobs/{sha}`) so metric labels stay bounded.
+    """
+    parts = path.split("?", 1)[0].strip("/").split("/")
+    if parts[0] != "repos" or len(parts) < 3:
+        return "/" + "/".join(parts)
+    template = ["repos", "{owner}", "{repo}"]
+    rest = parts[3:]
+    for i, segment in enumerate(rest):
+        template.append(segment)
+        if segment in _NAME_SEGMENTS and i + 1 < len(rest):
+            template.append(_NAME_SEGMENTS[segment])
+            break
+        if segment in _SHA_SEGMENTS and i + 1 < len(rest):
+            template.append("{sha}")
+            template.extend(rest[i + 2:])
+            break
+    return "/" + "/".join(template)
+
+
+@dataclass
+class ApiCallCounter:
+    """Tally of GitHub REST calls made inside a `count_api_calls()` block."""
+    total: int = 0
+    by_endpoint: Dict[str, int] = field(default_factory=dict)
+    parent: Optional["ApiCallCounter"] = field(default=None, repr=False)
+
+    def record(self, method: str, path: str) -> None:
+        self.total += 1
+        key = f"{method} {path}"
+        self.by_endpoint[key] = self.by_endpoint.get(key, 0) + 1
+        if self.parent is not None:
+            self.parent.record(method, path)
+
+
+_api_call_counter: ContextVar[Optional[ApiCallCounter]] = ContextVar("github_api_call_counter", default=None)
+
+
+@contextmanager
+def count_api_calls():
+    """
+    Count every GitHub request issued by the current task (and tasks it spawns)
+    while the block is active. Safe with concurrent deploys sharing one client;
+    nested blocks also count towards the enclosing one.
+    """
+    counter = ApiCallCounter(parent=_api_call_counter.get())
+    token = _api_call_counter.set(counter)
+    try:
+        yield counter
+    finally:
+        _api_call_counter.reset(token)
+
+
+class GitHubAPIError(Exception):
+    """
+    Raised for non-2xx GitHub REST responses.
+    Mirrors PyGithub's GithubException: `status` and decoded `data`.
+    """
+
+    def __init__(self, status: int, data: Any, method: str = "", path: str = ""):
+        self.status = status
+        self.data = data
+        super().__init__(f"{method} {path} -> {status}: {data}")
+
+
+class AsyncGitHubClient:
+    """
+    Minimal awaitable client for the GitHub REST endpoints the deployer needs:
+    users, repos, Git Data (refs, commits, blobs, trees), contents and Pages.
+    Requests go through the shared HTTP client pool, so nothing blocks the event loop.
+    Login, repo and branch lookups are served from the shared metadata cache.
+    """
+
+    def __init__(
+        self,
+        token: str,
+        http_pool: Optional[HTTPClientPool] = None,
+        base_url: str = GITHUB_API,
+        cache: Optional[GitHubMetadataCache] = None,
+    ):
+        self.base_url = base_url.rstrip("/")
+        self.http_pool = http_pool or get_http_pool()
+        self.cache = cache or get_github_cache()
+        self._scope = f"{self.base_url}#{GitHubMetadataCache.fingerprint(token)}"
+        self.headers = {
+            "Authorization": f"token {token}",
+            "Accept": "application/vnd.github.v3+json",
+            "X-GitHub-Api-Version": "2022-11-28",
+        }
+
+    async def _send(self, method: str, path: str, json: Optional[dict] = None, params: Optional[dict] = None, headers: Optional[dict] = None) -> httpx.Response:
+        url = f"{self.base_url}{path}"
+        client = self.http_pool.client_for(url)
+        counter = _api_call_counter.get()
+        if counter is not None:
+            counter.record(method, path)
+        start = time.perf_counter()
+        status = "error"
+        try:
+            response = await client.request(method, url, headers={**self.headers, **(headers or {})}, json=json, params=params)
+            status = str(response.status_code)
+            return response
+        finally:
+            _request_seconds.observe(time.perf_counter() - start, method=method, endpoint=endpoint_template(path), status=status)
+
+    @staticmethod
+    def _decode(response: httpx.Response, method: str, path: str) -> Any:
+        if response.status_code >= 400:
+            try:
+                data = response.json()
+            except ValueError:
+                data = response.text
+            raise GitHubAPIError(response.status_code, data, method, path)
+        if not response.content:
+            return None
+        return response.json()
+
+    async def request(self, method: str, path: str, json: Optional[dict] = None, params: Optional[dict] = None) -> Any:
+        """
+        Perform a REST call and return the decoded JSON body (None for empty bodies).
+        Raises GitHubAPIError on any status >= 400.
+        """
+        response = await self._send(method, path, json=json, params=params)
+        return self._decode(response, method, path)
+
+    async def cached_get(self, path: str, kind: str) -> Any:
+        """
+        GET through the metadata cache: fresh entries skip the request, stale ones
+        are revalidated with their ETag. `kind` ("user", "repo" or "ref") picks the TTL.
+        """
+        ttl = self.cache.ttl(kind)
+        entry = self.cache.get(self._scope, path)
+        if entry is not None and entry.fresh:
+            self.cache.hits += 1
+            return copy.deepcopy(entry.data)
+
+        conditional = {"If-None-Match": entry.etag} if entry is not None and entry.etag else None
+        response = await self._send("GET", path, headers=conditional)
+        if response.status_code == 304 and entry is not None:
+            self.cache.extend(entry, ttl)
+            return copy.deepcopy(entry.data)
+
+        data = self._decode(response, "GET", path)
+        self.cache.misses += 1
+        self.cache.put(self._scope, path, data, response.headers.get("etag"), ttl)
+        return data
+
+    def _invalidate_branch(self, owner: str, repo: str, branch: str) -> None:
+        self.cache.invalidate(
+            self._scope,
+            f"/repos/{owner}/{repo}/branches/{branch}",
+            f"/repos/{owner}/{repo}/git/ref/heads/{branch}",
+        )
+
+    # --- Users & repos ---
+
+    async def get_authenticated_user(self) -> Dict[str, Any]:
+        return await self.cached_get("/user", "user")
+
+    async def get_repo(self, owner: str, repo: str) -> Dict[str, Any]:
+        return await self.cached_get(f"/repos/{owner}/{repo}", "repo")
+
+    async def create_repo(self, name: str, private: bool = False, auto_init: bool = False) -> Dict[str, Any]:
+        created = await self.request("POST", "/user/repos", json={"name": name, "private": private, "auto_init": auto_init})
+        # The response is the full repo object; seed the cache so the follow-up lookup is free
+        if created and created.get("full_name"):
+            self.cache.put(self._scope, f"/repos/{created['full_name']}", created, None, self.cache.ttl("repo"))
+        return created
+
+    async def list_user_repos(self, per_page: int = 100) -> List[Dict[str, Any]]:
+        """Repositories owned by the token's user (first page, newest first)."""
+        return await self.request("GET", "/user/repos", params={"affiliation": "owner", "sort": "created", "per_page": per_page})
+
+    async def rename_repo(self, owner: str, repo: str, new_name: str) -> Dict[str, Any]:
+        renamed = await self.request("PATCH", f"/repos/{owner}/{repo}", json={"name": new_name})
+        self.cache.invalidate(self._scope, f"/repos/{owner}/{repo}", f"/repos/{owner}/{new_name}")
+        if renamed and renamed.get("full_name"):
+            self.cache.put(self._scope, f"/repos/{renamed['full_name']}", renamed, None, self.cache.ttl("repo"))
+        return renamed
+
+    async def get_branch(self, owner: str, repo: str, branch: str) -> Dict[str, Any]:
+        """Branch head commit including its tree SHA, in a single round-trip."""
+        return await self.cached_get(f"/repos/{owner}/{repo}/branches/{branch}", "ref")
+
+    async def create_file(self, owner: str, repo: str, path: str, message: str, content: str, branch: str = "main") -> Dict[str, Any]:
+        """Create a file through the Contents API (works on empty repositories)."""
+        result = await self.request("PUT", f"/repos/{owner}/{repo}/contents/{path}", json={
+            "message": message,
+            "content": base64.b64encode(content.encode("utf-8")).decode("ascii"),
+            "branch": branch,
+        })
+        self._invalidate_branch(owner, repo, branch)
+        return result
+
+    # --- Git Data ---
+
+    async def get_ref(self, owner: str, repo: str, ref: str) -> Dict[str, Any]:
+        return await self.cached_get(f"/repos/{owner}/{repo}/git/ref/{ref}", "ref")
+
+    async def update_ref(self, owner: str, repo: str, ref: str, sha: str, force: bool = False) -> Dict[str, Any]:
+        try:
+            return await self.request("PATCH", f"/repos/{owner}/{repo}/git/refs/{ref}", json={"sha": sha, "force": force})
+        finally:
+            # Drop the cached head even on failure: a rejected update usually means it was stale
+            if ref.startswith("heads/"):
+                self._invalidate_branch(owner, repo, ref.removeprefix("heads/"))
+
+    async def get_commit(self, owner: str, repo: str, sha: str) -> Dict[str, Any]:
+        return await self.request("GET", f"/repos/{owner}/{repo}/git/commits/{sha}")
+
+    async def create_commit(self, owner: str, repo: str, message: str, tree: str, parents: List[str]) -> Dict[str, Any]:
+        return await self.request("POST", f"/repos/{owner}/{repo}/git/commits", json={"message": message, "tree": tree, "parents": parents})
+
+    async def create_blob(self, owner: str, repo: str, content: str, encoding: str = "utf-8") -> Dict[str, Any]:
+        return await self.request("POST", f"/repos/{owner}/{repo}/git/blobs", json={"content": content, "encoding": encoding})
+
+    async def get_blob(self, owner: str, repo: str, sha: str) -> Dict[str, Any]:
+        """Blob content (base64 encoded) and size."""
+        return await self.request("GET", f"/repos/{owner}/{repo}/git/blobs/{sha}")
+
+    async def get_tree(self, owner: str, repo: str, sha: str, recursive: bool = False) -> Dict[str, Any]:
+        params = {"recursive": "1"} if recursive else None
+        return await self.request("GET", f"/repos/{owner}/{repo}/git/trees/{sha}", params=params)
+
+    async def create_tree(self, owner: str, repo: str, tree: List[Dict[str, Any]], base_tree: Optional[str] = None) -> Dict[str, Any]:
+        payload: Dict[str, Any] = {"tree": tree}
+        if base_tree:
+            payload["base_tree"] = base_tree
+        return await self.request("POST", f"/repos/{owner}/{repo}/git/trees", json=payload)
+
+    # --- Pages ---
+
+    async def get_latest_pages_build(self, owner: str, repo: str) -> Dict[str, Any]:
+        """Status ("queued", "building", "built", "errored") and commit of the newest Pages build."""
+        return await self.request("GET", f"/repos/{owner}/{repo}/pages/builds/latest")
+
+    async def create_pages_site(self, owner: str, repo: str, branch: str = "main", path: str = "/") -> Optional[Dict[str, Any]]:
+        result = await self.request("POST", f"/repos/{owner}/{repo}/pages", json={"source": {"branch": branch, "path": path}})
+        self.cache.invalidate(self._scope, f"/repos/{owner}/{repo}")  # has_pages changed
+        return result
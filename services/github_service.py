@@ -1,13 +1,47 @@
 import os
-import time
+import base64
 import asyncio
 import logging
-import requests
-from github import Github, GithubException, InputGitTreeElement
-from typing import List
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from services.github_cache import GitHubMetadataCache
+from services.github_client import AsyncGitHubClient, GitHubAPIError
+from services.http_clients import HTTPClientPool
+from services.pages_poller import PagesReadinessPoller, PagesStatus, get_pages_poller
+from services.repo_pool import RepoPool
+from services.commit_engine import CommitEngine, CommitResult, git_blob_sha
+from utils.bundle import FileBundle
+from utils.config import get_settings
 
 logger = logging.getLogger("llm_agent.services.github_service")
 
+MIT_LICENSE_TEXT = """MIT License
+
+Copyright (c) 2025 Atharva Kulkarni
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+    """
+
+
+class RepoSnapshotError(Exception):
+    """Raised when a repository snapshot cannot be fetched consistently."""
+
 
 class GitHubService:
     """
@@ -15,31 +49,61 @@ class GitHubService:
     Requires a GitHub personal access token (PAT) with 'repo' and 'pages' scopes.
     """
 
-    def __init__(self):
+    def __init__(
+        self,
+        http_pool: Optional[HTTPClientPool] = None,
+        cache: Optional[GitHubMetadataCache] = None,
+        pages_poller: Optional[PagesReadinessPoller] = None,
+        repo_pool_size: Optional[int] = None,
+    ):
         token = os.getenv("GITHUB_TOKEN")
         if not token:
             raise ValueError("❌ Missing GITHUB_TOKEN in environment.")
-        self.client = Github(token)
-        self.user = self.client.get_user()
+        settings = get_settings()
+        self.client = AsyncGitHubClient(token, http_pool=http_pool, cache=cache)
+        self.commit_engine = CommitEngine(
+            self.client,
+            blob_concurrency=settings.GITHUB_BLOB_CONCURRENCY,
+            inline_max_bytes=settings.GITHUB_INLINE_MAX_BYTES,
+        )
+        self.pages_poller = pages_poller or get_pages_poller()
+        self.repo_pool = RepoPool(
+            self.client,
+            size=settings.REPO_POOL_SIZE if repo_pool_size is None else repo_pool_size,
+            prefix=settings.REPO_POOL_PREFIX,
+        )
+        self._login: Optional[str] = None
+
+    async def get_login(self) -> str:
+        """Login of the token owner; the lookup is shared across services via the metadata cache."""
+        if self._login is None:
+            user = await self.client.get_authenticated_user()
+            self._login = user["login"]
+        return self._login
 
     async def get_or_create_repo(self, repo_name: str, private: bool = False, retries: int = 3, delay: float = 1.0):
         """
         Async-safe GitHub repo creation with retry for propagation delay.
         """
+        owner = await self.get_login()
         for attempt in range(retries):
             try:
-                repo = self.user.get_repo(repo_name)
+                repo = await self.client.get_repo(owner, repo_name)
                 print(f"Repo '{repo_name}' exists.")
-                return repo.clone_url
-            except GithubException as e:
+                return repo["clone_url"]
+            except GitHubAPIError as e:
                 if e.status == 404:
+                    # A pre-warmed spare (Pages already enabled) skips creation and propagation
+                    claimed = await self.repo_pool.claim(repo_name)
+                    if claimed is not None:
+                        return claimed["clone_url"]
                     try:
                         print(f"Repo '{repo_name}' not found. Creating it...")
-                        repo = self.user.create_repo(repo_name, private=private, auto_init=True)
+                        await self.client.create_repo(repo_name, private=private, auto_init=True)
                         await asyncio.sleep(delay)  # Wait for GitHub propagation
-                        repo = self.user.get_repo(repo_name)
-                        return repo.clone_url
-                    except GithubException as create_err:
+                        repo = await self.client.get_repo(owner, repo_name)
+                        return repo["clone_url"]
+                    except GitHubAPIError as create_err:
                         if create_err.status == 422 and "name already exists" in str(create_err.data):
                             print(f"Repo '{repo_name}' already exists. Retrying get_repo...")
                             await asyncio.sleep(delay)
@@ -49,7 +113,38 @@ class GitHubService:
                     raise
         raise Exception(f"Failed to access or create repo '{repo_name}' after {retries} attempts")
 
-    def upload_all_files_single_commit(
+    async def upload_bundle(
+        self,
+        repo_name: str,
+        bundle: FileBundle,
+        include_license: bool = True,
+        commit_message: str = "Add all generated project files"
+    ) -> CommitResult:
+        """
+        Commits an in-memory FileBundle (plus LICENSE) in a single commit.
+        Returns: CommitResult with the commit SHA and the number of API calls made.
+        """
+        owner = await self.get_login()
+        files = bundle.contents()
+        if include_license:
+            files["LICENSE"] = MIT_LICENSE_TEXT.encode("utf-8")
+        return await self.commit_engine.commit_files(owner, repo_name, files, commit_message, modes=bundle.modes())
+
+    async def upload_files(
+        self,
+        repo_name: str,
+        file_paths: List[str],
+        include_license: bool = True,
+        commit_message: str = "Add all generated project files"
+    ) -> CommitResult:
+        """
+        Uploads all files (including LICENSE, README, etc.) in a single commit.
+        Returns: CommitResult with the commit SHA and the number of API calls made.
+        """
+        bundle = await asyncio.to_thread(FileBundle.from_paths, file_paths)
+        return await self.upload_bundle(repo_name, bundle, include_license, commit_message)
+
+    async def upload_all_files_single_commit(
         self,
         repo_name: str,
         file_paths: List[str],
@@ -60,99 +155,80 @@ class GitHubService:
         Uploads all files (including LICENSE, README, etc.) in a single commit.
         Returns: Commit SHA
         """
-        repo = self.user.get_repo(repo_name)
+        result = await self.upload_files(repo_name, file_paths, include_license, commit_message)
+        return result.sha
 
+    async def fetch_snapshot(
+        self,
+        repo_name: str,
+        branch: str = "main",
+        expected_sha: Optional[str] = None,
+        exclude: Iterable[str] = (),
+    ) -> Tuple[str, FileBundle]:
+        """
+        Download the files at the branch head as (commit SHA, FileBundle): one
+        recursive tree listing plus concurrent blob reads. Every blob is checked
+        against its git SHA, and the head is re-read afterwards so the snapshot is
+        known to match a single commit (and `expected_sha`, if given).
+        Raises RepoSnapshotError if it cannot be made consistent.
+        """
+        owner = await self.get_login()
+        skip = set(exclude)
+        semaphore = asyncio.Semaphore(self.commit_engine.blob_concurrency)
+
+        async def read_blob(sha: str) -> bytes:
+            async with semaphore:
+                blob = await self.client.get_blob(owner, repo_name, sha)
+            data = base64.b64decode(blob["content"])
+            if git_blob_sha(data) != sha:
+                raise RepoSnapshotError(f"Blob {sha} in {repo_name} failed verification")
+            return data
+
+        for attempt in range(2):
+            head = await self.client.get_branch(owner, repo_name, branch)
+            commit_sha = head["commit"]["sha"]
+            if expected_sha is not None and commit_sha != expected_sha:
+                raise RepoSnapshotError(f"{repo_name}@{branch} is at {commit_sha}, expected {expected_sha}")
+
+            tree = await self.client.get_tree(owner, repo_name, head["commit"]["commit"]["tree"]["sha"], recursive=True)
+            if tree.get("truncated"):
+                raise RepoSnapshotError(f"Tree listing for {repo_name} is truncated")
+            entries = [e for e in tree.get("tree", []) if e.get("type") == "blob" and e["path"] not in skip]
+
+            # Identical files share one blob read
+            shas = sorted({e["sha"] for e in entries})
+            contents: Dict[str, bytes] = dict(zip(shas, await asyncio.gather(*(read_blob(sha) for sha in shas))))
+
+            # A push while we were reading would mix two commits; start over once
+            if (await self.client.get_branch(owner, repo_name, branch))["commit"]["sha"] == commit_sha:
+                bundle = FileBundle()
+                for e in entries:
+                    bundle.add(e["path"], contents[e["sha"]], e.get("mode", "100644"))
+                logger.info(f"📥 Fetched {len(bundle)} file(s) ({bundle.total_bytes} bytes) from {repo_name}@{commit_sha[:7]}")
+                return commit_sha, bundle
+            logger.warning(f"{repo_name}@{branch} moved during snapshot (attempt {attempt + 1})")
+        raise RepoSnapshotError(f"{repo_name}@{branch} kept moving while being fetched")
+
+    async def enable_pages(self, repo_name: str, branch: str = "main") -> str:
+        """Enable GitHub Pages for the repo using REST API."""
+        owner = await self.get_login()
+        pages_url = f"https://{owner}.github.io/{repo_name}/"
         try:
-            ref = repo.get_git_ref("heads/main")
-            base_commit = repo.get_commit(ref.object.sha)
-        except GithubException as e:
-            # Repo is empty or 'main' branch does not exist
+            await self.client.create_pages_site(owner, repo_name, branch=branch, path="/")
+            logger.info(f"🌐 GitHub Pages enabled at {pages_url}")
+        except GitHubAPIError as e:
             if e.status == 409:
-                logger.warning("⚠️ Repo empty, creating initial commit on 'main' branch...")
-                # Create a README as the first commit
-                repo.create_file(
-                    path="README.md",
-                    message="Initial commit",
-                    content=f"# {repo_name}\nInitial scaffold",
-                    branch="main"
-                )
-                ref = repo.get_git_ref("heads/main")
-                base_commit = repo.get_commit(ref.object.sha)
+                logger.warning(f"⚠️ Pages site already exists for {repo_name}")
             else:
-                raise
-
-        # Collect files (and add license if needed)
-        blobs = []
-        for filepath in file_paths:
-            filename = os.path.basename(filepath)
-            with open(filepath, "r", encoding="utf-8") as f:
-                content = f.read()
-            blob = repo.create_git_blob(content, "utf-8")
-            blobs.append((filename, blob))
-            logger.debug(f"📦 Prepared blob for {filename}")
-
-        if include_license:
-            license_text = """MIT License
-
-Copyright (c) 2025 Atharva Kulkarni
-
-Permission is hereby granted, free of charge, to any person obtaining a copy
-of this software and associated documentation files (the "Software"), to deal
-in the Software without restriction, including without limitation the rights
-to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
-copies of the Software, and to permit persons to whom the Software is
-furnished to do so, subject to the following conditions:
-
-The above copyright notice and this permission notice shall be included in all
-copies or substantial portions of the Software.
-
-THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
-IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
-FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
-AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
-LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
-OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
-SOFTWARE.
-    """
-            blob = repo.create_git_blob(license_text, "utf-8")
-            blobs.append(("LICENSE", blob))
-            logger.debug("📜 Prepared MIT LICENSE blob")
-
-        # Build new tree
-        tree_elements = [
-            InputGitTreeElement(path=filename, mode="100644", type="blob", sha=blob.sha)
-            for filename, blob in blobs
-        ]   
-        new_tree = repo.create_git_tree(tree_elements, base_commit.commit.tree)
-        logger.debug("🌲 Created new Git tree for all files.")
-
-        # Commit and update branch
-        new_commit = repo.create_git_commit(commit_message, new_tree, [base_commit.commit])
-        ref.edit(new_commit.sha)
-        logger.info(f"✅ Pushed all files in single commit ({new_commit.sha})")
-
-        return new_commit.sha
-
-
-
-    def enable_pages(self, repo_name: str, branch: str = "main") -> str:
-        """Enable GitHub Pages for the repo using REST API."""
-        url = f"https://api.github.com/repos/{self.user.login}/{repo_name}/pages"
-        headers = {
-            "Authorization": f"token {os.getenv('GITHUB_TOKEN')}",
-            "Accept": "application/vnd.github.v3+json"
-        }
-        data = {"source": {"branch": branch, "path": "/"}}
-
-        response = requests.post(url, headers=headers, json=data)
-        if response.status_code in (201, 204):
-            pages_url = f"https://{self.user.login}.github.io/{repo_name}/"
-            logger.info(f"🌐 GitHub Pages enabled at {pages_url}")
-        elif response.status_code == 409:
-            pages_url = f"https://{self.user.login}.github.io/{repo_name}/"
-            logger.warning(f"⚠️ Pages site already exists for {repo_name}")
-        else:
-            pages_url = "Pages not available"
-            logger.warning(f"❌ Failed to create Pages site: {response.status_code} {response.json()}")
+                pages_url = "Pages not available"
+                logger.warning(f"❌ Failed to create Pages site: {e.status} {e.data}")
 
         return pages_url
+
+    async def wait_for_pages(self, repo_name: str, commit_sha: str, pages_url: str, timeout: Optional[float] = None) -> PagesStatus:
+        """
+        Wait until the Pages build for `commit_sha` has finished and `pages_url` serves it.
+        Never raises for a slow or failed build; check `ready` on the result.
+        """
+        owner = await self.get_login()
+        return await self.pages_poller.wait_until_live(self.client, owner, repo_name, commit_sha, pages_url, timeout)
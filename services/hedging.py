@@ -0,0 +1,132 @@
+import math
+import logging
+from collections import deque
+from typing import Deque, Dict, Optional
+
+from utils.config import get_settings
+
+logger = logging.getLogger("llm_agent.services.hedging")
+
+
+class LatencyTracker:
+    """
+    Rolling window of successful call latencies (seconds) for one provider.
+    """
+
+    def __init__(self, window: int = 100):
+        self.samples: Deque[float] = deque(maxlen=window)
+
+    def record(self, seconds: float) -> None:
+        self.samples.append(seconds)
+
+    def percentile(self, p: float) -> Optional[float]:
+        """Nearest-rank percentile of the window, or None if it is empty."""
+        if not self.samples:
+            return None
+        ordered = sorted(self.samples)
+        rank = max(1, min(len(ordered), math.ceil(p / 100 * len(ordered))))
+        return ordered[rank - 1]
+
+
+class HedgePolicy:
+    """
+    Decides when to hedge a slow primary LLM call with the secondary provider
+    and keeps the counters needed to tune that decision.
+
+    The hedge delay is the `percentile` latency of the primary provider, clamped
+    to [min_delay, max_delay]. Until `min_samples` calls have been observed,
+    `initial_delay` is used instead.
+    """
+
+    def __init__(
+        self,
+        enabled: bool = True,
+        percentile: float = 95.0,
+        initial_delay: float = 30.0,
+        min_delay: float = 2.0,
+        max_delay: float = 120.0,
+        min_samples: int = 10,
+        window: int = 100,
+    ):
+        self.enabled = enabled
+        self.percentile = percentile
+        self.initial_delay = initial_delay
+        self.min_delay = min_delay
+        self.max_delay = max_delay
+        self.min_samples = min_samples
+        self.window = window
+        self.latency: Dict[str, LatencyTracker] = {}
+        self.requests = 0
+        self.hedged = 0
+        self.fallbacks = 0
+        self.wins: Dict[str, int] = {}
+        self.hedge_wins = 0
+
+    def tracker(self, provider: str) -> LatencyTracker:
+        if provider not in self.latency:
+            self.latency[provider] = LatencyTracker(self.window)
+        return self.latency[provider]
+
+    def record_latency(self, provider: str, seconds: float) -> None:
+        self.tracker(provider).record(seconds)
+
+    def hedge_delay(self, provider: str) -> Optional[float]:
+        """Seconds to wait on `provider` before hedging, or None if hedging is disabled."""
+        if not self.enabled:
+            return None
+        tracker = self.tracker(provider)
+        if len(tracker.samples) < self.min_samples:
+            return self.initial_delay
+        observed = tracker.percentile(self.percentile)
+        return min(self.max_delay, max(self.min_delay, observed))
+
+    def record_outcome(self, primary: str, winner: Optional[str], hedged: bool, fallback: bool) -> None:
+        """
+        Count one generation. `hedged` means the secondary was started while the
+        primary was still running; `fallback` means it was started after the
+        primary failed. `winner` is None if every provider failed.
+        """
+        self.requests += 1
+        self.hedged += int(hedged)
+        self.fallbacks += int(fallback)
+        if winner is not None:
+            self.wins[winner] = self.wins.get(winner, 0) + 1
+            if hedged and winner != primary:
+                self.hedge_wins += 1
+
+    def stats(self) -> Dict[str, object]:
+        return {
+            "enabled": self.enabled,
+            "requests": self.requests,
+            "hedged": self.hedged,
+            "hedge_rate": round(self.hedged / self.requests, 3) if self.requests else 0.0,
+            "hedge_wins": self.hedge_wins,
+            "fallbacks": self.fallbacks,
+            "wins": dict(self.wins),
+            "delay": {provider: self.hedge_delay(provider) for provider in self.latency},
+            f"p{self.percentile:g}": {
+                provider: tracker.percentile(self.percentile) for provider, tracker in self.latency.items()
+            },
+        }
+
+
+_policy: Optional[HedgePolicy] = None
+
+
+def get_hedge_policy() -> HedgePolicy:
+    """
+    Returns the process-wide hedge policy configured from settings.
+    """
+    global _policy
+    if _policy is None:
+        settings = get_settings()
+        _policy = HedgePolicy(
+            enabled=settings.LLM_HEDGE_ENABLED,
+            percentile=settings.LLM_HEDGE_PERCENTILE,
+            initial_delay=settings.LLM_HEDGE_INITIAL_DELAY,
+            min_delay=settings.LLM_HEDGE_MIN_DELAY,
+            max_delay=settings.LLM_HEDGE_MAX_DELAY,
+            min_samples=settings.LLM_HEDGE_MIN_SAMPLES,
+            window=settings.LLM_HEDGE_WINDOW,
+        )
+    return _policy
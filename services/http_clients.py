@@ -0,0 +1,111 @@
+import logging
+import httpx
+from typing import Dict, Optional
+from urllib.parse import urlsplit
+
+from services.rate_limiter import RateLimiter, RateLimitedTransport
+from utils.config import get_settings
+
+logger = logging.getLogger("llm_agent.services.http_clients")
+
+try:  # HTTP/2 needs the optional `h2` package (httpx[http2])
+    import h2  # noqa: F401
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+
+class HTTPClientPool:
+    """
+    App-scoped registry of pooled httpx.AsyncClient instances, one per upstream origin.
+    Clients keep their connections alive between requests so repeated calls to the
+    same host (LLM providers, GitHub, evaluators) skip TCP+TLS setup. Every
+    request goes through the pool's RateLimiter, which paces calls per origin.
+    """
+
+    def __init__(
+        self,
+        max_connections: int = 100,
+        max_keepalive_connections: int = 20,
+        keepalive_expiry: float = 30.0,
+        http2: bool = True,
+        timeout: float = 30.0,
+        rate_limiter: Optional[RateLimiter] = None,
+    ):
+        if http2 and not HTTP2_AVAILABLE:
+            logger.warning("HTTP/2 requested but 'h2' is not installed; using HTTP/1.1.")
+            http2 = False
+        self.http2 = http2
+        self.timeout = timeout
+        self.limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive_connections,
+            keepalive_expiry=keepalive_expiry,
+        )
+        self.rate_limiter = rate_limiter or RateLimiter()
+        self._clients: Dict[str, httpx.AsyncClient] = {}
+
+    @classmethod
+    def from_settings(cls, settings=None) -> "HTTPClientPool":
+        settings = settings or get_settings()
+        return cls(
+            max_connections=settings.HTTP_MAX_CONNECTIONS,
+            max_keepalive_connections=settings.HTTP_MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=settings.HTTP_KEEPALIVE_EXPIRY,
+            http2=settings.HTTP2_ENABLED,
+            timeout=settings.HTTP_DEFAULT_TIMEOUT,
+            rate_limiter=RateLimiter(
+                rates={"https://api.github.com": settings.GITHUB_RATE_LIMIT_RPS},
+                burst=settings.RATE_LIMIT_BURST,
+                max_retries=settings.RATE_LIMIT_MAX_RETRIES,
+                max_wait=settings.RATE_LIMIT_MAX_WAIT,
+            ),
+        )
+
+    @staticmethod
+    def _origin(url: str) -> str:
+        parts = urlsplit(str(url))
+        return f"{parts.scheme}://{parts.netloc}".lower()
+
+    def client_for(self, url: str) -> httpx.AsyncClient:
+        """
+        Return the shared client for the origin of `url`, creating it on first use.
+        """
+        origin = self._origin(url)
+        client = self._clients.get(origin)
+        if client is None or client.is_closed:
+            transport = RateLimitedTransport(
+                httpx.AsyncHTTPTransport(http2=self.http2, limits=self.limits),
+                self.rate_limiter.budget(origin),
+                self.rate_limiter,
+            )
+            client = httpx.AsyncClient(transport=transport, timeout=self.timeout)
+            self._clients[origin] = client
+            logger.debug(f"🔌 Opened pooled client for {origin} (http2={self.http2})")
+        return client
+
+    async def aclose(self) -> None:
+        for origin, client in self._clients.items():
+            await client.aclose()
+            logger.debug(f"🔌 Closed pooled client for {origin}")
+        self._clients.clear()
+
+
+_pool: Optional[HTTPClientPool] = None
+
+
+def get_http_pool() -> HTTPClientPool:
+    """
+    Returns the process-wide client pool, creating it from settings on first use.
+    """
+    global _pool
+    if _pool is None:
+        _pool = HTTPClientPool.from_settings()
+    return _pool
+
+
+async def close_http_pool() -> None:
+    global _pool
+    if _pool is not None:
+        await _pool.aclose()
+        _pool = None
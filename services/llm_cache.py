@@ -0,0 +1,143 @@
+import os
+import json
+import time
+import hashlib
+import logging
+import tempfile
+from pathlib import Path
+from typing import Dict, Optional
+
+from utils.config import get_settings
+
+logger = logging.getLogger("llm_agent.services.llm_cache")
+
+
+class LLMResponseCache:
+    """
+    Content-addressed, disk-backed cache of parsed LLM outputs ({filename: content}).
+
+    Keys hash (provider, model, normalized prompt). Entries expire after `ttl_seconds`
+    and the store is trimmed least-recently-used first (by file mtime, bumped on
+    every hit) whenever it exceeds `max_entries` or `max_bytes`.
+    """
+
+    def __init__(
+        self,
+        cache_dir: str = "data/llm_cache",
+        ttl_seconds: int = 86400,
+        max_entries: int = 500,
+        max_bytes: int = 256 * 1024 * 1024,
+        enabled: bool = True,
+    ):
+        self.cache_dir = Path(cache_dir)
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.enabled = enabled
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        if self.enabled:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+
+    @staticmethod
+    def normalize_prompt(prompt: str) -> str:
+        """Normalize line endings and trailing whitespace so cosmetic diffs share a key."""
+        lines = prompt.replace("\r\n", "\n").replace("\r", "\n").split("\n")
+        return "\n".join(line.rstrip() for line in lines).strip()
+
+    def make_key(self, provider: str, model: str, prompt: str) -> str:
+        digest = hashlib.sha256()
+        for part in (provider, model, self.normalize_prompt(prompt)):
+            digest.update(part.encode("utf-8"))
+            digest.update(b"\0")
+        return digest.hexdigest()
+
+    def _path(self, key: str) -> Path:
+        return self.cache_dir / key[:2] / f"{key}.json"
+
+    def get(self, key: str) -> Optional[Dict[str, str]]:
+        if not self.enabled:
+            return None
+        path = self._path(key)
+        try:
+            entry = json.loads(path.read_text(encoding="utf-8"))
+        except (FileNotFoundError, ValueError):
+            self.misses += 1
+            return None
+
+        if time.time() - entry.get("created_at", 0) > self.ttl_seconds:
+            path.unlink(missing_ok=True)
+            self.misses += 1
+            return None
+
+        os.utime(path)  # mark as recently used
+        self.hits += 1
+        logger.info(f"🗃️ LLM cache hit ({entry.get('provider')}/{entry.get('model')}) {key[:12]}")
+        return entry["files"]
+
+    def set(self, key: str, files: Dict[str, str], provider: str = "", model: str = "") -> None:
+        if not self.enabled:
+            return
+        path = self._path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        entry = {"provider": provider, "model": model, "created_at": time.time(), "files": files}
+
+        # Write atomically so concurrent readers never see a partial entry
+        fd, tmp = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(entry, f, ensure_ascii=False)
+        os.replace(tmp, path)
+        self._evict()
+
+    def _evict(self) -> None:
+        entries = []
+        for path in self.cache_dir.glob("*/*.json"):
+            try:
+                st = path.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((st.st_mtime, st.st_size, path))
+        entries.sort()
+
+        total_bytes = sum(size for _, size, _ in entries)
+        now = time.time()
+        while entries and (
+            len(entries) > self.max_entries
+            or total_bytes > self.max_bytes
+            or now - entries[0][0] > self.ttl_seconds
+        ):
+            _, size, path = entries.pop(0)
+            path.unlink(missing_ok=True)
+            total_bytes -= size
+            self.evictions += 1
+
+    def stats(self) -> Dict[str, float]:
+        lookups = self.hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+        }
+
+
+_cache: Optional[LLMResponseCache] = None
+
+
+def get_llm_cache() -> LLMResponseCache:
+    """
+    Returns the process-wide LLM response cache configured from settings.
+    """
+    global _cache
+    if _cache is None:
+        settings = get_settings()
+        _cache = LLMResponseCache(
+            cache_dir=settings.LLM_CACHE_DIR,
+            ttl_seconds=settings.LLM_CACHE_TTL_SECONDS,
+            max_entries=settings.LLM_CACHE_MAX_ENTRIES,
+            max_bytes=settings.LLM_CACHE_MAX_BYTES,
+            enabled=settings.LLM_CACHE_ENABLED,
+        )
+    return _cache
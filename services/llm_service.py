@@ -1,14 +1,25 @@
 import logging
 import os
 import json
+import time
+import asyncio
+from contextvars import ContextVar
 from pathlib import Path
-from typing import Dict, List
+from typing import Awaitable, Callable, Dict, Iterable, List, Optional, Tuple
 from openai import OpenAI
 import httpx
 
 from utils.attachment import decode_attachments, summarize_attachment_meta, _strip_code_block, generate_readme_fallback, prepare_attachments_for_prompt
-from utils.json_parser import parse_aipipe_response
+from utils.json_parser import parse_aipipe_response, parse_assistant_text
+from utils.stream_parser import IncrementalFileParser
 from models.request_models import Attachment
+from services.http_clients import HTTPClientPool, get_http_pool
+from services.llm_cache import LLMResponseCache, get_llm_cache
+from services.hedging import HedgePolicy, get_hedge_policy
+from services.circuit_breaker import BreakerRegistry, get_breaker_registry
+from services.prompt_registry import AssembledPrompt, PromptBuilder, PromptRegistry, estimate_tokens, get_prompt_registry
+from services.prompt_budget import PromptBudget
+from utils.metrics import LLM_FALLBACKS, get_metrics, time_stage
 
 logger = logging.getLogger("llm_agent.services.llm_service")
 
@@ -16,6 +27,30 @@ from utils.config import get_settings
 settings = get_settings()
 
 api_base = str(settings.AIPIPE_URL)  # correct URL from .env
+AIPIPE_MODEL = "gpt-4o"
+# e.g. ".../models/gemini-2.5-flash:generateContent" -> "gemini-2.5-flash"
+gemini_model = str(settings.GEMINI_BASE_URL).rsplit("/models/", 1)[-1].split(":", 1)[0]
+
+
+class LLMProviderError(Exception):
+    """Raised when a provider answers but returns nothing usable."""
+
+
+# Called with (filename, content) as soon as a generated file is complete
+FileCallback = Callable[[str, str], Awaitable[None]]
+
+# The service is shared across concurrent jobs, so the last prompt is tracked per task
+_last_prompt: ContextVar[Optional[AssembledPrompt]] = ContextVar("llm_last_prompt", default=None)
+
+_metrics = get_metrics()
+_request_seconds = _metrics.histogram(
+    "llm_request_duration_seconds", "LLM provider round-trips (cache hits excluded).", ["provider", "outcome"]
+)
+_prompt_bytes = _metrics.counter("llm_prompt_bytes_total", "Prompt bytes sent to each provider.", ["provider"])
+_prompt_tokens = _metrics.counter("llm_prompt_tokens_total", "Estimated prompt tokens sent to each provider.", ["provider"])
+_response_bytes = _metrics.counter("llm_response_bytes_total", "Bytes of parsed files returned by each provider.", ["provider"])
+_response_tokens = _metrics.counter("llm_response_tokens_total", "Estimated tokens of parsed files returned by each provider.", ["provider"])
+
 
 class LLMService:
     """
@@ -26,16 +61,72 @@ class LLMService:
     Generates code scaffolds or refactors existing files.
     """
 
-    def __init__(self, prompts_dir: str = "templates/prompts"):
+    def __init__(
+        self,
+        prompts_dir: str = "templates/prompts",
+        http_pool: Optional[HTTPClientPool] = None,
+        cache: Optional[LLMResponseCache] = None,
+        streaming: Optional[bool] = None,
+        hedging: Optional[HedgePolicy] = None,
+        breakers: Optional[BreakerRegistry] = None,
+        prompts: Optional[PromptRegistry] = None,
+    ):
         self.prompts_dir = Path(prompts_dir)
+        self.prompts = prompts or get_prompt_registry(prompts_dir)
         #self.client = OpenAI(api_key=os.getenv("LLM_API_KEY"))
         self.client = None
+        self.http_pool = http_pool or get_http_pool()
+        self.cache = cache or get_llm_cache()
+        self.streaming = settings.LLM_STREAMING_ENABLED if streaming is None else streaming
+        self.hedging = hedging or get_hedge_policy()
+        self.breakers = breakers or get_breaker_registry()
+
+    @property
+    def last_prompt(self) -> Optional[AssembledPrompt]:
+        """The prompt most recently assembled by the current task (job)."""
+        return _last_prompt.get()
 
     def load_prompt(self, prompt_name: str) -> str:
-        prompt_path = self.prompts_dir / prompt_name
-        if not prompt_path.exists():
-            raise FileNotFoundError(f"Prompt file not found: {prompt_name}")
-        return prompt_path.read_text(encoding="utf-8")
+        return self.prompts.text(prompt_name)
+
+    def _prompt_builder(self, mode_prompt: str) -> PromptBuilder:
+        """
+        Start a prompt with the static templates (identical across requests, so
+        providers can reuse their prefix cache).
+        """
+        return self.prompts.builder([
+            ("base_prompt.txt", None),
+            (mode_prompt, None),
+            ("readme_prompt.txt", "README.md updation"),
+        ])
+
+    def _assemble_prompt(
+        self,
+        builder: PromptBuilder,
+        sections: List[Tuple[str, str, str]],
+        budget: Optional[PromptBudget] = None,
+    ) -> str:
+        """
+        Append the per-request (name, header, body) sections and render the prompt.
+        The size breakdown and any budget cuts are kept in `last_prompt`.
+        """
+        for name, header, body in sections:
+            builder.add(name, body, header)
+        assembled = builder.build()
+        if budget is not None:
+            assembled.budget = budget.report.budget
+            assembled.cuts = dict(budget.report.cuts)
+        _last_prompt.set(assembled)
+
+        breakdown = ", ".join(f"{s.name}={s.bytes}B/{s.tokens}t" for s in assembled.sections)
+        logger.info(f"🧾 Prompt {assembled.total_bytes}B/~{assembled.total_tokens} tokens ({breakdown})")
+        return assembled.text
+
+    def _start_budget(self, builder: PromptBuilder, *bodies: str) -> PromptBudget:
+        """Budget for the variable sections after the static prefix and `bodies`."""
+        budget = PromptBudget(settings.LLM_PROMPT_TOKEN_BUDGET)
+        budget.spend(builder.tokens + sum(estimate_tokens(body) for body in bodies))
+        return budget
 
     def _ensure_str_dict(self, data: dict) -> Dict[str, str]:
         """
@@ -44,123 +135,383 @@ class LLMService:
         """
         return {k: v if isinstance(v, str) else json.dumps(v, ensure_ascii=False) for k, v in data.items()}
 
+    async def _call_gemini(self, combined_prompt: str) -> Dict[str, str]:
+        """Gemini request using simplified parsing. Raises LLMProviderError if no files come back."""
+        url = f"{settings.GEMINI_BASE_URL}?key={settings.GEMINI_API_KEY}"
+        payload = {
+            "contents": [{"parts": [{"text": combined_prompt}]}],
+            "systemInstruction": {
+                "parts": [{"text": "You are a helpful coding assistant that outputs runnable web apps. Return JSON with `filename`: `file content`"}]
+            },
+            "generationConfig": {"responseMimeType": "application/json"}
+        }
+
+        client = self.http_pool.client_for(url)
+        response = await client.post(url, json=payload, timeout=120)
+        response.raise_for_status()
+        raw_result = response.json()
+
+        generated_files_local: Dict[str, str] = {}
+
+        # Gemini now returns all files inside a single JSON string
+        with time_stage("parse"):
+            for candidate in raw_result.get("candidates", []):
+                parts = candidate.get("content", {}).get("parts", [])
+                if parts:
+                    try:
+                        files_dict = json.loads(parts[0]["text"])
+                        if isinstance(files_dict, dict):
+                            generated_files_local.update(files_dict)
+                    except json.JSONDecodeError as e:
+                        logger.warning(f"Failed to parse Gemini response JSON: {e}")
+
+        if not generated_files_local:
+            raise LLMProviderError("Gemini returned no files")
+        return self._ensure_str_dict(generated_files_local)
+
+    async def _call_aipipe(self, combined_prompt: str) -> Dict[str, str]:
+        """AIPipe (OpenAI Responses API) request. Raises LLMProviderError on an unusable response."""
+        client = self.http_pool.client_for(api_base)
+        response = await client.post(
+            api_base,
+            headers={
+                "Authorization": f"Bearer {settings.LLM_API_KEY}",
+                "Content-Type": "application/json",
+            },
+            json={
+                "model": AIPIPE_MODEL,
+                "input": [
+                    {
+                        "role": "system",
+                        "content": "You are a helpful coding assistant that outputs runnable web apps.",
+                    },
+                    {"role": "user", "content": combined_prompt},
+                ],
+            },
+            timeout=httpx.Timeout(240.0, read=240.0),
+        )
+
+        if response.status_code != 200 or not response.text.strip():
+            raise LLMProviderError(f"AIPipe response invalid ({response.status_code})")
+
+        with time_stage("parse"):
+            parsed_output = parse_aipipe_response(response.text)
+        if not parsed_output:
+            raise LLMProviderError("AIPipe response could not be parsed")
+        return self._ensure_str_dict(parsed_output)
+
+    async def _feed_stream(self, parser: IncrementalFileParser, chunk: str, files: Dict[str, str], on_file: FileCallback) -> None:
+        for filename, content in parser.feed(chunk):
+            files[filename] = content
+            await on_file(filename, content)
+
+    def _finish_stream(self, provider: str, parser: IncrementalFileParser, files: Dict[str, str], completed: bool) -> Dict[str, str]:
+        """
+        Accept a stream only if the JSON object was closed or the provider reported
+        completion; a dropped or length-cut stream raises so it is neither used nor
+        cached. Falls back to whole-text parsing if nothing parsed incrementally.
+        """
+        if not (parser.done or completed):
+            raise LLMProviderError(f"{provider} stream ended before the response was complete ({len(files)} file(s) received)")
+        if not files and parser.full_text.strip():
+            with time_stage("parse"):
+                files = parse_assistant_text(parser.full_text)
+        if not files:
+            raise LLMProviderError(f"{provider} stream returned no files")
+        return self._ensure_str_dict(files)
+
+    async def _stream_aipipe(self, combined_prompt: str, on_file: FileCallback) -> Dict[str, str]:
+        """Streaming AIPipe request (Responses API server-sent events)."""
+        parser = IncrementalFileParser()
+        files: Dict[str, str] = {}
+        client = self.http_pool.client_for(api_base)
+        async with client.stream(
+            "POST",
+            api_base,
+            headers={
+                "Authorization": f"Bearer {settings.LLM_API_KEY}",
+                "Content-Type": "application/json",
+                "Accept": "text/event-stream",
+            },
+            json={
+                "model": AIPIPE_MODEL,
+                "stream": True,
+                "input": [
+                    {
+                        "role": "system",
+                        "content": "You are a helpful coding assistant that outputs runnable web apps.",
+                    },
+                    {"role": "user", "content": combined_prompt},
+                ],
+            },
+            timeout=httpx.Timeout(240.0, read=240.0),
+        ) as response:
+            if response.status_code != 200:
+                await response.aread()
+                raise LLMProviderError(f"AIPipe stream invalid ({response.status_code})")
+            completed = False
+            async for line in response.aiter_lines():
+                if not line.startswith("data:"):
+                    continue
+                data = line[5:].strip()
+                if not data or data == "[DONE]":
+                    continue
+                event = json.loads(data)
+                event_type = event.get("type", "")
+                if event_type == "response.output_text.delta":
+                    await self._feed_stream(parser, event.get("delta", ""), files, on_file)
+                elif event_type == "response.completed":
+                    completed = True
+                elif event_type == "response.incomplete":
+                    reason = ((event.get("response") or {}).get("incomplete_details") or {}).get("reason", "unknown")
+                    raise LLMProviderError(f"AIPipe stream incomplete ({reason})")
+                elif event_type in ("response.failed", "error"):
+                    raise LLMProviderError(f"AIPipe stream failed: {data[:200]}")
+
+        return self._finish_stream("AIPipe", parser, files, completed)
+
+    async def _stream_gemini(self, combined_prompt: str, on_file: FileCallback) -> Dict[str, str]:
+        """Streaming Gemini request (streamGenerateContent with alt=sse)."""
+        stream_base = str(settings.GEMINI_BASE_URL).replace(":generateContent", ":streamGenerateContent")
+        url = f"{stream_base}?alt=sse&key={settings.GEMINI_API_KEY}"
+        payload = {
+            "contents": [{"parts": [{"text": combined_prompt}]}],
+            "systemInstruction": {
+                "parts": [{"text": "You are a helpful coding assistant that outputs runnable web apps. Return JSON with `filename`: `file content`"}]
+            },
+            "generationConfig": {"responseMimeType": "application/json"}
+        }
+
+        parser = IncrementalFileParser()
+        files: Dict[str, str] = {}
+        client = self.http_pool.client_for(url)
+        async with client.stream("POST", url, json=payload, timeout=120) as response:
+            if response.status_code != 200:
+                await response.aread()
+                raise LLMProviderError(f"Gemini stream invalid ({response.status_code})")
+            finish_reason = None
+            async for line in response.aiter_lines():
+                if not line.startswith("data:"):
+                    continue
+                chunk = json.loads(line[5:].strip() or "{}")
+                for candidate in chunk.get("candidates", [])[:1]:
+                    for part in candidate.get("content", {}).get("parts", []):
+                        await self._feed_stream(parser, part.get("text", ""), files, on_file)
+                    finish_reason = candidate.get("finishReason", finish_reason)
+
+        if finish_reason not in (None, "STOP") and not parser.done:
+            raise LLMProviderError(f"Gemini stream stopped early ({finish_reason})")
+        return self._finish_stream("Gemini", parser, files, finish_reason == "STOP")
+
+    async def _call_provider(
+        self,
+        provider: str,
+        combined_prompt: str,
+        bypass_cache: bool = False,
+        on_file: Optional[FileCallback] = None,
+    ) -> Dict[str, str]:
+        """
+        Serve a provider call from the response cache when possible, otherwise
+        call the provider (streaming if enabled and a callback is given) and store
+        its parsed files. `on_file` only sees files parsed from a live stream;
+        cached and non-streamed responses are returned whole for the caller to persist.
+        """
+        model = AIPIPE_MODEL if provider == "aipipe" else gemini_model
+        key = self.cache.make_key(provider, model, combined_prompt)
+        files = None
+        if not bypass_cache:
+            files = await asyncio.to_thread(self.cache.get, key)
+
+        if files is None:
+            start = time.perf_counter()
+            try:
+                with self.breakers.get(provider).guard():
+                    if on_file is not None and self.streaming:
+                        stream = self._stream_aipipe if provider == "aipipe" else self._stream_gemini
+                        files = await stream(combined_prompt, on_file)
+                    else:
+                        call = self._call_aipipe if provider == "aipipe" else self._call_gemini
+                        files = await call(combined_prompt)
+            except asyncio.CancelledError:
+                _request_seconds.observe(time.perf_counter() - start, provider=provider, outcome="cancelled")
+                raise
+            except Exception:
+                _request_seconds.observe(time.perf_counter() - start, provider=provider, outcome="error")
+                raise
+            # Only real provider round-trips feed the hedge latency window
+            self.hedging.record_latency(provider, time.perf_counter() - start)
+            self._record_round_trip(provider, combined_prompt, files, time.perf_counter() - start)
+            await asyncio.to_thread(self.cache.set, key, files, provider, model)
+        return files
+
+    @staticmethod
+    def _record_round_trip(provider: str, combined_prompt: str, files: Dict[str, str], seconds: float) -> None:
+        """Export latency and prompt/response sizes for one successful provider call."""
+        _request_seconds.observe(seconds, provider=provider, outcome="ok")
+        assembled = _last_prompt.get()
+        # Reuse the count from prompt assembly rather than tokenizing the prompt again
+        if assembled is not None and assembled.text == combined_prompt:
+            prompt_tokens = assembled.total_tokens
+        else:
+            prompt_tokens = estimate_tokens(combined_prompt)
+        _prompt_bytes.inc(len(combined_prompt.encode("utf-8")), provider=provider)
+        _prompt_tokens.inc(prompt_tokens, provider=provider)
+        _response_bytes.inc(sum(len(content.encode("utf-8")) for content in files.values()), provider=provider)
+        _response_tokens.inc(sum(estimate_tokens(content) for content in files.values()), provider=provider)
+
+    @staticmethod
+    async def _cancel_all(tasks: Dict[asyncio.Task, str]) -> None:
+        for task in tasks:
+            task.cancel()
+        if tasks:
+            await asyncio.gather(*tasks, return_exceptions=True)
+        tasks.clear()
+
+    async def _race_providers(
+        self,
+        providers: List[str],
+        combined_prompt: str,
+        bypass_cache: bool = False,
+        on_file: Optional[FileCallback] = None,
+    ) -> Dict[str, str]:
+        """
+        Call the primary provider and, if it has not answered within the hedge
+        delay (or fails outright), start the secondary in parallel. The first
+        valid file dict wins and the other call is cancelled.
+
+        Only the primary streams into `on_file`; a winning secondary's files are
+        just returned.
+        """
+        primary, secondaries = providers[0], list(providers[1:])
+        delay = self.hedging.hedge_delay(primary) if secondaries else None
+        started = time.perf_counter()
+        tasks: Dict[asyncio.Task, str] = {
+            asyncio.create_task(self._call_provider(primary, combined_prompt, bypass_cache, on_file)): primary
+        }
+        hedged = fallback = False
+        errors: List[str] = []
+
+        def launch_secondary() -> None:
+            provider = secondaries.pop(0)
+            task = asyncio.create_task(self._call_provider(provider, combined_prompt, bypass_cache))
+            tasks[task] = provider
+
+        try:
+            while tasks:
+                timeout = None
+                if secondaries and delay is not None:
+                    timeout = max(0.0, delay - (time.perf_counter() - started))
+                done, _ = await asyncio.wait(tasks, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+
+                if not done:
+                    logger.info(f"⏱️ {primary} still running after {delay:.1f}s; hedging with {secondaries[0]}")
+                    hedged = True
+                    LLM_FALLBACKS.inc(kind="hedge")
+                    launch_secondary()
+                    continue
+
+                for task in done:
+                    provider = tasks.pop(task)
+                    try:
+                        files = task.result()
+                    except Exception as e:
+                        errors.append(f"{provider}: {e!r}")
+                        logger.warning(f"{provider} request failed: {repr(e)}")
+                        if secondaries and not tasks:
+                            fallback = True
+                            LLM_FALLBACKS.inc(kind="provider")
+                            launch_secondary()
+                        continue
+
+                    logger.info(f"✅ Generated code using {provider} in {time.perf_counter() - started:.1f}s"
+                                f"{' (hedged)' if hedged else ''}.")
+                    self.hedging.record_outcome(primary, provider, hedged, fallback)
+                    # Stop the loser so it cannot keep streaming over the winner's files
+                    await self._cancel_all(tasks)
+                    return files
+        finally:
+            await self._cancel_all(tasks)
+
+        self.hedging.record_outcome(primary, None, hedged, fallback)
+        raise LLMProviderError("; ".join(errors) or "No LLM provider available")
+
+    async def _generate_files(
+        self,
+        combined_prompt: str,
+        bypass_cache: bool = False,
+        on_file: Optional[FileCallback] = None,
+        scaffold: bool = True,
+    ) -> Dict[str, str]:
+        """
+        Send the assembled prompt to AIPipe, hedging with Gemini when AIPipe is
+        slow or failing, and fall back to a minimal scaffold if both providers fail
+        (or raise LLMProviderError when `scaffold` is False).
+        Providers with an open circuit breaker are skipped.
+        """
+        providers = ["aipipe", "gemini"]
+        if not api_base:
+            logger.warning("LLM API base URL not configured. Falling back to Gemini.")
+            providers = ["gemini"]
+
+        # Skip providers whose circuit is open so outages cost no time
+        healthy = [p for p in providers if self.breakers.get(p).available()]
+        for provider in set(providers) - set(healthy):
+            logger.warning(f"Skipping {provider}: circuit open")
+        try:
+            if not healthy:
+                raise LLMProviderError("No LLM provider available")
+            return await self._race_providers(healthy, combined_prompt, bypass_cache, on_file)
+        except Exception as e:
+            if not scaffold:
+                raise
+            logger.warning(f"All LLM providers failed: {repr(e)}. Returning minimal scaffold.")
+            LLM_FALLBACKS.inc(kind="scaffold")
+            return {"main.py": "# Fallback minimal scaffold\nprint('Hello World')"}
+
     async def generate_code(
         self,
         task: str,
         brief: str,
         checks: List[str],
         attachments: List[Attachment],
+        bypass_cache: bool = False,
+        on_file: Optional[FileCallback] = None,
+        decoded_attachments: Optional[List[dict]] = None,
     ) -> Dict[str, str]:
         """
         Generate a code scaffold from task + brief + checks + attachments.
         Returns a dict {filename: content} with guaranteed str values.
+        Set `bypass_cache` to force a fresh model call (the result is still cached).
+        When streaming, `on_file(filename, content)` is awaited as each file is parsed.
+        Pass `decoded_attachments` (from decode_attachments) to avoid decoding again.
         """
 
-        # Convert attachments to usable metadata
-        saved_attachments = decode_attachments([att.dict() for att in attachments])
-        #attachments_meta = summarize_attachment_meta(saved_attachments)
-
-        # Load prompts
-        base_prompt = self.load_prompt("base_prompt.txt")
-        webapp_prompt = self.load_prompt("webapp_prompt.txt")
-        readme_prompt = self.load_prompt("readme_prompt.txt")
-
-        # Format checks and attachments
-        formatted_checks = "\n".join(f"- {c}" for c in checks)
-        formatted_attachments = prepare_attachments_for_prompt(saved_attachments)
-        if not formatted_attachments.strip():
-            formatted_attachments = "(no attachments)"
-
-        # Combine into full prompt
-        combined_prompt = (
-            f"{base_prompt}\n\n{webapp_prompt}\n\n"
-            f"Task:\n{task}\n\n"
-            f"Brief:\n{brief}\n\n"
-            f"Checks:\n{formatted_checks}\n\n"
-            f"Attachments:\n{formatted_attachments}\n\n"
-            f"README.md updation:\n{readme_prompt}\n\n"
-        )
-
-        generated_files: Dict[str, str]
-
-        async def gemini_fallback() -> Dict[str, str]:
-            """Inline Gemini fallback for failed AIPipe requests using simplified parsing."""
-            try:
-                import httpx
+        with time_stage("prompt_build"):
+            # Convert attachments to usable metadata
+            saved_attachments = decoded_attachments
+            if saved_attachments is None:
+                saved_attachments = await asyncio.to_thread(decode_attachments, [att.dict() for att in attachments])
+            #attachments_meta = summarize_attachment_meta(saved_attachments)
+
+            # Format checks and attachments within the prompt token budget
+            builder = self._prompt_builder("webapp_prompt.txt")
+            formatted_checks = "\n".join(f"- {c}" for c in checks)
+            budget = self._start_budget(builder, task, brief, formatted_checks)
+            formatted_attachments = prepare_attachments_for_prompt(
+                saved_attachments, max_chars=budget.attachment_char_limit(len(saved_attachments), share=1.0)
+            )
+            if not formatted_attachments.strip():
+                formatted_attachments = "(no attachments)"
 
-                url = f"{settings.GEMINI_BASE_URL}?key={settings.GEMINI_API_KEY}"
-                payload = {
-                    "contents": [{"parts": [{"text": combined_prompt}]}],
-                    "systemInstruction": {
-                        "parts": [{"text": "You are a helpful coding assistant that outputs runnable web apps. Return JSON with `filename`: `file content`"}]
-                    },
-                    "generationConfig": {"responseMimeType": "application/json"}
-                }
-
-                async with httpx.AsyncClient(timeout=120) as client:
-                    response = await client.post(url, json=payload)
-                    response.raise_for_status()
-                    raw_result = response.json()
-
-                generated_files_local: Dict[str, str] = {}
-
-                # Gemini now returns all files inside a single JSON string
-                for candidate in raw_result.get("candidates", []):
-                    parts = candidate.get("content", {}).get("parts", [])
-                    if parts:
-                        try:
-                            files_dict = json.loads(parts[0]["text"])
-                            if isinstance(files_dict, dict):
-                                generated_files_local.update(files_dict)
-                        except json.JSONDecodeError as e:
-                            logger.warning(f"Failed to parse Gemini response JSON: {e}")
-
-                if not generated_files_local:
-                    # minimal fallback
-                    generated_files_local["main.py"] = "# Fallback minimal scaffold\nprint('Hello World')"
-
-                return generated_files_local
-
-            except Exception as e:
-                logger.warning(f"Gemini fallback failed: {repr(e)}. Returning minimal scaffold.")
-                return {"main.py": "# Fallback minimal scaffold\nprint('Hello World')"}
-
-        # --- AIPipe logic unchanged ---
-        if not api_base:
-            logger.warning("LLM API base URL not configured. Falling back to Gemini.")
-            generated_files = await gemini_fallback()
-        else:
-            try:
-                async with httpx.AsyncClient(timeout=httpx.Timeout(240.0, read=240.0)) as client:
-                    response = await client.post(
-                        api_base,
-                        headers={
-                            "Authorization": f"Bearer {settings.LLM_API_KEY}",
-                            "Content-Type": "application/json",
-                        },
-                        json={
-                            "model": "gpt-4o",
-                            "input": [
-                                {
-                                    "role": "system",
-                                    "content": "You are a helpful coding assistant that outputs runnable web apps.",
-                                },
-                                {"role": "user", "content": combined_prompt},
-                            ],
-                        },
-                    )
-
-                    if response.status_code != 200 or not response.text.strip():
-                        logger.warning(f"AIPipe response invalid ({response.status_code}). Falling back to Gemini.")
-                        generated_files = await gemini_fallback()
-                    else:
-                        parsed_output = parse_aipipe_response(response.text)
-                        generated_files = self._ensure_str_dict(parsed_output)
-                        logger.info("✅ Generated code using AIPipe API.")
+            # Combine into full prompt
+            combined_prompt = self._assemble_prompt(builder, [
+                ("task", "Task", task),
+                ("brief", "Brief", brief),
+                ("checks", "Checks", formatted_checks),
+                ("attachments", "Attachments", formatted_attachments),
+            ], budget)
 
-            except Exception as e:
-                logger.warning(f"AIPipe request failed: {repr(e)}. Falling back to Gemini.")
-                generated_files = await gemini_fallback()
+        generated_files = await self._generate_files(combined_prompt, bypass_cache, on_file)
 
         # Ensure README.md exists
         if "README.md" not in generated_files:
@@ -175,124 +526,97 @@ class LLMService:
         return generated_files
 
 
-    async def refactor_code(
+    async def _revision_prompt(
         self,
+        mode_prompt: str,
         existing_files: Dict[str, str],
         task: str,
         brief: str,
         checks: List[str],
         attachments: List[Attachment],
-    ) -> Dict[str, str]:
+        decoded_attachments: Optional[List[dict]] = None,
+        attachment_names: Optional[Iterable[str]] = None,
+    ) -> Tuple[str, str]:
         """
-        Refactor existing code based on new brief + checks + attachments.
-        Returns updated files {filename: content}.
+        Build a round 2+ prompt around `existing_files`.
+        Returns (combined prompt, formatted attachments).
         """
 
         # Convert attachments to usable metadata
-        saved_attachments = decode_attachments([att.dict() for att in attachments])
+        saved_attachments = decoded_attachments
+        if saved_attachments is None:
+            saved_attachments = await asyncio.to_thread(decode_attachments, [att.dict() for att in attachments])
         #attachments_meta = summarize_attachment_meta(saved_attachments)
 
-        # Load prompts
-        base_prompt = self.load_prompt("base_prompt.txt")
-        refactor_prompt = self.load_prompt("refactor_prompt.txt")
-        readme_prompt = self.load_prompt("readme_prompt.txt")
-
-        # Format checks, attachments, and existing files
+        # Format checks, attachments, and existing files within the prompt token budget.
+        # Attachments get at most a quarter of what is left; existing files get the rest.
+        builder = self._prompt_builder(mode_prompt)
         formatted_checks = "\n".join(f"- {c}" for c in checks)
-        formatted_attachments = prepare_attachments_for_prompt(saved_attachments)
+        budget = self._start_budget(builder, task, brief, formatted_checks)
+        formatted_attachments = prepare_attachments_for_prompt(
+            saved_attachments, max_chars=budget.attachment_char_limit(len(saved_attachments))
+        )
         if not formatted_attachments.strip():
             formatted_attachments = "(no attachments)"
-        existing_files_formatted = "\n".join(f"### {fname} ###\n{content}\n" for fname, content in existing_files.items())
-
-        # Combine into full prompt
-        combined_prompt = (
-            f"{base_prompt}\n\n{refactor_prompt}\n\n"
-            f"Task:\n{task}\n\n"
-            f"Brief:\n{brief}\n\n"
-            f"Checks:\n{formatted_checks}\n\n"
-            f"Attachments:\n{formatted_attachments}\n\n"
-            f"Existing Files:\n{existing_files_formatted}\n\n"
-            f"README.md updation:\n{readme_prompt}\n\n"
-        )
-
-        updated_files: Dict[str, str]
-
-        async def gemini_fallback() -> Dict[str, str]:
-            """Inline Gemini fallback for failed AIPipe requests using simplified parsing."""
-            try:
-                import httpx
+        budget.spend(estimate_tokens(formatted_attachments))
 
-                url = f"{settings.GEMINI_BASE_URL}?key={settings.GEMINI_API_KEY}"
-                payload = {
-                    "contents": [{"parts": [{"text": combined_prompt}]}],
-                    "systemInstruction": {
-                        "parts": [{"text": "You are a helpful coding assistant that outputs runnable web apps. Return JSON with `filename`: `file content`"}]
-                    },
-                    "generationConfig": {"responseMimeType": "application/json"}
-                }
-
-                async with httpx.AsyncClient(timeout=120) as client:
-                    response = await client.post(url, json=payload)
-                    response.raise_for_status()
-                    raw_result = response.json()
-
-                generated_files_local: Dict[str, str] = {}
-
-                for candidate in raw_result.get("candidates", []):
-                    parts = candidate.get("content", {}).get("parts", [])
-                    if parts:
-                        try:
-                            files_dict = json.loads(parts[0]["text"])
-                            if isinstance(files_dict, dict):
-                                generated_files_local.update(files_dict)
-                        except json.JSONDecodeError as e:
-                            logger.warning(f"Failed to parse Gemini response JSON: {e}")
+        skip = set(attachment_names or ()) | {att["name"] for att in saved_attachments}
+        existing_files_formatted = budget.fit_existing_files(existing_files, skip)
+        budget.log(task)
 
-                if not generated_files_local:
-                    generated_files_local["main.py"] = "# Fallback minimal scaffold\nprint('Hello World')"
+        # Combine into full prompt
+        combined_prompt = self._assemble_prompt(builder, [
+            ("task", "Task", task),
+            ("brief", "Brief", brief),
+            ("checks", "Checks", formatted_checks),
+            ("attachments", "Attachments", formatted_attachments),
+            ("existing_files", "Existing Files", existing_files_formatted),
+        ], budget)
+        return combined_prompt, formatted_attachments
 
-                return generated_files_local
+    async def refactor_code(
+        self,
+        existing_files: Dict[str, str],
+        task: str,
+        brief: str,
+        checks: List[str],
+        attachments: List[Attachment],
+        bypass_cache: bool = False,
+        on_file: Optional[FileCallback] = None,
+        decoded_attachments: Optional[List[dict]] = None,
+        attachment_names: Optional[Iterable[str]] = None,
+    ) -> Dict[str, str]:
+        """
+        Refactor existing code based on new brief + checks + attachments.
+        Returns updated files {filename: content}.
+        Existing files are fitted to LLM_PROMPT_TOKEN_BUDGET: binaries and
+        `attachment_names` (attachments from earlier rounds) are left out and
+        large files may be reduced to outlines. Outlined files keep their
+        original content whatever the model returns for them.
+        Set `bypass_cache` to force a fresh model call (the result is still cached).
+        When streaming, `on_file(filename, content)` is awaited as each file is parsed.
+        Pass `decoded_attachments` (from decode_attachments) to avoid decoding again.
+        """
+        with time_stage("prompt_build"):
+            combined_prompt, formatted_attachments = await self._revision_prompt(
+                "refactor_prompt.txt", existing_files, task, brief, checks, attachments,
+                decoded_attachments, attachment_names,
+            )
+        outlined = self.last_prompt.outlined if self.last_prompt else set()
 
-            except Exception as e:
-                logger.warning(f"Gemini fallback failed: {repr(e)}. Returning minimal scaffold.")
-                return {"main.py": "# Fallback minimal scaffold\nprint('Hello World')"}
+        stream_to = on_file
+        if on_file is not None and outlined:
+            async def stream_to(filename: str, content: str) -> None:
+                if filename not in outlined:
+                    await on_file(filename, content)
 
-        # --- AIPipe logic unchanged ---
-        if not api_base:
-            logger.warning("LLM API base URL not configured. Falling back to Gemini.")
-            updated_files = await gemini_fallback()
-        else:
-            try:
-                async with httpx.AsyncClient(timeout=httpx.Timeout(240.0, read=240.0)) as client:
-                    response = await client.post(
-                        api_base,
-                        headers={
-                            "Authorization": f"Bearer {settings.LLM_API_KEY}",
-                            "Content-Type": "application/json",
-                        },
-                        json={
-                            "model": "gpt-4o",
-                            "input": [
-                                {
-                                    "role": "system",
-                                    "content": "You are a helpful coding assistant that outputs runnable web apps.",
-                                },
-                                {"role": "user", "content": combined_prompt},
-                            ],
-                        },
-                    )
-
-                    if response.status_code != 200 or not response.text.strip():
-                        logger.warning(f"AIPipe response invalid ({response.status_code}). Falling back to Gemini.")
-                        updated_files = await gemini_fallback()
-                    else:
-                        parsed_output = parse_aipipe_response(response.text)
-                        updated_files = self._ensure_str_dict(parsed_output)
-                        logger.info("✅ Generated code using AIPipe API.")
+        updated_files = await self._generate_files(combined_prompt, bypass_cache, stream_to)
 
-            except Exception as e:
-                logger.warning(f"AIPipe request failed: {repr(e)}. Falling back to Gemini.")
-                updated_files = await gemini_fallback()
+        # A file rebuilt from its outline would silently lose the omitted code
+        for filename in outlined:
+            if updated_files.get(filename, existing_files[filename]) != existing_files[filename]:
+                logger.warning(f"Keeping original {filename}; the model only saw it as an outline")
+            updated_files[filename] = existing_files[filename]
 
         # Ensure README.md exists
         if "README.md" not in updated_files:
@@ -305,3 +629,27 @@ class LLMService:
             updated_files["README.md"] = readme_content
 
         return updated_files
+
+    async def patch_code(
+        self,
+        existing_files: Dict[str, str],
+        task: str,
+        brief: str,
+        checks: List[str],
+        attachments: List[Attachment],
+        bypass_cache: bool = False,
+        decoded_attachments: Optional[List[dict]] = None,
+        attachment_names: Optional[Iterable[str]] = None,
+    ) -> Dict[str, str]:
+        """
+        Ask for the revision as edits rather than whole files.
+        Returns {filename: SEARCH/REPLACE blocks, or full content for new files},
+        covering only the files that change; apply with utils.patcher.
+        Raises LLMProviderError if no provider produced a response.
+        """
+        with time_stage("prompt_build"):
+            combined_prompt, _ = await self._revision_prompt(
+                "patch_prompt.txt", existing_files, task, brief, checks, attachments,
+                decoded_attachments, attachment_names,
+            )
+        return await self._generate_files(combined_prompt, bypass_cache, scaffold=False)
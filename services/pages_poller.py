@@ -0,0 +1,208 @@
+import time
+import random
+import asyncio
+import logging
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+from services.github_client import AsyncGitHubClient, GitHubAPIError
+from utils.config import get_settings
+from utils.metrics import get_metrics
+
+logger = logging.getLogger("llm_agent.services.pages_poller")
+
+_ready_seconds = get_metrics().histogram(
+    "pages_ready_duration_seconds", "Time from watching a deploy until Pages resolved, by final status.", ["status"]
+)
+
+
+@dataclass
+class PagesStatus:
+    """Outcome of waiting for a Pages deployment."""
+    ready: bool
+    status: str
+    seconds: float
+    polls: int
+    error: Optional[str] = None
+
+
+@dataclass
+class _Watch:
+    client: AsyncGitHubClient
+    owner: str
+    repo: str
+    commit_sha: str
+    pages_url: str
+    deadline: float  # monotonic
+    started: float = field(default_factory=time.monotonic)
+    next_poll: float = field(default_factory=time.monotonic)
+    delay: float = 0.0
+    polls: int = 0
+    status: str = "pending"
+    built: bool = False
+    waiters: List[asyncio.Future] = field(default_factory=list)
+
+
+class PagesReadinessPoller:
+    """
+    Waits for GitHub Pages deployments to go live.
+
+    All in-flight deploys are polled by one scheduler task. Each watch checks
+    `pages/builds/latest` until the build for its commit reports `built`, then
+    probes the site URL until it answers. Polls back off exponentially with
+    jitter from `initial_delay` to `max_delay`. Concurrent waits for the same
+    repo and commit share one watch.
+    """
+
+    def __init__(self, initial_delay: float = 2.0, max_delay: float = 30.0, timeout: float = 300.0):
+        self.initial_delay = initial_delay
+        self.max_delay = max_delay
+        self.timeout = timeout
+        self._watches: Dict[Tuple[str, str, str], _Watch] = {}
+        self._wakeup: Optional[asyncio.Event] = None
+        self._scheduler: Optional[asyncio.Task] = None
+        self.ready = 0
+        self.timed_out = 0
+        self.errored = 0
+
+    @classmethod
+    def from_settings(cls) -> "PagesReadinessPoller":
+        settings = get_settings()
+        return cls(
+            initial_delay=settings.PAGES_POLL_INITIAL_DELAY,
+            max_delay=settings.PAGES_POLL_MAX_DELAY,
+            timeout=settings.PAGES_READY_TIMEOUT,
+        )
+
+    async def wait_until_live(
+        self,
+        client: AsyncGitHubClient,
+        owner: str,
+        repo: str,
+        commit_sha: str,
+        pages_url: str,
+        timeout: Optional[float] = None,
+    ) -> PagesStatus:
+        """Resolve once `commit_sha` is built and served at `pages_url`, or the deadline passes."""
+        key = (owner.lower(), repo.lower(), commit_sha)
+        watch = self._watches.get(key)
+        if watch is None:
+            deadline = time.monotonic() + (self.timeout if timeout is None else timeout)
+            watch = _Watch(client, owner, repo, commit_sha, pages_url, deadline)
+            self._watches[key] = watch
+        future = asyncio.get_running_loop().create_future()
+        watch.waiters.append(future)
+        self._ensure_scheduler()
+        self._wakeup.set()
+        return await future
+
+    def _ensure_scheduler(self) -> None:
+        if self._scheduler is None or self._scheduler.done():
+            self._wakeup = asyncio.Event()
+            self._scheduler = asyncio.create_task(self._run(), name="pages-poller")
+
+    async def stop(self) -> None:
+        if self._scheduler is not None:
+            self._scheduler.cancel()
+            await asyncio.gather(self._scheduler, return_exceptions=True)
+            self._scheduler = None
+        for watch in self._watches.values():
+            for future in watch.waiters:
+                future.cancel()
+        self._watches.clear()
+
+    def stats(self) -> Dict[str, int]:
+        return {"watching": len(self._watches), "ready": self.ready, "timed_out": self.timed_out, "errored": self.errored}
+
+    # --- scheduler ---
+
+    async def _run(self) -> None:
+        while True:
+            self._wakeup.clear()
+            now = time.monotonic()
+            due = [w for w in self._watches.values() if w.next_poll <= now]
+            if due:
+                await asyncio.gather(*(self._poll(w) for w in due), return_exceptions=True)
+            for key, watch in list(self._watches.items()):
+                watch.waiters = [f for f in watch.waiters if not f.done()]
+                if not watch.waiters:
+                    del self._watches[key]  # every waiter gave up
+            if not self._watches:
+                await self._wakeup.wait()
+                continue
+            next_poll = min(w.next_poll for w in self._watches.values())
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=max(0.0, next_poll - time.monotonic()))
+            except asyncio.TimeoutError:
+                pass
+
+    def _finish(self, watch: _Watch, ready: bool, error: Optional[str] = None) -> None:
+        seconds = time.monotonic() - watch.started
+        result = PagesStatus(ready, watch.status, round(seconds, 3), watch.polls, error)
+        _ready_seconds.observe(seconds, status="live" if ready else ("errored" if watch.status == "errored" else "timed_out"))
+        for future in watch.waiters:
+            if not future.done():
+                future.set_result(result)
+        watch.waiters.clear()
+        self._watches.pop((watch.owner.lower(), watch.repo.lower(), watch.commit_sha), None)
+
+    def _schedule_next(self, watch: _Watch) -> None:
+        watch.delay = self.initial_delay if watch.delay == 0 else min(self.max_delay, watch.delay * 2)
+        next_poll = time.monotonic() + watch.delay / 2 + random.uniform(0, watch.delay / 2)
+        watch.next_poll = min(next_poll, watch.deadline)
+
+    async def _poll(self, watch: _Watch) -> None:
+        watch.polls += 1
+        try:
+            if not watch.built:
+                await self._check_build(watch)
+            if watch.built and await self._site_responds(watch):
+                watch.status = "live"
+                self.ready += 1
+                logger.info(f"🌐 Pages live for {watch.repo} at {watch.pages_url} after {watch.polls} poll(s)")
+                self._finish(watch, True)
+                return
+        except GitHubAPIError as e:
+            if e.status != 404:  # 404: the first build has not been registered yet
+                logger.warning(f"Pages status check failed for {watch.repo}: {e.status}")
+        except Exception as e:
+            logger.warning(f"Pages status check failed for {watch.repo}: {e!r}")
+
+        if watch.status == "errored":
+            self.errored += 1
+            self._finish(watch, False, "Pages build errored")
+        elif time.monotonic() >= watch.deadline:
+            self.timed_out += 1
+            logger.warning(f"⏰ Pages for {watch.repo} not live after {time.monotonic() - watch.started:.0f}s (last status: {watch.status})")
+            self._finish(watch, False, "Timed out waiting for Pages")
+        else:
+            self._schedule_next(watch)
+
+    async def _check_build(self, watch: _Watch) -> None:
+        build = await watch.client.get_latest_pages_build(watch.owner, watch.repo)
+        commit = build.get("commit") or ""
+        if commit and commit != watch.commit_sha:
+            watch.status = "pending"  # an older commit's build; ours is not picked up yet
+            return
+        watch.status = build.get("status") or "unknown"
+        if watch.status == "built":
+            watch.built = True
+            watch.status = "deploying"
+
+    async def _site_responds(self, watch: _Watch) -> bool:
+        client = watch.client.http_pool.client_for(watch.pages_url)
+        response = await client.head(watch.pages_url, follow_redirects=True, timeout=10.0)
+        return response.status_code < 400
+
+
+_poller: Optional[PagesReadinessPoller] = None
+
+
+def get_pages_poller() -> PagesReadinessPoller:
+    """
+    Returns the process-wide Pages poller configured from settings.
+    """
+    global _poller
+    if _poller is None:
+        _poller = PagesReadinessPoller.from_settings()
+    return _poller
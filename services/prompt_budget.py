@@ -0,0 +1,139 @@
+import re
+import logging
+from dataclasses import dataclass, field
+from pathlib import PurePosixPath
+from typing import Dict, Iterable
+
+from services.prompt_registry import estimate_tokens
+
+logger = logging.getLogger("llm_agent.services.prompt_budget")
+
+# File types that are never useful to the model as text
+BINARY_SUFFIXES = {
+    ".png", ".jpg", ".jpeg", ".gif", ".webp", ".ico", ".bmp", ".pdf", ".zip", ".gz",
+    ".woff", ".woff2", ".ttf", ".otf", ".mp3", ".mp4", ".wav", ".webm",
+}
+
+# Lines worth keeping when a file is reduced to its structure, by suffix
+_OUTLINE_PATTERNS = {
+    ".py": re.compile(r"^\s*(import |from \S+ import |class |def |async def |@)"),
+    ".js": re.compile(r"^\s*(import |export |class |function |async function |(const|let|var) \w+\s*=\s*(async\s*)?(\(|function|class))"),
+    ".ts": re.compile(r"^\s*(import |export |class |interface |type |function |async function |(const|let|var) \w+\s*=)"),
+    ".css": re.compile(r"^\s*[^\s{}][^{}]*\{\s*$|^\s*@(media|import|keyframes)"),
+    ".html": re.compile(r"<(html|head|body|header|main|section|nav|footer|form|table|script|link|h[1-6])\b|\sid=\"", re.I),
+    ".md": re.compile(r"^#{1,6} "),
+}
+_OUTLINE_HEAD_LINES = 20
+
+
+def is_binary_text(content: str) -> bool:
+    """Heuristic for binary data that was read as text."""
+    sample = content[:4096]
+    return "\x00" in sample or sample.count("�") > 8
+
+
+def outline(filename: str, content: str) -> str:
+    """
+    Reduce a file to its structure: imports, definitions, selectors, headings or
+    landmark tags, with line numbers. Unknown types keep their first lines.
+    """
+    lines = content.splitlines()
+    suffix = PurePosixPath(filename).suffix.lower()
+    pattern = _OUTLINE_PATTERNS.get(suffix)
+    if pattern is not None:
+        kept = [f"{i + 1}: {line.rstrip()[:200]}" for i, line in enumerate(lines) if pattern.search(line)]
+    else:
+        kept = [f"{i + 1}: {line.rstrip()[:200]}" for i, line in enumerate(lines[:_OUTLINE_HEAD_LINES])]
+    return "\n".join(kept) + f"\n... [outline of {len(lines)} lines; full content omitted to fit the prompt budget]"
+
+
+@dataclass
+class BudgetReport:
+    budget: int
+    used: int = 0
+    cuts: Dict[str, str] = field(default_factory=dict)
+
+    def note(self, name: str, reason: str) -> None:
+        self.cuts[name] = reason
+
+
+class PromptBudget:
+    """
+    Fits the variable parts of a prompt into a model token budget.
+
+    Binary and attachment files are dropped from the existing-files section.
+    If the rest is still over budget, the largest files are reduced to
+    structural outlines, and if even that is not enough, dropped.
+    Everything removed or shortened is recorded in `report.cuts`.
+    """
+
+    def __init__(self, budget_tokens: int):
+        self.report = BudgetReport(budget=budget_tokens)
+
+    @property
+    def remaining(self) -> int:
+        return max(0, self.report.budget - self.report.used)
+
+    def spend(self, tokens: int) -> None:
+        self.report.used += tokens
+
+    def fit_existing_files(
+        self,
+        files: Dict[str, str],
+        attachment_names: Iterable[str] = (),
+        reserve: int = 0,
+    ) -> str:
+        """
+        Format `files` as `### name ###` blocks within the remaining budget minus `reserve`.
+        """
+        attachment_names = set(attachment_names)
+        candidates: Dict[str, str] = {}
+        for name, content in files.items():
+            if name in attachment_names:
+                self.report.note(name, "dropped: attachment")
+            elif PurePosixPath(name).suffix.lower() in BINARY_SUFFIXES or is_binary_text(content):
+                self.report.note(name, "dropped: binary")
+            else:
+                candidates[name] = content
+
+        blocks = {name: self._block(name, content) for name, content in candidates.items()}
+        sizes = {name: estimate_tokens(block) for name, block in blocks.items()}
+        available = max(0, self.remaining - reserve)
+
+        # Outline the largest files first until the section fits
+        for name in sorted(sizes, key=sizes.get, reverse=True):
+            if sum(sizes.values()) <= available:
+                break
+            short = self._block(name, outline(name, candidates[name]))
+            short_tokens = estimate_tokens(short)
+            if short_tokens < sizes[name]:
+                self.report.note(name, f"outlined: {sizes[name]} -> {short_tokens} tokens")
+                blocks[name], sizes[name] = short, short_tokens
+
+        # Still too big: drop whole files, largest first
+        for name in sorted(sizes, key=sizes.get, reverse=True):
+            if sum(sizes.values()) <= available:
+                break
+            self.report.note(name, f"dropped: over budget ({sizes[name]} tokens)")
+            del blocks[name], sizes[name]
+
+        self.spend(sum(sizes.values()))
+        return "\n".join(blocks[name] for name in candidates if name in blocks)
+
+    def attachment_char_limit(self, count: int, share: float = 0.25, floor: int = 500) -> int:
+        """
+        Per-file character cap for inlined text attachments: `share` of the
+        remaining budget split evenly (~4 characters per token).
+        """
+        if count <= 0:
+            return floor
+        return max(floor, int(self.remaining * share * 4 / count))
+
+    @staticmethod
+    def _block(name: str, content: str) -> str:
+        return f"### {name} ###\n{content}\n"
+
+    def log(self, label: str) -> None:
+        if self.report.cuts:
+            cuts = "; ".join(f"{name} {reason}" for name, reason in self.report.cuts.items())
+            logger.info(f"✂️ {label} prompt trimmed to {self.report.used}/{self.report.budget} tokens: {cuts}")
@@ -0,0 +1,221 @@
+import io
+import math
+import logging
+import threading
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Set, Tuple
+
+logger = logging.getLogger("llm_agent.services.prompt_registry")
+
+try:  # exact token counts need the optional `tiktoken` package
+    import tiktoken
+except ImportError:
+    tiktoken = None
+
+REQUIRED_PROMPTS = ("base_prompt.txt", "webapp_prompt.txt", "refactor_prompt.txt", "patch_prompt.txt", "readme_prompt.txt")
+
+_encoding = None
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Token count for `text`: exact with tiktoken (o200k_base, as used by gpt-4o),
+    otherwise the usual ~4 bytes per token estimate.
+    """
+    global _encoding
+    if tiktoken is not None and _encoding is None:
+        try:
+            _encoding = tiktoken.get_encoding("o200k_base")
+        except Exception as e:  # encoding files may be unavailable offline
+            logger.warning(f"tiktoken unavailable, estimating prompt tokens: {e}")
+            _encoding = False
+    if _encoding:
+        return len(_encoding.encode(text, disallowed_special=()))
+    return math.ceil(len(text.encode("utf-8")) / 4)
+
+
+@dataclass
+class PromptTemplate:
+    name: str
+    text: str
+    mtime_ns: int
+    tokens: int
+
+    @property
+    def size(self) -> int:
+        return len(self.text.encode("utf-8"))
+
+
+@dataclass
+class PromptSection:
+    name: str
+    bytes: int
+    tokens: int
+    static: bool
+
+
+@dataclass
+class AssembledPrompt:
+    """
+    A fully rendered prompt plus its per-section byte/token breakdown.
+    `static_prefix_bytes` is the length of the leading part that is identical
+    across requests (templates only). `cuts` lists content removed or shortened
+    to fit `budget` tokens.
+    """
+    text: str
+    sections: List[PromptSection] = field(default_factory=list)
+    static_prefix_bytes: int = 0
+    budget: Optional[int] = None
+    cuts: Dict[str, str] = field(default_factory=dict)
+
+    @property
+    def total_bytes(self) -> int:
+        return sum(s.bytes for s in self.sections)
+
+    @property
+    def total_tokens(self) -> int:
+        return sum(s.tokens for s in self.sections)
+
+    @property
+    def outlined(self) -> Set[str]:
+        """Files the model only saw as outlines; a rewrite of one would lose the omitted code."""
+        return {name for name, cut in self.cuts.items() if cut.startswith("outlined")}
+
+    def report(self) -> Dict[str, object]:
+        return {
+            "total_bytes": self.total_bytes,
+            "total_tokens": self.total_tokens,
+            "static_prefix_bytes": self.static_prefix_bytes,
+            "sections": {s.name: {"bytes": s.bytes, "tokens": s.tokens} for s in self.sections},
+            "budget": self.budget,
+            "cuts": dict(self.cuts),
+        }
+
+
+def _render(body: str, header: Optional[str]) -> str:
+    return f"{header}:\n{body}\n\n" if header else f"{body}\n\n"
+
+
+class PromptBuilder:
+    """
+    Writes prompt sections into a single buffer, after a precompiled static prefix.
+    """
+
+    def __init__(self, prefix: str = "", prefix_sections: Sequence[PromptSection] = ()):
+        self._buffer = io.StringIO()
+        self._buffer.write(prefix)
+        self._sections = list(prefix_sections)
+        self._static_prefix_bytes = len(prefix.encode("utf-8"))
+
+    @property
+    def tokens(self) -> int:
+        return sum(s.tokens for s in self._sections)
+
+    def add(self, name: str, body: str, header: Optional[str] = None) -> "PromptBuilder":
+        rendered = _render(body, header)
+        self._buffer.write(rendered)
+        self._sections.append(PromptSection(name, len(rendered.encode("utf-8")), estimate_tokens(rendered), False))
+        return self
+
+    def build(self) -> AssembledPrompt:
+        return AssembledPrompt(self._buffer.getvalue(), list(self._sections), self._static_prefix_bytes)
+
+
+class PromptRegistry:
+    """
+    In-memory store of the prompt templates in `prompts_dir`.
+
+    Templates are loaded and validated once (`load_all`, called at startup) and
+    afterwards only re-read when a file's mtime changes. Static prefixes built
+    from templates are rendered once and reused until one of them changes.
+    """
+
+    def __init__(self, prompts_dir: str = "templates/prompts", required: Sequence[str] = REQUIRED_PROMPTS):
+        self.prompts_dir = Path(prompts_dir)
+        self.required = tuple(required)
+        self._templates: Dict[str, PromptTemplate] = {}
+        self._prefixes: Dict[Tuple, Tuple[Tuple[int, ...], str, List[PromptSection]]] = {}
+        self._lock = threading.Lock()
+        self.reloads = 0
+
+    def _read(self, name: str, mtime_ns: int) -> PromptTemplate:
+        text = (self.prompts_dir / name).read_text(encoding="utf-8")
+        if not text.strip():
+            raise ValueError(f"Prompt file is empty: {name}")
+        return PromptTemplate(name, text, mtime_ns, estimate_tokens(text))
+
+    def load_all(self) -> Dict[str, PromptTemplate]:
+        """Load every *.txt template, failing fast if a required one is missing or empty."""
+        missing = [name for name in self.required if not (self.prompts_dir / name).is_file()]
+        if missing:
+            raise FileNotFoundError(f"Prompt file(s) not found in {self.prompts_dir}: {', '.join(missing)}")
+        for path in sorted(self.prompts_dir.glob("*.txt")):
+            self.get(path.name)
+        logger.info(
+            f"📝 Loaded {len(self._templates)} prompt template(s) from {self.prompts_dir} "
+            f"({sum(t.size for t in self._templates.values())} bytes)"
+        )
+        return dict(self._templates)
+
+    def get(self, name: str) -> PromptTemplate:
+        """Return the template, re-reading it only if the file changed on disk."""
+        path = self.prompts_dir / name
+        try:
+            mtime_ns = path.stat().st_mtime_ns
+        except FileNotFoundError:
+            raise FileNotFoundError(f"Prompt file not found: {name}")
+
+        with self._lock:
+            cached = self._templates.get(name)
+            if cached is not None and cached.mtime_ns == mtime_ns:
+                return cached
+            template = self._read(name, mtime_ns)
+            if cached is not None:
+                self.reloads += 1
+                logger.info(f"🔄 Reloaded prompt template {name}")
+            self._templates[name] = template
+            return template
+
+    def text(self, name: str) -> str:
+        return self.get(name).text
+
+    def builder(self, static: Sequence[Tuple[str, Optional[str]]]) -> PromptBuilder:
+        """
+        Start a prompt whose prefix is the given templates, as (template name, header)
+        pairs in order. The rendered prefix is cached until any of them changes.
+        """
+        key = tuple(static)
+        templates = [self.get(name) for name, _ in static]
+        versions = tuple(t.mtime_ns for t in templates)
+
+        cached = self._prefixes.get(key)
+        if cached is None or cached[0] != versions:
+            parts, sections = [], []
+            for template, (_, header) in zip(templates, static):
+                rendered = _render(template.text, header)
+                parts.append(rendered)
+                sections.append(PromptSection(
+                    template.name.removesuffix(".txt"),
+                    len(rendered.encode("utf-8")),
+                    estimate_tokens(rendered),
+                    True,
+                ))
+            cached = (versions, "".join(parts), sections)
+            self._prefixes[key] = cached
+
+        _, prefix, sections = cached
+        return PromptBuilder(prefix, sections)
+
+
+_registries: Dict[str, PromptRegistry] = {}
+
+
+def get_prompt_registry(prompts_dir: str = "templates/prompts") -> PromptRegistry:
+    """
+    Returns the process-wide registry for `prompts_dir`.
+    """
+    key = str(Path(prompts_dir).resolve())
+    if key not in _registries:
+        _registries[key] = PromptRegistry(prompts_dir)
+    return _registries[key]
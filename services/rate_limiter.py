@@ -0,0 +1,259 @@
+import re
+import time
+import random
+import asyncio
+import logging
+from email.utils import parsedate_to_datetime
+from typing import Dict, Optional
+
+import httpx
+
+logger = logging.getLogger("llm_agent.services.rate_limiter")
+
+_DURATION_PART = re.compile(r"(\d+(?:\.\d+)?)(ms|h|m|s)")
+_DURATION_UNITS = {"ms": 0.001, "s": 1.0, "m": 60.0, "h": 3600.0}
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Seconds to wait from a Retry-After header (delta-seconds or HTTP-date)."""
+    if not value:
+        return None
+    value = value.strip()
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def parse_reset(value: Optional[str]) -> Optional[float]:
+    """
+    Seconds until a rate-limit window resets. Accepts GitHub's epoch seconds
+    (`x-ratelimit-reset: 1700000000`) and OpenAI-style durations (`6m0s`, `20ms`).
+    """
+    if not value:
+        return None
+    value = value.strip()
+    try:
+        number = float(value)
+    except ValueError:
+        parts = _DURATION_PART.findall(value)
+        if not parts:
+            return None
+        return sum(float(amount) * _DURATION_UNITS[unit] for amount, unit in parts)
+    # Values this large are absolute epoch timestamps, not durations
+    return max(0.0, number - time.time()) if number > 1e9 else number
+
+
+def _header(headers: httpx.Headers, *names: str) -> Optional[str]:
+    for name in names:
+        if name in headers:
+            return headers[name]
+    return None
+
+
+class RateBudget:
+    """
+    Request budget for one upstream origin.
+
+    Combines an optional local token bucket (`rate` requests/second, `burst`
+    capacity) with what the server reports: the remaining calls in the current
+    window and when it resets, plus any Retry-After back-off. Callers queue in
+    FIFO order in `acquire` until the budget allows another request.
+    """
+
+    def __init__(self, origin: str, rate: float = 0.0, burst: int = 20):
+        self.origin = origin
+        self.rate = rate
+        self.burst = max(1, burst)
+        self.tokens = float(self.burst)
+        self.limit: Optional[int] = None
+        self.remaining: Optional[int] = None
+        self.reset_at: Optional[float] = None  # monotonic
+        self.blocked_until = 0.0  # monotonic
+        self.waiting = 0
+        self.throttled = 0
+        self.rate_limited = 0
+        self._updated = time.monotonic()
+        self._lock: Optional[asyncio.Lock] = None
+
+    def _refill(self, now: float) -> None:
+        if self.rate > 0:
+            self.tokens = min(self.burst, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def delay(self, now: Optional[float] = None) -> float:
+        """Seconds until the next request may be sent (0 if it can go now)."""
+        now = time.monotonic() if now is None else now
+        if self.blocked_until > now:
+            return self.blocked_until - now
+        if self.remaining is not None and self.remaining <= 0:
+            if self.reset_at is not None and self.reset_at > now:
+                return self.reset_at - now
+            # Window has rolled over; trust the next response to tell us the new budget
+            self.remaining = None
+        self._refill(now)
+        if self.rate > 0 and self.tokens < 1:
+            return (1 - self.tokens) / self.rate
+        return 0.0
+
+    def _consume(self) -> None:
+        if self.rate > 0:
+            self.tokens -= 1
+        # Count calls locally so concurrent requests don't overshoot before the next headers arrive
+        if self.remaining is not None:
+            self.remaining -= 1
+
+    async def acquire(self) -> float:
+        """Wait for budget, take one request's worth and return the seconds spent waiting."""
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        start = time.monotonic()
+        self.waiting += 1
+        try:
+            async with self._lock:
+                while (wait := self.delay()) > 0:
+                    await asyncio.sleep(wait)
+                self._consume()
+        finally:
+            self.waiting -= 1
+        waited = time.monotonic() - start
+        if waited > 0.001:
+            self.throttled += 1
+            if waited > 1:
+                logger.info(f"🚦 Held a request to {self.origin} for {waited:.1f}s to stay within its rate limit")
+        return waited
+
+    def observe(self, headers: httpx.Headers) -> None:
+        """Learn the current window from X-RateLimit-* headers (GitHub and OpenAI styles)."""
+        now = time.monotonic()
+        limit = _header(headers, "x-ratelimit-limit", "x-ratelimit-limit-requests")
+        remaining = _header(headers, "x-ratelimit-remaining", "x-ratelimit-remaining-requests")
+        reset = parse_reset(_header(headers, "x-ratelimit-reset", "x-ratelimit-reset-requests"))
+        try:
+            if limit is not None:
+                self.limit = int(float(limit))
+            if remaining is not None:
+                self.remaining = int(float(remaining))
+        except ValueError:
+            pass
+        if reset is not None:
+            self.reset_at = now + reset
+
+    def block(self, seconds: float) -> None:
+        """Hold every request to this origin for `seconds` (e.g. after a 429)."""
+        self.rate_limited += 1
+        self.blocked_until = max(self.blocked_until, time.monotonic() + seconds)
+
+    def status(self) -> Dict[str, object]:
+        now = time.monotonic()
+        return {
+            "limit": self.limit,
+            "remaining": self.remaining,
+            "reset_in": round(max(0.0, self.reset_at - now), 1) if self.reset_at is not None else None,
+            "blocked_for": round(max(0.0, self.blocked_until - now), 1),
+            "rate": self.rate or None,
+            "waiting": self.waiting,
+            "throttled": self.throttled,
+            "rate_limited": self.rate_limited,
+        }
+
+
+class RateLimiter:
+    """
+    Registry of per-origin budgets shared by every pooled HTTP client.
+    `rates` sets a steady request rate for specific origins; others are only
+    paced by what their responses report.
+    """
+
+    def __init__(
+        self,
+        rates: Optional[Dict[str, float]] = None,
+        burst: int = 20,
+        max_retries: int = 5,
+        max_wait: float = 120.0,
+        base_backoff: float = 1.0,
+    ):
+        self.rates = {origin.lower(): rate for origin, rate in (rates or {}).items()}
+        self.burst = burst
+        self.max_retries = max_retries
+        self.max_wait = max_wait
+        self.base_backoff = base_backoff
+        self._budgets: Dict[str, RateBudget] = {}
+
+    def budget(self, origin: str) -> RateBudget:
+        origin = origin.lower()
+        budget = self._budgets.get(origin)
+        if budget is None:
+            budget = RateBudget(origin, rate=self.rates.get(origin, 0.0), burst=self.burst)
+            self._budgets[origin] = budget
+        return budget
+
+    def status(self) -> Dict[str, Dict[str, object]]:
+        return {origin: budget.status() for origin, budget in self._budgets.items()}
+
+
+class RateLimitedTransport(httpx.AsyncBaseTransport):
+    """
+    httpx transport that routes every request through a RateBudget. Responses
+    teach the budget the server's limits; 429s and GitHub secondary-rate-limit
+    403s are held back and retried instead of surfacing as failures, as long
+    as the required wait stays under `max_wait`.
+    """
+
+    def __init__(self, transport: httpx.AsyncBaseTransport, budget: RateBudget, limiter: RateLimiter):
+        self.transport = transport
+        self.budget = budget
+        self.limiter = limiter
+
+    async def _retry_delay(self, response: httpx.Response, attempt: int) -> Optional[float]:
+        """Seconds to wait before retrying, or None if the response is not a rate-limit rejection."""
+        if response.status_code not in (403, 429):
+            return None
+        headers = response.headers
+        retry_after = parse_retry_after(_header(headers, "retry-after"))
+        if response.status_code == 403:
+            # GitHub signals both primary and secondary limits with 403
+            await response.aread()
+            body = response.text.lower()
+            exhausted = _header(headers, "x-ratelimit-remaining") == "0"
+            if retry_after is None and not exhausted and "rate limit" not in body:
+                return None
+            if retry_after is None and exhausted:
+                retry_after = parse_reset(_header(headers, "x-ratelimit-reset"))
+            if retry_after is None:
+                retry_after = 60.0  # GitHub's guidance for secondary limits without Retry-After
+        if retry_after is None:
+            backoff = self.limiter.base_backoff * (2 ** attempt)
+            retry_after = backoff / 2 + random.uniform(0, backoff / 2)
+        return retry_after
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        attempt = 0
+        while True:
+            await self.budget.acquire()
+            response = await self.transport.handle_async_request(request)
+            self.budget.observe(response.headers)
+
+            delay = await self._retry_delay(response, attempt)
+            if delay is None:
+                return response
+            if attempt >= self.limiter.max_retries or delay > self.limiter.max_wait:
+                logger.warning(
+                    f"🚦 Rate limited by {self.budget.origin} ({response.status_code}); "
+                    f"giving up after {attempt + 1} attempt(s), wait would be {delay:.0f}s"
+                )
+                return response
+
+            self.budget.block(delay)
+            logger.warning(
+                f"🚦 Rate limited by {self.budget.origin} ({response.status_code}), retrying in {delay:.1f}s"
+            )
+            await response.aclose()
+            attempt += 1
+
+    async def aclose(self) -> None:
+        await self.transport.aclose()
@@ -0,0 +1,134 @@
+import uuid
+import asyncio
+import logging
+from collections import deque
+from typing import Any, Deque, Dict, Optional
+
+from services.github_client import AsyncGitHubClient, GitHubAPIError
+
+logger = logging.getLogger("llm_agent.services.repo_pool")
+
+
+class RepoPool:
+    """
+    Keeps `size` spare repositories ready: created with an initial commit and
+    with GitHub Pages already enabled. A new task claims a spare by renaming it,
+    which takes repo creation, propagation delays and Pages setup off the
+    deploy's critical path. A background task refills the pool after claims.
+
+    Spares are named `<prefix><random>` and rediscovered on start, so they
+    survive restarts.
+    """
+
+    def __init__(
+        self,
+        client: AsyncGitHubClient,
+        size: int = 0,
+        prefix: str = "agent-pool-",
+        propagation_delay: float = 1.0,
+        retry_delay: float = 30.0,
+    ):
+        self.client = client
+        self.size = max(0, size)
+        self.prefix = prefix
+        self.propagation_delay = propagation_delay
+        self.retry_delay = retry_delay
+        self._ready: Deque[str] = deque()
+        self._refill_needed: Optional[asyncio.Event] = None
+        self._refiller: Optional[asyncio.Task] = None
+        self._owner: Optional[str] = None
+        self.claimed = 0
+        self.misses = 0
+        self.created = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.size > 0
+
+    async def _get_owner(self) -> str:
+        if self._owner is None:
+            self._owner = (await self.client.get_authenticated_user())["login"]
+        return self._owner
+
+    async def start(self) -> None:
+        if not self.enabled or self._refiller is not None:
+            return
+        self._refill_needed = asyncio.Event()
+        self._refill_needed.set()
+        self._refiller = asyncio.create_task(self._refill_loop(), name="repo-pool-refill")
+        logger.info(f"🏊 Repo pool started (target {self.size} spare repo(s))")
+
+    async def stop(self) -> None:
+        if self._refiller is not None:
+            self._refiller.cancel()
+            await asyncio.gather(self._refiller, return_exceptions=True)
+            self._refiller = None
+
+    async def claim(self, repo_name: str) -> Optional[Dict[str, Any]]:
+        """
+        Rename a spare to `repo_name` and return the repo object, or None if no
+        spare is available (the caller then creates the repo itself).
+        """
+        if not self._ready:
+            if self.enabled:
+                self.misses += 1
+            return None
+        spare = self._ready.popleft()
+        self._refill_needed.set()
+        owner = await self._get_owner()
+        try:
+            repo = await self.client.rename_repo(owner, spare, repo_name)
+        except GitHubAPIError as e:
+            logger.warning(f"Could not claim pooled repo {spare} as {repo_name}: {e.status}")
+            if e.status != 404:
+                self._ready.appendleft(spare)
+            return None
+        self.claimed += 1
+        logger.info(f"🏊 Claimed pooled repo {spare} as {repo_name} ({len(self._ready)} spare left)")
+        return repo
+
+    async def _discover(self) -> None:
+        """Adopt spares left over from a previous run."""
+        repos = await self.client.list_user_repos()
+        for repo in repos:
+            name = repo.get("name", "")
+            if name.startswith(self.prefix) and name not in self._ready:
+                self._ready.append(name)
+        if self._ready:
+            logger.info(f"🏊 Found {len(self._ready)} existing spare repo(s)")
+
+    async def _create_spare(self) -> str:
+        owner = await self._get_owner()
+        name = f"{self.prefix}{uuid.uuid4().hex[:10]}"
+        await self.client.create_repo(name, auto_init=True)
+        for attempt in range(3):
+            await asyncio.sleep(self.propagation_delay * (attempt + 1))  # wait for the initial commit to propagate
+            try:
+                await self.client.create_pages_site(owner, name, branch="main", path="/")
+                break
+            except GitHubAPIError as e:
+                if e.status == 409:
+                    break
+                if attempt == 2:
+                    raise
+        self.created += 1
+        return name
+
+    async def _refill_loop(self) -> None:
+        try:
+            await self._discover()
+        except Exception as e:
+            logger.warning(f"Could not list existing spare repos: {e!r}")
+        while True:
+            await self._refill_needed.wait()
+            self._refill_needed.clear()
+            while len(self._ready) < self.size:
+                try:
+                    self._ready.append(await self._create_spare())
+                    logger.info(f"🏊 Spare repo ready ({len(self._ready)}/{self.size})")
+                except Exception as e:
+                    logger.warning(f"Failed to create spare repo: {e!r}; retrying in {self.retry_delay:.0f}s")
+                    await asyncio.sleep(self.retry_delay)
+
+    def stats(self) -> Dict[str, int]:
+        return {"target": self.size, "ready": len(self._ready), "claimed": self.claimed, "misses": self.misses, "created": self.created}
@@ -0,0 +1,88 @@
+import os
+import base64
+import json
+import pytest
+from utils import attachment as attachment_module
+from utils.attachment import (
+    AttachmentTooLargeError,
+    check_attachment_limits,
+    decode_attachments,
+    estimate_decoded_size,
+    materialize_attachments,
+    write_attachment_manifest,
+)
+
+PNG = b"\x89PNG\r\n\x1a\n" + bytes(range(256)) * 40
+
+
+def data_url(mime, data):
+    return f"data:{mime};base64," + base64.b64encode(data).decode()
+
+
+@pytest.fixture(autouse=True)
+def attachment_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(attachment_module, "ATTACHMENT_DIR", tmp_path)
+    monkeypatch.setattr(attachment_module, "OBJECTS_DIR", tmp_path / "objects")
+    monkeypatch.setattr(attachment_module, "MANIFEST_DIR", tmp_path / "manifests")
+    return tmp_path
+
+
+def test_chunked_decode_matches_payload(attachment_dir, monkeypatch):
+    monkeypatch.setattr(attachment_module, "B64_CHUNK_CHARS", 64)
+    csv = b"col1,col2\n" + b"1,2\n" * 500
+    wrapped = base64.encodebytes(csv).decode()  # base64 with embedded newlines
+    saved = decode_attachments([
+        {"name": "logo.png", "url": data_url("image/png", PNG)},
+        {"name": "data.csv", "url": "data:text/csv;base64," + wrapped},
+    ])
+
+    assert [s["name"] for s in saved] == ["logo.png", "data.csv"]
+    with open(saved[0]["path"], "rb") as f:
+        assert f.read() == PNG
+    with open(saved[1]["path"], "rb") as f:
+        assert f.read() == csv
+    assert saved[0]["size"] == len(PNG) and saved[0]["mime"] == "image/png"
+    assert not list(attachment_dir.glob(".decode-*"))
+
+
+def test_declared_mime_is_checked_against_content():
+    saved = decode_attachments([
+        {"name": "fake.png", "url": data_url("image/png", b"just some text")},
+        {"name": "real.txt", "url": data_url("text/plain", PNG)},
+    ])
+    assert saved[0]["mime"] == "application/octet-stream"
+    assert saved[1]["mime"] == "image/png"
+
+
+def test_size_limits_are_enforced(attachment_dir):
+    big = {"name": "big.bin", "url": data_url("application/octet-stream", b"x" * 1000)}
+    assert estimate_decoded_size(big["url"]) == 1000
+
+    with pytest.raises(AttachmentTooLargeError):
+        decode_attachments([big], max_bytes=999)
+    with pytest.raises(AttachmentTooLargeError):
+        decode_attachments([big, dict(big, name="big2.bin")], max_bytes=1000, max_total_bytes=1500)
+    with pytest.raises(AttachmentTooLargeError):
+        check_attachment_limits([big], max_bytes=500)
+    assert check_attachment_limits([big], max_bytes=1000) == 1000
+    assert not list(attachment_dir.glob(".decode-*"))
+
+
+def test_identical_content_is_stored_once_and_hardlinked(attachment_dir, tmp_path_factory):
+    first = decode_attachments([{"name": "logo.png", "url": data_url("image/png", PNG)}])
+    second = decode_attachments([
+        {"name": "logo.png", "url": data_url("image/png", PNG)},
+        {"name": "copy-of-logo.png", "url": data_url("image/png", PNG)},
+    ])
+    assert {s["path"] for s in first + second} == {first[0]["path"]}
+    assert len(list((attachment_dir / "objects").rglob("*"))) == 2  # one shard dir, one object
+
+    workspace = tmp_path_factory.mktemp("workspace")
+    (workspace / "logo.png").write_text("stale", encoding="utf-8")
+    paths = materialize_attachments(workspace, second)
+    assert paths == [str(workspace / "logo.png"), str(workspace / "copy-of-logo.png")]
+    assert os.path.samefile(workspace / "logo.png", first[0]["path"])
+    assert (workspace / "copy-of-logo.png").read_bytes() == PNG
+
+    manifest = json.loads(write_attachment_manifest(second, "demo-build").read_text())
+    assert manifest["logo.png"]["sha256"] == second[0]["sha256"]
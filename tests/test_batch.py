@@ -0,0 +1,129 @@
+import json
+import asyncio
+import pytest
+
+import api.endpoints as endpoints
+from core.job_queue import JobQueue
+from core.idempotency import IdempotencyStore
+from core.stage_limits import StageLimits
+from models.request_models import Submission
+from models.job_models import JobStage
+
+
+def make_item(task, nonce="nonce-1", secret="super_secret_token"):
+    return {
+        "email": "student@example.com",
+        "secret": secret,
+        "task": task,
+        "round": 1,
+        "nonce": nonce,
+        "brief": "Create a hello world app",
+        "checks": ["Page shows hello"],
+        "evaluation_url": None,
+        "attachments": [],
+    }
+
+
+def test_parse_batch_body_accepts_array_and_ndjson():
+    items = [make_item("a"), make_item("b")]
+    assert endpoints.parse_batch_body(json.dumps(items).encode()) == items
+
+    ndjson = "\n".join(json.dumps(i) for i in items) + "\n\n{not json\n"
+    parsed = endpoints.parse_batch_body(ndjson.encode())
+    assert parsed[:2] == items
+    assert parsed[2].startswith("Line 4 is not valid JSON")
+
+
+def test_validate_batch_item_reports_reasons():
+    assert endpoints.validate_batch_item(make_item("ok")).task == "ok"
+    with pytest.raises(ValueError, match="secret"):
+        endpoints.validate_batch_item(make_item("bad", secret="wrong"))
+    with pytest.raises(ValueError, match="Invalid request"):
+        endpoints.validate_batch_item({"task": "missing-fields"})
+
+
+@pytest.mark.asyncio
+async def test_batch_streams_results_as_jobs_finish(monkeypatch):
+    delays = {"slow": 0.05, "fast": 0.0}
+    calls = []
+
+    async def handler(job):
+        calls.append(job.request.task)
+        await asyncio.sleep(delays[job.request.task])
+        if job.request.task == "fast":
+            return Submission(
+                email=job.request.email, task="fast", round=1, nonce=job.request.nonce,
+                repo_url="https://github.com/user/fast", commit_sha="abc",
+                pages_url="https://user.github.io/fast/",
+            )
+        raise RuntimeError("boom")
+
+    queue = JobQueue(handler, workers=2, maxsize=1)
+    monkeypatch.setattr(endpoints, "job_queue", queue)
+    monkeypatch.setattr(endpoints, "idempotency", IdempotencyStore())
+    await queue.start()
+
+    requests = [
+        endpoints.validate_batch_item(make_item("slow")),
+        "Invalid request",
+        endpoints.validate_batch_item(make_item("fast")),
+        endpoints.validate_batch_item(make_item("fast")),  # duplicate shares the job
+    ]
+    lines = [json.loads(line) async for line in endpoints.stream_batch_results(requests)]
+    await queue.stop()
+
+    assert [line["index"] for line in lines] == [1, 2, 3, 0]
+    assert lines[0]["error"] == "Invalid request"
+    assert lines[1]["stage"] == JobStage.COMPLETED.value
+    assert lines[1]["job_id"] == lines[2]["job_id"]
+    assert lines[3]["stage"] == JobStage.FAILED.value and "boom" in lines[3]["error"]
+    assert sorted(calls) == ["fast", "slow"]
+
+
+@pytest.mark.asyncio
+async def test_batch_items_waiting_for_queue_space_survive_a_client_disconnect(monkeypatch):
+    release = asyncio.Event()
+    calls = []
+
+    async def handler(job):
+        calls.append(job.request.task)
+        await release.wait()
+        raise RuntimeError("done")
+
+    queue = JobQueue(handler, workers=1, maxsize=1)
+    monkeypatch.setattr(endpoints, "job_queue", queue)
+    monkeypatch.setattr(endpoints, "idempotency", IdempotencyStore())
+    await queue.start()
+
+    requests = [endpoints.validate_batch_item(make_item(task)) for task in ("a", "b", "c")]
+    stream = endpoints.stream_batch_results(requests)
+    reader = asyncio.create_task(stream.__anext__())
+    await asyncio.sleep(0.05)  # "a" is running, "b" is queued, "c" waits for queue space
+    reader.cancel()  # the client goes away
+    with pytest.raises(asyncio.CancelledError):
+        await reader
+    await stream.aclose()
+
+    release.set()
+    for _ in range(100):
+        if len(calls) == 3:
+            break
+        await asyncio.sleep(0.01)
+    await queue.stop()
+    assert calls == ["a", "b", "c"]
+    assert not endpoints._batch_submissions
+
+
+@pytest.mark.asyncio
+async def test_stage_limits_bound_each_stage_separately():
+    limits = StageLimits({"llm": 2, "github": 1})
+    peak = {"llm": 0, "github": 0}
+
+    async def work(stage):
+        async with limits.stage(stage):
+            peak[stage] = max(peak[stage], limits.active[stage])
+            await asyncio.sleep(0.01)
+
+    await asyncio.gather(*[work("llm") for _ in range(5)], *[work("github") for _ in range(3)])
+    assert peak == {"llm": 2, "github": 1}
+    assert limits.stats()["llm"] == {"limit": 2, "active": 0, "waiting": 0}
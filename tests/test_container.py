@@ -0,0 +1,40 @@
+import asyncio
+import pytest
+
+from core.container import get_builder, get_services, reset_services
+from services.prompt_registry import AssembledPrompt
+from services import llm_service as llm_module
+
+
+@pytest.fixture
+def fresh_container(monkeypatch):
+    monkeypatch.setenv("GITHUB_TOKEN", "test-token")
+    reset_services()
+    yield
+    reset_services()
+
+
+def test_services_are_built_once_and_shared(fresh_container):
+    services = get_services()
+    assert get_services() is services
+    assert get_builder() is services.builder
+
+    # One LLM and one GitHub service behind every pipeline stage
+    assert services.generator.llm_service is services.llm
+    assert services.reviser.llm_service is services.llm
+    assert services.deployer.github is services.github
+    assert services.builder.reviser is services.reviser
+    assert services.llm.http_pool is services.http_pool
+    assert services.github.client.http_pool is services.http_pool
+
+
+@pytest.mark.asyncio
+async def test_last_prompt_is_isolated_per_task(fresh_container):
+    service = get_services().llm
+
+    async def job(name):
+        llm_module._last_prompt.set(AssembledPrompt(text=name))
+        await asyncio.sleep(0)
+        return service.last_prompt.text
+
+    assert await asyncio.gather(asyncio.create_task(job("a")), asyncio.create_task(job("b"))) == ["a", "b"]
@@ -0,0 +1,254 @@
+import json
+import base64
+import httpx
+import pytest
+from services.commit_engine import git_blob_sha
+from services.github_cache import GitHubMetadataCache
+from services.github_service import GitHubService, RepoSnapshotError
+from services.http_clients import HTTPClientPool
+from utils.bundle import EXECUTABLE, FileBundle
+
+
+class FakeGitHub:
+    """
+    In-memory stand-in for the GitHub REST endpoints used by GitHubService.
+    """
+
+    def __init__(self):
+        self.calls = []
+        self.blobs = {}
+        self.trees = {"tree0": {}}
+        self.tree_requests = []
+        self.commits = {"c0": {"sha": "c0", "tree": {"sha": "tree0"}, "parents": []}}
+        self.head = "c0"
+        self.pages = False
+        self.modes = {}
+        self.objects = {}
+
+    def __call__(self, request: httpx.Request) -> httpx.Response:
+        path = request.url.path
+        body = json.loads(request.content) if request.content else None
+        self.calls.append((request.method, path))
+        if path == "/user":
+            return httpx.Response(200, json={"login": "student"})
+        if path == "/repos/student/demo":
+            return httpx.Response(200, json={"clone_url": "https://github.com/student/demo.git"})
+        if path == "/repos/student/demo/branches/main":
+            etag = f'"{self.head}"'
+            if request.headers.get("If-None-Match") == etag:
+                return httpx.Response(304)
+            commit = self.commits[self.head]
+            return httpx.Response(
+                200,
+                headers={"ETag": etag},
+                json={"commit": {"sha": self.head, "commit": {"tree": commit["tree"]}}},
+            )
+        if path.startswith("/repos/student/demo/git/commits/"):
+            return httpx.Response(200, json=self.commits[path.rsplit("/", 1)[1]])
+        if path.startswith("/repos/student/demo/git/blobs/"):
+            data = self.objects[path.rsplit("/", 1)[1]]
+            return httpx.Response(200, json={"content": base64.b64encode(data).decode("ascii"), "encoding": "base64"})
+        if path == "/repos/student/demo/git/blobs":
+            sha = f"b{len(self.blobs)}"
+            self.blobs[sha] = body
+            return httpx.Response(201, json={"sha": sha})
+        if path.startswith("/repos/student/demo/git/trees/"):
+            entries = self.trees[path.rsplit("/", 1)[1]]
+            return httpx.Response(200, json={"tree": [
+                {"path": p, "type": "blob", "sha": sha} for p, sha in entries.items()
+            ]})
+        if path == "/repos/student/demo/git/trees":
+            sha = f"tree{len(self.trees)}"
+            entries = dict(self.trees[body["base_tree"]])
+            for e in body["tree"]:
+                entries[e["path"]] = e["sha"] if "sha" in e else git_blob_sha(e["content"].encode("utf-8"))
+                if "content" in e:
+                    self.objects[entries[e["path"]]] = e["content"].encode("utf-8")
+                self.modes[e["path"]] = e["mode"]
+            self.trees[sha] = entries
+            self.tree_requests.append(body["tree"])
+            return httpx.Response(201, json={"sha": sha})
+        if path == "/repos/student/demo/git/commits":
+            sha = f"c{len(self.commits)}"
+            self.commits[sha] = {"sha": sha, "tree": {"sha": body["tree"]}, "parents": body["parents"]}
+            return httpx.Response(201, json=self.commits[sha])
+        if path == "/repos/student/demo/git/refs/heads/main":
+            self.head = body["sha"]
+            return httpx.Response(200, json={"object": {"sha": self.head}})
+        if path == "/repos/student/demo/pages":
+            if self.pages:
+                return httpx.Response(409, json={"message": "already exists"})
+            self.pages = True
+            return httpx.Response(201, json={})
+        return httpx.Response(404, json={"message": "Not Found"})
+
+
+@pytest.fixture
+def fake_github(monkeypatch):
+    monkeypatch.setenv("GITHUB_TOKEN", "test-token")
+    fake = FakeGitHub()
+    pool = HTTPClientPool(http2=False)
+    pool._clients["https://api.github.com"] = httpx.AsyncClient(transport=httpx.MockTransport(fake))
+    return fake, GitHubService(http_pool=pool, cache=GitHubMetadataCache())
+
+
+@pytest.mark.asyncio
+async def test_upload_all_files_single_commit(fake_github, tmp_path):
+    fake, service = fake_github
+    (tmp_path / "index.html").write_text("<h1>hi</h1>", encoding="utf-8")
+    (tmp_path / "app.js").write_text("console.log('hi')", encoding="utf-8")
+
+    sha = await service.upload_all_files_single_commit("demo", [str(tmp_path / "index.html"), str(tmp_path / "app.js")])
+
+    assert sha == fake.head
+    tree = fake.trees[fake.commits[sha]["tree"]["sha"]]
+    assert sorted(tree) == ["LICENSE", "app.js", "index.html"]
+    assert fake.commits[sha]["parents"] == ["c0"]
+    # text files travel inline in the tree request, no blob round-trips
+    assert fake.blobs == {}
+
+
+@pytest.mark.asyncio
+async def test_upload_round_trips_stay_flat_and_binary_uses_blobs(fake_github, tmp_path):
+    fake, service = fake_github
+    paths = []
+    for i in range(20):
+        (tmp_path / f"f{i}.txt").write_text(f"file {i}", encoding="utf-8")
+        paths.append(str(tmp_path / f"f{i}.txt"))
+    (tmp_path / "logo.png").write_bytes(b"\x89PNG\r\n\x1a\n\xff\xfe")
+    paths.append(str(tmp_path / "logo.png"))
+
+    result = await service.upload_files("demo", paths)
+
+    # branch + base tree + 1 binary blob + tree + commit + ref update, independent of file count
+    assert result.api_calls == 6
+    assert result.blobs_created == 1
+    assert list(fake.blobs.values())[0]["encoding"] == "base64"
+
+
+@pytest.mark.asyncio
+async def test_revision_only_sends_changed_files(fake_github, tmp_path):
+    fake, service = fake_github
+    (tmp_path / "index.html").write_text("<h1>v1</h1>", encoding="utf-8")
+    (tmp_path / "app.js").write_text("console.log(1)", encoding="utf-8")
+    paths = [str(tmp_path / "index.html"), str(tmp_path / "app.js")]
+    first = await service.upload_files("demo", paths)
+
+    # Nothing changed: no tree, commit or ref update
+    unchanged = await service.upload_files("demo", paths)
+    assert unchanged.skipped and unchanged.sha == first.sha
+    assert unchanged.api_calls == 2
+
+    (tmp_path / "app.js").write_text("console.log(2)", encoding="utf-8")
+    second = await service.upload_files("demo", paths)
+    assert second.files_changed == 1
+    assert [e["path"] for e in fake.tree_requests[-1]] == ["app.js"]
+    assert fake.commits[second.sha]["parents"] == [first.sha]
+
+
+def test_git_blob_sha_matches_git():
+    # `printf 'hello\n' | git hash-object --stdin`
+    assert git_blob_sha(b"hello\n") == "ce013625030ba8dba906f756967f9e9ca394464a"
+
+
+@pytest.mark.asyncio
+async def test_enable_pages_handles_existing_site(fake_github):
+    fake, service = fake_github
+    assert await service.enable_pages("demo") == "https://student.github.io/demo/"
+    assert await service.enable_pages("demo") == "https://student.github.io/demo/"
+    # login is looked up once per service
+    assert fake.calls.count(("GET", "/user")) == 1
+
+
+@pytest.mark.asyncio
+async def test_metadata_cache_shared_across_services(fake_github, monkeypatch):
+    fake, service = fake_github
+    other = GitHubService(http_pool=service.client.http_pool, cache=service.client.cache)
+
+    await service.get_or_create_repo("demo")
+    await other.get_or_create_repo("demo")
+    assert fake.calls.count(("GET", "/user")) == 1
+    assert fake.calls.count(("GET", "/repos/student/demo")) == 1
+
+    # A different token never sees these entries
+    monkeypatch.setenv("GITHUB_TOKEN", "other-token")
+    stranger = GitHubService(http_pool=service.client.http_pool, cache=service.client.cache)
+    await stranger.get_login()
+    assert fake.calls.count(("GET", "/user")) == 2
+
+
+@pytest.mark.asyncio
+async def test_branch_head_revalidated_with_etag_and_invalidated_on_push(fake_github, tmp_path):
+    fake, service = fake_github
+    cache = service.client.cache
+    (tmp_path / "index.html").write_text("<h1>v1</h1>", encoding="utf-8")
+    first = await service.upload_files("demo", [str(tmp_path / "index.html")])
+
+    # Our own ref update dropped the cached head, so this is a plain fetch of the new one
+    unchanged = await service.upload_files("demo", [str(tmp_path / "index.html")])
+    assert unchanged.skipped and unchanged.sha == first.sha
+
+    # Nothing was written since: the head is revalidated (304) instead of re-downloaded
+    again = await service.upload_files("demo", [str(tmp_path / "index.html")])
+    assert again.sha == first.sha
+    assert cache.stats()["revalidated"] == 1
+    assert cache.stats()["invalidations"] >= 1
+
+
+@pytest.mark.asyncio
+async def test_bundle_commits_bytes_and_modes_without_touching_disk(fake_github):
+    fake, service = fake_github
+    png = b"\x89PNG\r\n\x1a\n\x00\xff"
+    bundle = FileBundle().update({"index.html": "<img src='logo.png'>"})
+    bundle.add("logo.png", png)
+    bundle.add("build.sh", "#!/bin/sh\necho hi\n", mode=EXECUTABLE)
+
+    result = await service.upload_bundle("demo", bundle)
+
+    tree = fake.trees[fake.commits[result.sha]["tree"]["sha"]]
+    assert tree["logo.png"] == "b0" and fake.blobs["b0"]["encoding"] == "base64"
+    assert fake.modes["build.sh"] == EXECUTABLE and fake.modes["index.html"] == "100644"
+
+
+@pytest.mark.asyncio
+async def test_snapshot_fetches_and_verifies_head(fake_github):
+    fake, service = fake_github
+    bundle = FileBundle().update({"index.html": "<h1>v1</h1>", "js/app.js": "console.log(1)"})
+    commit = await service.upload_bundle("demo", bundle)
+
+    sha, snapshot = await service.fetch_snapshot("demo", expected_sha=commit.sha, exclude=("LICENSE",))
+    assert sha == commit.sha
+    assert snapshot.contents() == {"index.html": b"<h1>v1</h1>", "js/app.js": b"console.log(1)"}
+
+    with pytest.raises(RepoSnapshotError, match="expected"):
+        await service.fetch_snapshot("demo", expected_sha="c0")
+
+    # A corrupted blob is rejected
+    fake.objects[git_blob_sha(b"<h1>v1</h1>")] = b"tampered"
+    with pytest.raises(RepoSnapshotError, match="verification"):
+        await service.fetch_snapshot("demo")
+
+
+@pytest.mark.asyncio
+async def test_reviser_rehydrates_missing_workspace_from_repo(fake_github, tmp_path):
+    from core.reviser import Reviser
+    from utils.workspace import wait_for_workspace
+
+    fake, service = fake_github
+    await service.upload_bundle("demo", FileBundle().update({"index.html": "<h1>v1</h1>"}))
+
+    class FullLLM:
+        last_prompt = None
+        seen = None
+
+        async def refactor_code(self, existing_files, *args, **kwargs):
+            FullLLM.seen = dict(existing_files)
+            return {"index.html": "<h1>v2</h1>"}
+
+    reviser = Reviser(workspace_dir=str(tmp_path), mode="full", llm_service=FullLLM(), github=service)
+    result = await reviser.apply_revision("demo", "Bump", ["Shows v2"], [])
+
+    assert FullLLM.seen == {"index.html": "<h1>v1</h1>"}
+    assert result["bundle"].contents() == {"index.html": b"<h1>v2</h1>"}
+    await wait_for_workspace(tmp_path / "demo")
+    assert (tmp_path / "demo" / "index.html").read_text(encoding="utf-8") == "<h1>v2</h1>"
@@ -0,0 +1,18 @@
+import pytest
+from services.http_clients import HTTPClientPool
+
+
+@pytest.mark.asyncio
+async def test_one_client_per_origin():
+    pool = HTTPClientPool(max_connections=10, max_keepalive_connections=5)
+    a = pool.client_for("https://api.github.com/repos/x/y")
+    b = pool.client_for("https://API.github.com/user")
+    c = pool.client_for("https://generativelanguage.googleapis.com/v1beta/models")
+    assert a is b
+    assert a is not c
+
+    await pool.aclose()
+    assert a.is_closed and c.is_closed
+    # A closed pool hands out fresh clients again
+    assert pool.client_for("https://api.github.com").is_closed is False
+    await pool.aclose()
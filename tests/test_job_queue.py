@@ -0,0 +1,145 @@
+import asyncio
+import pytest
+from core.job_queue import JobQueue, QueueFullError
+from core.idempotency import IdempotencyStore, idempotency_key
+from models.request_models import Request, Submission
+from models.job_models import JobStage
+
+
+def make_request(task="queue_test_app", nonce="nonce-1"):
+    return Request(
+        email="student@example.com",
+        secret="super_secret_token",
+        task=task,
+        round=1,
+        nonce=nonce,
+        brief="Create a hello world app",
+        checks=["Page shows hello"],
+        evaluation_url=None,
+        attachments=[],
+    )
+
+
+def make_submission(request):
+    return Submission(
+        email=request.email,
+        task=request.task,
+        round=request.round,
+        nonce=request.nonce,
+        repo_url="https://github.com/user/repo",
+        commit_sha="abc123",
+        pages_url="https://user.github.io/repo/",
+    )
+
+
+@pytest.mark.asyncio
+async def test_job_completes_with_submission_and_timings():
+    async def handler(job):
+        with job.stage_timer(JobStage.BUILDING, "build"):
+            await asyncio.sleep(0)
+        return make_submission(job.request)
+
+    queue = JobQueue(handler, workers=1)
+    await queue.start()
+    job = queue.submit(make_request())
+    assert job.stage == JobStage.QUEUED
+
+    await queue._queue.join()
+    await queue.stop()
+
+    status = queue.get(job.id).to_status()
+    assert status.stage == JobStage.COMPLETED
+    assert status.submission.commit_sha == "abc123"
+    assert "build" in status.timings and "total" in status.timings
+
+
+@pytest.mark.asyncio
+async def test_worker_pool_bounds_concurrency():
+    running = 0
+    peak = 0
+
+    async def handler(job):
+        nonlocal running, peak
+        running += 1
+        peak = max(peak, running)
+        await asyncio.sleep(0.01)
+        running -= 1
+        return make_submission(job.request)
+
+    queue = JobQueue(handler, workers=2)
+    await queue.start()
+    for i in range(6):
+        queue.submit(make_request(nonce=f"n{i}"))
+    await queue._queue.join()
+    await queue.stop()
+
+    assert peak == 2
+
+
+@pytest.mark.asyncio
+async def test_failed_job_records_error_and_full_queue_rejects():
+    async def handler(job):
+        raise RuntimeError("boom")
+
+    queue = JobQueue(handler, workers=1, maxsize=1)
+    job = queue.submit(make_request())
+    with pytest.raises(QueueFullError):
+        queue.submit(make_request(nonce="other"))
+
+    await queue.start()
+    await queue._queue.join()
+    await queue.stop()
+
+    assert job.stage == JobStage.FAILED
+    assert "boom" in job.error
+
+
+@pytest.mark.asyncio
+async def test_duplicates_attach_to_in_flight_then_completed_job():
+    release = asyncio.Event()
+    runs = 0
+
+    async def handler(job):
+        nonlocal runs
+        runs += 1
+        await release.wait()
+        return make_submission(job.request)
+
+    queue = JobQueue(handler, workers=2)
+    store = IdempotencyStore()
+    await queue.start()
+
+    request = make_request()
+    key = idempotency_key(request)
+    job = queue.submit(request)
+    store.remember(key, job)
+    await asyncio.sleep(0)
+
+    # Retry while running attaches to the same job
+    assert store.get(idempotency_key(make_request())) is job
+    release.set()
+    await job.wait()
+
+    # Retry after completion gets the stored submission back
+    again = store.get(key)
+    assert again is job and again.submission.commit_sha == "abc123"
+    assert runs == 1
+    assert store.get(idempotency_key(make_request(nonce="fresh"))) is None
+    await queue.stop()
+
+
+@pytest.mark.asyncio
+async def test_failed_jobs_are_not_replayed():
+    async def handler(job):
+        raise RuntimeError("boom")
+
+    queue = JobQueue(handler, workers=1)
+    store = IdempotencyStore()
+    await queue.start()
+    request = make_request()
+    job = queue.submit(request)
+    store.remember(idempotency_key(request), job)
+    await job.wait()
+    await queue.stop()
+
+    assert store.get(idempotency_key(request)) is None
@@ -0,0 +1,50 @@
+import os
+import time
+from services.llm_cache import LLMResponseCache
+
+
+def test_normalized_prompts_share_a_key(tmp_path):
+    cache = LLMResponseCache(cache_dir=str(tmp_path))
+    a = cache.make_key("aipipe", "gpt-4o", "Task:\r\nBuild it   \n\n")
+    b = cache.make_key("aipipe", "gpt-4o", "Task:\nBuild it")
+    assert a == b
+    assert a != cache.make_key("gemini", "gpt-4o", "Task:\nBuild it")
+    assert a != cache.make_key("aipipe", "gpt-4o-mini", "Task:\nBuild it")
+
+
+def test_hit_miss_and_ttl(tmp_path):
+    cache = LLMResponseCache(cache_dir=str(tmp_path), ttl_seconds=60)
+    key = cache.make_key("aipipe", "gpt-4o", "prompt")
+    assert cache.get(key) is None
+
+    cache.set(key, {"index.html": "<h1>hi</h1>"}, "aipipe", "gpt-4o")
+    assert cache.get(key) == {"index.html": "<h1>hi</h1>"}
+    assert cache.stats()["hits"] == 1 and cache.stats()["misses"] == 1
+
+    cache.ttl_seconds = 0
+    time.sleep(0.01)
+    assert cache.get(key) is None
+
+
+def test_lru_eviction_keeps_recently_used(tmp_path):
+    cache = LLMResponseCache(cache_dir=str(tmp_path), max_entries=2)
+    keys = [cache.make_key("aipipe", "gpt-4o", f"p{i}") for i in range(3)]
+    cache.set(keys[0], {"a": "0"})
+    cache.set(keys[1], {"a": "1"})
+    # age both entries, then touch the first so the second becomes least recently used
+    for key in keys[:2]:
+        os.utime(cache._path(key), (time.time() - 100, time.time() - 100))
+    assert cache.get(keys[0]) is not None
+
+    cache.set(keys[2], {"a": "2"})
+    assert cache.get(keys[1]) is None
+    assert cache.get(keys[0]) is not None and cache.get(keys[2]) is not None
+    assert cache.evictions == 1
+
+
+def test_disabled_cache_is_a_no_op(tmp_path):
+    cache = LLMResponseCache(cache_dir=str(tmp_path / "off"), enabled=False)
+    key = cache.make_key("aipipe", "gpt-4o", "prompt")
+    cache.set(key, {"a": "b"})
+    assert cache.get(key) is None
+    assert not (tmp_path / "off").exists()
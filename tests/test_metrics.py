@@ -0,0 +1,67 @@
+import httpx
+import pytest
+
+from api import endpoints
+from core.container import ServiceContainer
+from core.notifier import NotificationOutbox
+from services.github_cache import GitHubMetadataCache
+from services.github_client import AsyncGitHubClient, endpoint_template
+from services.http_clients import HTTPClientPool
+from utils.metrics import MetricsRegistry, get_metrics
+
+
+def test_registry_renders_prometheus_text():
+    registry = MetricsRegistry(namespace="demo")
+    latency = registry.histogram("stage_seconds", "Stage latency.", ["stage"], buckets=(0.1, 1.0))
+    latency.observe(0.05, stage="parse")
+    latency.observe(0.5, stage="parse")
+    latency.observe(5.0, stage="parse")
+    registry.counter("bytes_total", "Bytes sent.", ["provider"]).inc(120, provider="aipipe")
+    registry.gauge("queued", "Jobs waiting.").set(3)
+    assert registry.counter("bytes_total", "Bytes sent.", ["provider"]).value(provider="aipipe") == 120
+
+    text = registry.render()
+    assert "# TYPE demo_stage_seconds histogram" in text
+    assert 'demo_stage_seconds_bucket{stage="parse",le="0.1"} 1' in text
+    assert 'demo_stage_seconds_bucket{stage="parse",le="1"} 2' in text
+    assert 'demo_stage_seconds_bucket{stage="parse",le="+Inf"} 3' in text
+    assert 'demo_stage_seconds_sum{stage="parse"} 5.55' in text
+    assert 'demo_stage_seconds_count{stage="parse"} 3' in text
+    assert 'demo_bytes_total{provider="aipipe"} 120' in text
+    assert "demo_queued 3" in text
+
+    with pytest.raises(ValueError):
+        registry.gauge("bytes_total", "Same name, different type.")
+
+
+@pytest.mark.asyncio
+async def test_github_calls_are_timed_per_endpoint_template():
+    pool = HTTPClientPool(http2=False)
+    pool._clients["https://api.github.com"] = httpx.AsyncClient(
+        transport=httpx.MockTransport(lambda request: httpx.Response(200, json={"sha": "abc", "content": ""}))
+    )
+    client = AsyncGitHubClient("test-token", http_pool=pool, cache=GitHubMetadataCache())
+    histogram = get_metrics().get("github_request_duration_seconds")
+    labels = {"method": "GET", "endpoint": "/repos/{owner}/{repo}/git/blobs/{sha}", "status": "200"}
+    before = histogram.count(**labels)
+
+    await client.get_blob("student", "demo", "abc123")
+    await client.get_blob("student", "other", "def456")
+
+    assert histogram.count(**labels) == before + 2
+    assert endpoint_template("/repos/student/demo/git/ref/heads/main") == "/repos/{owner}/{repo}/git/ref/{ref}"
+
+
+@pytest.mark.asyncio
+async def test_metrics_endpoint_exports_stage_and_queue_metrics(monkeypatch, tmp_path):
+    monkeypatch.setenv("GITHUB_TOKEN", "test-token")
+    monkeypatch.setattr(endpoints, "outbox", NotificationOutbox(str(tmp_path / "outbox.db")))
+    response = await endpoints.metrics_endpoint(ServiceContainer.create(str(tmp_path)))
+
+    assert response.media_type.startswith("text/plain; version=0.0.4")
+    body = response.body.decode()
+    assert "# TYPE llm_agent_stage_duration_seconds histogram" in body
+    assert "llm_agent_jobs_queued 0" in body
+    assert "llm_agent_jobs_in_flight 0" in body
+    assert 'llm_agent_stage_slots{stage="llm",state="limit"}' in body
+    assert 'llm_agent_notifications{status="pending"} 0' in body
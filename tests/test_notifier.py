@@ -0,0 +1,216 @@
+import asyncio
+import httpx
+import pytest
+from fastapi import HTTPException
+from api import endpoints
+from core.notifier import NotificationOutbox
+from models.request_models import Submission
+from services.http_clients import HTTPClientPool
+
+EVALUATOR = "https://evaluator.example.com/notify"
+
+
+def make_submission(nonce="nonce-1"):
+    return Submission(
+        email="student@example.com",
+        task="outbox_app",
+        round=1,
+        nonce=nonce,
+        repo_url="https://github.com/user/outbox_app",
+        commit_sha="abc123",
+        pages_url="https://user.github.io/outbox_app/",
+    )
+
+
+def pool_with(handler):
+    pool = HTTPClientPool(http2=False)
+    pool._clients[pool._origin(EVALUATOR)] = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    return pool
+
+
+async def wait_for(predicate, timeout=5.0):
+    deadline = asyncio.get_running_loop().time() + timeout
+    while not await predicate():
+        assert asyncio.get_running_loop().time() < deadline, "condition not reached"
+        await asyncio.sleep(0.01)
+
+
+@pytest.mark.asyncio
+async def test_failed_attempts_are_retried_until_delivered(tmp_path):
+    statuses = [500, 503, 200]
+    received = []
+
+    def handler(request):
+        received.append(request.content)
+        return httpx.Response(statuses.pop(0))
+
+    outbox = NotificationOutbox(str(tmp_path / "outbox.db"), base_delay=0.01, http_pool=pool_with(handler))
+    await outbox.start()
+    await outbox.enqueue(EVALUATOR, make_submission())
+    await outbox.enqueue(EVALUATOR, make_submission())  # duplicate is ignored
+
+    async def delivered():
+        return (await outbox.stats())["delivered"] == 1
+    await wait_for(delivered)
+    await outbox.stop()
+
+    assert len(received) == 3
+    assert b'"commit_sha": "abc123"' in received[-1]
+
+
+@pytest.mark.asyncio
+async def test_exhausted_notifications_are_dead_lettered_and_can_be_requeued(tmp_path):
+    outcomes = [500, 500, 200]
+    pool = pool_with(lambda request: httpx.Response(outcomes.pop(0)))
+    outbox = NotificationOutbox(str(tmp_path / "outbox.db"), max_attempts=2, base_delay=0.01, http_pool=pool)
+    await outbox.start()
+    await outbox.enqueue(EVALUATOR, make_submission())
+
+    async def dead():
+        return (await outbox.stats())["dead"] == 1
+    await wait_for(dead)
+    [letter] = await outbox.dead_letters()
+    assert letter["attempts"] == 2 and "HTTP 500" in letter["last_error"]
+    assert await outbox.requeue(letter["id"])
+
+    async def delivered():
+        return (await outbox.stats())["delivered"] == 1
+    await wait_for(delivered)
+    await outbox.stop()
+
+
+@pytest.mark.asyncio
+async def test_pending_notifications_survive_a_restart(tmp_path):
+    db = str(tmp_path / "outbox.db")
+    first = NotificationOutbox(db, http_pool=pool_with(lambda request: httpx.Response(200)))
+    await first.enqueue(EVALUATOR, make_submission())  # process "dies" before delivering
+    await first.stop()
+
+    second = NotificationOutbox(db, http_pool=pool_with(lambda request: httpx.Response(200)))
+    await second.start()
+
+    async def delivered():
+        return (await second.stats())["delivered"] == 1
+    await wait_for(delivered)
+    await second.stop()
+
+
+@pytest.mark.asyncio
+async def test_per_host_concurrency_is_limited(tmp_path):
+    active = 0
+    peak = 0
+
+    async def handler(request):
+        nonlocal active, peak
+        active += 1
+        peak = max(peak, active)
+        await asyncio.sleep(0.02)
+        active -= 1
+        return httpx.Response(200)
+
+    outbox = NotificationOutbox(str(tmp_path / "outbox.db"), per_host_limit=2, http_pool=pool_with(handler))
+    await outbox.start()
+    for i in range(6):
+        await outbox.enqueue(EVALUATOR, make_submission(nonce=f"n{i}"))
+
+    async def delivered():
+        return (await outbox.stats())["delivered"] == 6
+    await wait_for(delivered)
+    await outbox.stop()
+    assert peak == 2
+
+
+@pytest.mark.asyncio
+async def test_dead_letters_are_listed_and_requeued_through_internal_endpoints(monkeypatch, tmp_path):
+    outcomes = [500, 200]
+    pool = pool_with(lambda request: httpx.Response(outcomes.pop(0)))
+    outbox = NotificationOutbox(str(tmp_path / "outbox.db"), max_attempts=1, http_pool=pool)
+    monkeypatch.setattr(endpoints, "outbox", outbox)
+    monkeypatch.setattr(endpoints.get_settings(), "STUDENT_SECRET", "admin-secret")
+    await outbox.start()
+    await outbox.enqueue(EVALUATOR, make_submission())
+
+    async def dead():
+        return (await outbox.stats())["dead"] == 1
+    await wait_for(dead)
+    [letter] = (await endpoints.dead_letters_endpoint())["dead"]
+
+    with pytest.raises(HTTPException) as denied:
+        await endpoints.requeue_notification_endpoint(letter["id"], x_student_secret="wrong")
+    assert denied.value.status_code == 403
+    with pytest.raises(HTTPException) as missing:
+        await endpoints.requeue_notification_endpoint(letter["id"] + 1, x_student_secret="admin-secret")
+    assert missing.value.status_code == 404
+
+    result = await endpoints.requeue_notification_endpoint(letter["id"], x_student_secret="admin-secret")
+    assert result == {"id": letter["id"], "status": "pending"}
+
+    async def delivered():
+        return (await outbox.stats())["delivered"] == 1
+    await wait_for(delivered)
+    await outbox.stop()
+
+
+@pytest.mark.asyncio
+async def test_host_throttled_rows_do_not_busy_poll_the_database(tmp_path):
+    release = asyncio.Event()
+
+    async def handler(request):
+        await release.wait()
+        return httpx.Response(200)
+
+    outbox = NotificationOutbox(str(tmp_path / "outbox.db"), per_host_limit=1, http_pool=pool_with(handler))
+    dispatches = 0
+    dispatch_due = outbox._dispatch_due
+
+    async def counting_dispatch():
+        nonlocal dispatches
+        dispatches += 1
+        return await dispatch_due()
+    outbox._dispatch_due = counting_dispatch
+
+    await outbox.start()
+    await outbox.enqueue(EVALUATOR, make_submission(nonce="first"))
+    await outbox.enqueue(EVALUATOR, make_submission(nonce="second"))  # overdue, held back by per_host_limit
+    await asyncio.sleep(0.3)
+    assert dispatches <= 3  # one per wakeup, not one every 50 ms
+
+    release.set()
+
+    async def delivered():
+        return (await outbox.stats())["delivered"] == 2
+    await wait_for(delivered)
+    await outbox.stop()
+
+
+@pytest.mark.asyncio
+async def test_a_saturated_host_does_not_hold_back_other_hosts(tmp_path):
+    other = "https://other-evaluator.example.com/notify"
+    release = asyncio.Event()
+    delivered_to = []
+
+    async def handler(request):
+        if request.url.host == "evaluator.example.com":
+            await release.wait()
+        delivered_to.append(request.url.host)
+        return httpx.Response(200)
+
+    pool = pool_with(handler)
+    pool._clients[pool._origin(other)] = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    outbox = NotificationOutbox(str(tmp_path / "outbox.db"), workers=2, per_host_limit=1, http_pool=pool)
+    # Enough overdue rows for the busy host to fill a whole page, then one for another host
+    for i in range(12):
+        await outbox.enqueue(EVALUATOR, make_submission(nonce=f"busy-{i}"))
+    await outbox.enqueue(other, make_submission(nonce="other"))
+    await outbox.start()
+
+    async def other_delivered():
+        return "other-evaluator.example.com" in delivered_to
+    await wait_for(other_delivered, timeout=2.0)
+
+    release.set()
+
+    async def all_delivered():
+        return (await outbox.stats())["delivered"] == 13
+    await wait_for(all_delivered)
+    await outbox.stop()
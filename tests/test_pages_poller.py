@@ -0,0 +1,70 @@
+import asyncio
+import httpx
+import pytest
+
+from services.http_clients import HTTPClientPool
+from services.pages_poller import PagesReadinessPoller
+
+PAGES_URL = "https://student.github.io/demo/"
+
+
+class FakePagesClient:
+    """Stands in for AsyncGitHubClient: scripted Pages build statuses plus a site that answers HEAD."""
+
+    def __init__(self, builds, site_status=200):
+        self.builds = list(builds)
+        self.build_polls = 0
+        self.site_polls = 0
+        self.http_pool = HTTPClientPool(http2=False)
+
+        def site(request):
+            self.site_polls += 1
+            return httpx.Response(site_status)
+
+        self.http_pool._clients[self.http_pool._origin(PAGES_URL)] = httpx.AsyncClient(transport=httpx.MockTransport(site))
+
+    async def get_latest_pages_build(self, owner, repo):
+        self.build_polls += 1
+        return self.builds[min(self.build_polls, len(self.builds)) - 1]
+
+
+def poller(timeout=5.0):
+    return PagesReadinessPoller(initial_delay=0.01, max_delay=0.02, timeout=timeout)
+
+
+@pytest.mark.asyncio
+async def test_waits_for_our_commit_to_be_built_and_served():
+    client = FakePagesClient([
+        {"status": "built", "commit": "old"},
+        {"status": "building", "commit": "c1"},
+        {"status": "built", "commit": "c1"},
+    ])
+    pages = poller()
+    first, second = await asyncio.gather(
+        pages.wait_until_live(client, "student", "demo", "c1", PAGES_URL),
+        pages.wait_until_live(client, "student", "demo", "c1", PAGES_URL),
+    )
+    await pages.stop()
+
+    assert first.ready and second.ready and first.status == "live"
+    # Both deploys were served by one watch
+    assert client.build_polls == 3
+    assert client.site_polls == 1
+    assert pages.stats()["ready"] == 1
+
+
+@pytest.mark.asyncio
+async def test_errored_build_and_deadline_resolve_without_raising():
+    pages = poller(timeout=0.05)
+    errored = await pages.wait_until_live(
+        FakePagesClient([{"status": "errored", "commit": "c1"}]), "student", "demo", "c1", PAGES_URL
+    )
+    assert not errored.ready and errored.error == "Pages build errored"
+
+    # Built, but the site keeps answering 404 until the deadline
+    slow = await pages.wait_until_live(
+        FakePagesClient([{"status": "built", "commit": "c2"}], site_status=404), "student", "demo", "c2", PAGES_URL
+    )
+    await pages.stop()
+    assert not slow.ready and slow.status == "deploying"
+    assert pages.stats()["timed_out"] == 1
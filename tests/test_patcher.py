@@ -0,0 +1,128 @@
+import pytest
+from core.reviser import Reviser
+from services.prompt_registry import AssembledPrompt
+from utils.patcher import Edit, PatchError, apply_edits, parse_edits
+from utils.workspace import wait_for_workspace
+
+APP_JS = """function greet(name) {
+    return "Hello " + name;
+}
+
+function main() {
+    document.body.textContent = greet("world");
+}
+"""
+
+
+def block(search, replace):
+    return f"<<<<<<< SEARCH\n{search}=======\n{replace}>>>>>>> REPLACE\n"
+
+
+def test_parse_and_apply_exact_edits():
+    body = block('    return "Hello " + name;\n', '    return `Hi ${name}!`;\n') + block(
+        '    document.body.textContent = greet("world");\n', ""
+    )
+    edits = parse_edits(body)
+    assert edits == [
+        Edit('    return "Hello " + name;\n', '    return `Hi ${name}!`;\n'),
+        Edit('    document.body.textContent = greet("world");\n', ""),
+    ]
+    result = apply_edits(APP_JS, edits)
+    assert "return `Hi ${name}!`;" in result
+    assert "textContent" not in result
+    assert parse_edits("<h1>full file</h1>") is None
+
+
+def test_whitespace_and_fuzzy_matches():
+    reindented = Edit('function greet(name) {\n  return "Hello " + name;\n}\n', "const greet = (n) => `Hi ${n}`;\n")
+    assert apply_edits(APP_JS, [reindented]).startswith("const greet = (n) => `Hi ${n}`;\n\nfunction main()")
+
+    near_miss = Edit('    document.body.textContent = greet("World");\n', '    document.title = greet("world");\n')
+    assert 'document.title = greet("world");' in apply_edits(APP_JS, [near_miss])
+
+
+def test_unmatched_or_ambiguous_search_is_rejected():
+    with pytest.raises(PatchError):
+        apply_edits(APP_JS, [Edit("console.log('nope');\n", "")])
+    with pytest.raises(PatchError):
+        apply_edits(APP_JS, [Edit("}\n", "};\n")])
+
+
+def test_crlf_blocks_are_parsed():
+    body = block('    return "Hello " + name;\n', '    return "Hi " + name;\n').replace("\n", "\r\n")
+    edits = parse_edits(body)
+    assert edits == [Edit('    return "Hello " + name;\n', '    return "Hi " + name;\n')]
+    assert 'return "Hi " + name;' in apply_edits(APP_JS, edits)
+
+
+def test_truncated_blocks_are_rejected_not_used_as_content():
+    missing_replace = "<<<<<<< SEARCH\n    return \"Hello \" + name;\n=======\n    return \"Hi \" + name;\n"
+    with pytest.raises(PatchError):
+        parse_edits(missing_replace)
+    # One good block followed by a cut-off one is rejected as a whole
+    with pytest.raises(PatchError):
+        parse_edits(block("a\n", "b\n") + missing_replace)
+
+
+class FakeLLM:
+    last_prompt = None
+
+    def __init__(self, patch_response):
+        self.patch_response = patch_response
+        self.refactored = []
+
+    async def patch_code(self, existing_files, *args, **kwargs):
+        return self.patch_response
+
+    async def refactor_code(self, existing_files, *args, **kwargs):
+        self.refactored.append(sorted(existing_files))
+        return {name: f"regenerated {name}" for name in existing_files}
+
+
+@pytest.mark.asyncio
+async def test_revision_patches_files_and_regenerates_only_failures(tmp_path):
+    task_dir = tmp_path / "demo"
+    task_dir.mkdir()
+    (task_dir / "app.js").write_text(APP_JS, encoding="utf-8")
+    (task_dir / "index.html").write_text("<h1>Old</h1>\n", encoding="utf-8")
+    (task_dir / "README.md").write_text("# Demo\n", encoding="utf-8")
+
+    reviser = Reviser(workspace_dir=str(tmp_path), mode="patch")
+    reviser.llm_service = FakeLLM({
+        "app.js": block('    return "Hello " + name;\n', '    return "Hi " + name;\n'),
+        "index.html": block("<h2>missing</h2>\n", "<h2>new</h2>\n"),
+        "README.md": "<<<<<<< SEARCH\n# Demo\n=======\n# Demo app\n",
+        "styles.css": "body { margin: 0; }\n",
+    })
+    result = await reviser.apply_revision("demo", "Say hi", ["Shows hi"], [])
+
+    assert result["revision_mode"] == "patch"
+    assert result["patched_files"] == ["app.js", "styles.css"]
+    assert result["regenerated_files"] == ["index.html", "README.md"]
+    assert reviser.llm_service.refactored == [["README.md", "index.html"]]
+    assert result["bundle"].contents()["index.html"] == b"regenerated index.html"
+
+    # The workspace is mirrored in the background
+    await wait_for_workspace(task_dir)
+    assert 'return "Hi " + name;' in (task_dir / "app.js").read_text(encoding="utf-8")
+    assert (task_dir / "index.html").read_text(encoding="utf-8") == "regenerated index.html"
+    # The truncated README edit was regenerated, never written as raw markers
+    assert (task_dir / "README.md").read_text(encoding="utf-8") == "regenerated README.md"
+    assert sorted(p.rsplit("/", 1)[-1] for p in result["saved_files"]) == ["README.md", "app.js", "index.html", "styles.css"]
+
+
+@pytest.mark.asyncio
+async def test_full_rewrite_of_outlined_file_is_regenerated(tmp_path):
+    task_dir = tmp_path / "demo"
+    task_dir.mkdir()
+    (task_dir / "app.js").write_text(APP_JS, encoding="utf-8")
+
+    reviser = Reviser(workspace_dir=str(tmp_path), mode="patch")
+    reviser.llm_service = FakeLLM({"app.js": "function greet(name) {}\nfunction main() {}\n"})
+    reviser.llm_service.last_prompt = AssembledPrompt(text="", cuts={"app.js": "outlined: 900 -> 40 tokens"})
+    result = await reviser.apply_revision("demo", "Say hi", ["Shows hi"], [])
+
+    # The signature-only rewrite is discarded; the file is regenerated from its full text
+    assert result["regenerated_files"] == ["app.js"]
+    assert reviser.llm_service.refactored == [["app.js"]]
+    assert result["bundle"].contents()["app.js"] == b"regenerated app.js"
@@ -0,0 +1,42 @@
+from services.prompt_budget import PromptBudget, outline
+
+SCRIPT = "\n".join(
+    ["import { render } from './view.js';", "", "export function main() {"]
+    + [f"  console.log('line {i}');" for i in range(400)]
+    + ["}", "class Widget {", "}"]
+)
+
+
+def test_binary_and_attachment_files_are_dropped():
+    budget = PromptBudget(10_000)
+    section = budget.fit_existing_files(
+        {"index.html": "<h1>hi</h1>", "data.csv": "a,b\n1,2", "logo.png": "\x89PNG\x00\x00", "font.woff2": "x"},
+        attachment_names={"data.csv"},
+    )
+    assert section == "### index.html ###\n<h1>hi</h1>\n"
+    assert budget.report.cuts == {
+        "data.csv": "dropped: attachment",
+        "logo.png": "dropped: binary",
+        "font.woff2": "dropped: binary",
+    }
+
+
+def test_large_files_are_outlined_then_dropped_to_fit():
+    files = {"app.js": SCRIPT, "README.md": "# Demo\n\nSmall readme."}
+    budget = PromptBudget(600)
+    section = budget.fit_existing_files(files)
+
+    assert "### README.md ###\n# Demo" in section
+    assert "export function main()" in section and "line 200" not in section
+    assert budget.report.cuts["app.js"].startswith("outlined:")
+    assert budget.report.used <= 600
+
+    tiny = PromptBudget(5)
+    assert tiny.fit_existing_files(files) == ""
+    assert tiny.report.cuts["app.js"].startswith("dropped: over budget")
+
+
+def test_outline_keeps_structure_with_line_numbers():
+    text = outline("app.js", SCRIPT)
+    assert text.splitlines()[:2] == ["1: import { render } from './view.js';", "3: export function main() {"]
+    assert "class Widget" in text and "outline of 406 lines" in text
@@ -0,0 +1,56 @@
+import os
+import pytest
+from services.prompt_registry import PromptRegistry, REQUIRED_PROMPTS, estimate_tokens
+
+
+@pytest.fixture
+def prompts_dir(tmp_path):
+    for name in REQUIRED_PROMPTS:
+        (tmp_path / name).write_text(f"{name} instructions", encoding="utf-8")
+    return tmp_path
+
+
+def test_templates_are_read_once_and_reloaded_on_mtime_change(prompts_dir, monkeypatch):
+    registry = PromptRegistry(str(prompts_dir))
+    registry.load_all()
+
+    reads = []
+    original = registry._read
+    monkeypatch.setattr(registry, "_read", lambda name, mtime: reads.append(name) or original(name, mtime))
+    for _ in range(3):
+        assert registry.text("base_prompt.txt") == "base_prompt.txt instructions"
+    assert reads == []
+
+    path = prompts_dir / "base_prompt.txt"
+    path.write_text("new base", encoding="utf-8")
+    stat = path.stat()
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))
+    assert registry.text("base_prompt.txt") == "new base"
+    assert reads == ["base_prompt.txt"] and registry.reloads == 1
+
+
+def test_missing_or_empty_required_prompt_fails_fast(prompts_dir):
+    (prompts_dir / "readme_prompt.txt").unlink()
+    with pytest.raises(FileNotFoundError):
+        PromptRegistry(str(prompts_dir)).load_all()
+
+    (prompts_dir / "readme_prompt.txt").write_text("   ", encoding="utf-8")
+    with pytest.raises(ValueError):
+        PromptRegistry(str(prompts_dir)).load_all()
+
+
+def test_assembled_prompt_has_stable_prefix_and_section_sizes(prompts_dir):
+    registry = PromptRegistry(str(prompts_dir))
+    static = [("base_prompt.txt", None), ("readme_prompt.txt", "README.md updation")]
+
+    first = registry.builder(static).add("task", "app-one", "Task").build()
+    second = registry.builder(static).add("task", "a different app", "Task").build()
+
+    prefix = "base_prompt.txt instructions\n\nREADME.md updation:\nreadme_prompt.txt instructions\n\n"
+    assert first.text == prefix + "Task:\napp-one\n\n"
+    assert second.text.startswith(prefix)
+    assert first.static_prefix_bytes == len(prefix.encode("utf-8"))
+    assert [s.name for s in first.sections] == ["base_prompt", "readme_prompt", "task"]
+    assert first.report()["sections"]["task"]["bytes"] == len("Task:\napp-one\n\n")
+    assert first.total_bytes == len(first.text.encode("utf-8"))
+    assert estimate_tokens("x" * 40) > 0
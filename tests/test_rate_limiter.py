@@ -0,0 +1,117 @@
+import time
+import asyncio
+import httpx
+import pytest
+
+from services.http_clients import HTTPClientPool
+from services.rate_limiter import (
+    RateBudget,
+    RateLimiter,
+    RateLimitedTransport,
+    parse_reset,
+    parse_retry_after,
+)
+
+ORIGIN = "https://api.github.com"
+
+
+def limited_client(handler, limiter=None, rate=0.0):
+    limiter = limiter or RateLimiter(base_backoff=0.01)
+    budget = limiter.budget(ORIGIN)
+    budget.rate = rate
+    transport = RateLimitedTransport(httpx.MockTransport(handler), budget, limiter)
+    return httpx.AsyncClient(transport=transport, base_url=ORIGIN), budget
+
+
+def test_header_parsing():
+    assert parse_retry_after("3") == 3.0
+    assert parse_retry_after("garbage") is None
+    assert parse_reset("6m0s") == 360.0
+    assert parse_reset("20ms") == pytest.approx(0.02)
+    assert 59 <= parse_reset(str(int(time.time()) + 60)) <= 60
+
+
+@pytest.mark.asyncio
+async def test_429_is_retried_after_retry_after():
+    calls = []
+
+    def handler(request):
+        calls.append(time.monotonic())
+        if len(calls) == 1:
+            return httpx.Response(429, headers={"Retry-After": "0.05"})
+        return httpx.Response(200, json={"ok": True})
+
+    client, budget = limited_client(handler)
+    response = await client.get("/user")
+    assert response.status_code == 200
+    assert len(calls) == 2 and calls[1] - calls[0] >= 0.05
+    assert budget.rate_limited == 1
+
+
+@pytest.mark.asyncio
+async def test_secondary_rate_limit_403_retried_but_plain_403_returned():
+    calls = {"/secondary": 0, "/forbidden": 0}
+
+    def handler(request):
+        calls[request.url.path] += 1
+        if request.url.path == "/forbidden":
+            return httpx.Response(403, json={"message": "Resource not accessible"})
+        if calls["/secondary"] == 1:
+            return httpx.Response(403, headers={"Retry-After": "0"}, json={"message": "You have exceeded a secondary rate limit"})
+        return httpx.Response(201)
+
+    client, _ = limited_client(handler)
+    assert (await client.post("/secondary")).status_code == 201
+    assert (await client.get("/forbidden")).status_code == 403
+    assert calls == {"/secondary": 2, "/forbidden": 1}
+
+
+@pytest.mark.asyncio
+async def test_gives_up_when_wait_exceeds_max_wait():
+    def handler(request):
+        return httpx.Response(429, headers={"Retry-After": "600"})
+
+    client, _ = limited_client(handler, RateLimiter(max_wait=1))
+    assert (await client.get("/user")).status_code == 429
+
+
+@pytest.mark.asyncio
+async def test_budget_learned_from_headers_holds_requests_until_reset():
+    calls = []
+
+    def handler(request):
+        calls.append(request)
+        return httpx.Response(200, headers={
+            "X-RateLimit-Limit": "5000",
+            "X-RateLimit-Remaining": str(max(0, 2 - len(calls))),
+            "X-RateLimit-Reset": "0.1",
+        })
+
+    client, budget = limited_client(handler)
+    await client.get("/user")
+    assert budget.limit == 5000 and budget.remaining == 1
+
+    # The window is used up after the second call; the third waits for it to reset
+    await client.get("/user")
+    assert budget.remaining == 0
+    start = time.monotonic()
+    await client.get("/user")
+    assert time.monotonic() - start >= 0.05
+    assert budget.status()["throttled"] >= 1
+
+
+@pytest.mark.asyncio
+async def test_token_bucket_paces_sustained_calls():
+    budget = RateBudget(ORIGIN, rate=100.0, burst=2)
+    start = time.monotonic()
+    await asyncio.gather(*[budget.acquire() for _ in range(6)])
+    # Two go immediately from the burst, four more at 100/s
+    assert time.monotonic() - start >= 0.035
+
+
+@pytest.mark.asyncio
+async def test_pool_clients_share_the_limiter():
+    pool = HTTPClientPool(http2=False, rate_limiter=RateLimiter(rates={ORIGIN: 5.0}))
+    pool.client_for(f"{ORIGIN}/user")
+    assert pool.rate_limiter.status()[ORIGIN]["rate"] == 5.0
+    await pool.aclose()
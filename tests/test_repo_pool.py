@@ -0,0 +1,87 @@
+import json
+import asyncio
+import httpx
+import pytest
+
+from services.github_cache import GitHubMetadataCache
+from services.github_service import GitHubService
+from services.http_clients import HTTPClientPool
+
+
+class FakeRepos:
+    """GitHub endpoints for repo creation, listing, renaming and Pages."""
+
+    def __init__(self, existing=()):
+        self.repos = {name: {"pages": True} for name in existing}
+        self.calls = []
+
+    def repo_json(self, name):
+        return {"name": name, "full_name": f"student/{name}", "clone_url": f"https://github.com/student/{name}.git"}
+
+    def __call__(self, request):
+        path, method = request.url.path, request.method
+        body = json.loads(request.content) if request.content else None
+        self.calls.append((method, path))
+        if path == "/user":
+            return httpx.Response(200, json={"login": "student"})
+        if path == "/user/repos" and method == "GET":
+            return httpx.Response(200, json=[self.repo_json(n) for n in self.repos])
+        if path == "/user/repos" and method == "POST":
+            self.repos[body["name"]] = {"pages": False}
+            return httpx.Response(201, json=self.repo_json(body["name"]))
+        name = path.split("/")[3] if path.startswith("/repos/student/") else None
+        if name not in self.repos:
+            return httpx.Response(404, json={"message": "Not Found"})
+        if path.endswith("/pages") and method == "POST":
+            self.repos[name]["pages"] = True
+            return httpx.Response(201, json={})
+        if method == "PATCH":
+            self.repos[body["name"]] = self.repos.pop(name)
+            return httpx.Response(200, json=self.repo_json(body["name"]))
+        return httpx.Response(200, json=self.repo_json(name))
+
+
+def make_service(monkeypatch, fake, size):
+    monkeypatch.setenv("GITHUB_TOKEN", "test-token")
+    pool = HTTPClientPool(http2=False)
+    pool._clients["https://api.github.com"] = httpx.AsyncClient(transport=httpx.MockTransport(fake))
+    service = GitHubService(http_pool=pool, cache=GitHubMetadataCache(), repo_pool_size=size)
+    service.repo_pool.propagation_delay = 0
+    return service
+
+
+async def wait_for_spares(repo_pool, count):
+    for _ in range(100):
+        if repo_pool.stats()["ready"] >= count:
+            return
+        await asyncio.sleep(0.01)
+    raise AssertionError("pool did not fill")
+
+
+@pytest.mark.asyncio
+async def test_new_task_claims_a_prewarmed_repo(monkeypatch):
+    fake = FakeRepos(existing=["agent-pool-left0ver"])
+    service = make_service(monkeypatch, fake, size=2)
+    await service.repo_pool.start()
+    await wait_for_spares(service.repo_pool, 2)
+    assert all(repo["pages"] for repo in fake.repos.values())
+
+    fake.calls.clear()
+    clone_url = await service.get_or_create_repo("my-task")
+    assert clone_url == "https://github.com/student/my-task.git"
+    # Claimed the leftover spare by renaming it: no creation on the critical path
+    assert "my-task" in fake.repos and "agent-pool-left0ver" not in fake.repos
+    assert ("POST", "/user/repos") not in fake.calls[:3]
+
+    await wait_for_spares(service.repo_pool, 2)
+    await service.repo_pool.stop()
+    assert service.repo_pool.stats()["claimed"] == 1
+
+
+@pytest.mark.asyncio
+async def test_empty_or_disabled_pool_falls_back_to_creation(monkeypatch):
+    fake = FakeRepos()
+    service = make_service(monkeypatch, fake, size=0)
+    clone_url = await service.get_or_create_repo("other-task", delay=0)
+    assert clone_url == "https://github.com/student/other-task.git"
+    assert ("POST", "/user/repos") in fake.calls
@@ -1,5 +1,15 @@
+import json
+import asyncio
+import httpx
 import pytest
+from core.generator import CodeGenerator
+from utils import workspace as workspace_module
+from services import llm_service as llm_module
 from services.llm_service import LLMService
+from services.http_clients import HTTPClientPool
+from services.llm_cache import LLMResponseCache
+from services.hedging import HedgePolicy, LatencyTracker
+from services.circuit_breaker import BreakerRegistry, BreakerState, CircuitBreaker
 
 @pytest.fixture
 def llm_service():
@@ -17,3 +27,320 @@ def test_refactor_code_mock(llm_service):
     # Check that refactor added a comment
     for content in updated.values():
         assert "Updated for round 2 based on brief" in content
+
+
+AIPIPE_URL = "https://aipipe.test/openai/v1/responses"
+GEMINI_URL = "https://gemini.test/v1beta/models/gemini-2.5-flash:generateContent"
+
+
+@pytest.fixture(autouse=True)
+def provider_urls(monkeypatch):
+    """Point both providers at fixed hosts so mock transports can route on them whatever the env says."""
+    monkeypatch.setattr(llm_module, "api_base", AIPIPE_URL)
+    monkeypatch.setattr(llm_module.settings, "GEMINI_BASE_URL", GEMINI_URL)
+
+
+def is_gemini(request):
+    return request.url.host == "gemini.test"
+
+
+def aipipe_body(files):
+    text = "```json\n" + json.dumps(files) + "\n```"
+    return {"output": [{"content": [{"type": "output_text", "text": text}]}]}
+
+
+def gemini_body(files):
+    return {"candidates": [{"content": {"parts": [{"text": json.dumps(files)}]}}]}
+
+
+def service_with_transport(handler, tmp_path, hedging=None, breakers=None):
+    pool = HTTPClientPool(http2=False)
+    transport = httpx.MockTransport(handler)
+    for url in (llm_module.api_base, str(llm_module.settings.GEMINI_BASE_URL)):
+        pool._clients[pool._origin(url)] = httpx.AsyncClient(transport=transport)
+    return LLMService(
+        http_pool=pool,
+        cache=LLMResponseCache(cache_dir=str(tmp_path)),
+        hedging=hedging or HedgePolicy(),
+        breakers=breakers or BreakerRegistry(),
+    )
+
+
+@pytest.mark.asyncio
+async def test_identical_generation_is_served_from_cache(tmp_path):
+    calls = []
+
+    def handler(request):
+        calls.append(request.url)
+        return httpx.Response(200, json=aipipe_body({"index.html": "<h1>hi</h1>"}))
+
+    service = service_with_transport(handler, tmp_path)
+    first = await service.generate_code("cache_app", "Say hi", ["Shows hi"], [])
+    second = await service.generate_code("cache_app", "Say hi", ["Shows hi"], [])
+    assert first == second
+    assert first["index.html"] == "<h1>hi</h1>"
+    assert len(calls) == 1
+    assert service.cache.stats()["hits"] == 1
+
+    await service.generate_code("cache_app", "Say hi", ["Shows hi"], [], bypass_cache=True)
+    assert len(calls) == 2
+
+
+@pytest.mark.asyncio
+async def test_streaming_generation_emits_files_incrementally(tmp_path):
+    text = "```json\n" + json.dumps({"index.html": "<h1>hi</h1>", "app.js": "run()"}) + "\n```"
+    events = [
+        {"type": "response.output_text.delta", "delta": text[i:i + 7]}
+        for i in range(0, len(text), 7)
+    ]
+    sse = "".join(f"event: {e['type']}\ndata: {json.dumps(e)}\n\n" for e in events)
+
+    def handler(request):
+        assert json.loads(request.content)["stream"] is True
+        return httpx.Response(200, text=sse, headers={"Content-Type": "text/event-stream"})
+
+    service = service_with_transport(handler, tmp_path)
+    service.streaming = True
+    seen = []
+
+    async def on_file(name, content):
+        seen.append(name)
+
+    files = await service.generate_code("stream_app", "Say hi", ["Shows hi"], [], on_file=on_file)
+    assert seen[:2] == ["index.html", "app.js"]
+    assert files["app.js"] == "run()"
+
+
+@pytest.mark.asyncio
+async def test_build_request_can_bypass_the_response_cache(tmp_path):
+    calls = []
+
+    def handler(request):
+        calls.append(request.url.host)
+        return httpx.Response(200, json=aipipe_body({"index.html": f"<h1>answer {len(calls)}</h1>"}))
+
+    service = service_with_transport(handler, tmp_path / "cache")
+    generator = CodeGenerator(workspace_dir=str(tmp_path / "workspace"), llm_service=service)
+    await generator.orchestrate_build("bypass_app", "Say hi", ["Shows hi"], [])
+    cached = await generator.orchestrate_build("bypass_app", "Say hi", ["Shows hi"], [])
+    fresh = await generator.orchestrate_build("bypass_app", "Say hi", ["Shows hi"], [], bypass_cache=True)
+
+    assert len(calls) == 2
+    assert cached["bundle"].files["index.html"].data == b"<h1>answer 1</h1>"
+    assert fresh["bundle"].files["index.html"].data == b"<h1>answer 2</h1>"
+    await workspace_module.wait_for_workspace(tmp_path / "workspace" / "bypass_app")
+
+
+@pytest.mark.asyncio
+async def test_complete_responses_are_not_written_on_the_critical_path(monkeypatch, tmp_path):
+    service = service_with_transport(
+        lambda request: httpx.Response(200, json=aipipe_body({"index.html": "<h1>hi</h1>"})), tmp_path / "cache"
+    )
+    seen = []
+
+    async def on_file(name, content):
+        seen.append(name)
+
+    # Neither a fresh non-streamed answer nor a cache hit goes through the per-file callback
+    await service.generate_code("whole_app", "Say hi", ["Shows hi"], [], on_file=on_file)
+    service.streaming = True
+    await service.generate_code("whole_app", "Say hi", ["Shows hi"], [], on_file=on_file)
+    assert seen == []
+
+    # The build returns its in-memory bundle while the workspace write is still blocked
+    disk = asyncio.Event()
+    write_file = workspace_module.write_workspace_file_async
+
+    async def slow_write(root, filename, content):
+        await disk.wait()
+        await write_file(root, filename, content)
+    monkeypatch.setattr(workspace_module, "write_workspace_file_async", slow_write)
+
+    generator = CodeGenerator(workspace_dir=str(tmp_path / "workspace"), llm_service=service)
+    output = await asyncio.wait_for(generator.orchestrate_build("whole_app", "Say hi", ["Shows hi"], []), timeout=2)
+    assert output["bundle"].files["index.html"].data == b"<h1>hi</h1>"
+    assert not (tmp_path / "workspace" / "whole_app" / "index.html").exists()
+
+    disk.set()
+    await workspace_module.wait_for_workspace(tmp_path / "workspace" / "whole_app")
+    assert (tmp_path / "workspace" / "whole_app" / "index.html").read_text() == "<h1>hi</h1>"
+
+
+@pytest.mark.asyncio
+async def test_full_refactor_keeps_files_the_model_only_saw_as_outlines(monkeypatch, tmp_path):
+    body = "\n".join(f"  total += values[{j}] * {j};" for j in range(40))
+    big_js = "\n".join(f"function step{i}(values) {{\n  let total = 0;\n{body}\n  return total;\n}}" for i in range(30))
+    existing = {"app.js": big_js, "index.html": "<h1>old</h1>"}
+    # The model rebuilds app.js from its outline (signatures only) and edits index.html
+    answer = json.dumps({"app.js": "function step0() {}", "index.html": "<h1>new</h1>"})
+    sse = sse_events([
+        {"type": "response.output_text.delta", "delta": answer},
+        {"type": "response.completed"},
+    ])
+    service = service_with_transport(
+        lambda request: httpx.Response(200, text=sse, headers={"Content-Type": "text/event-stream"}), tmp_path
+    )
+    service.streaming = True
+    monkeypatch.setattr(llm_module.settings, "LLM_PROMPT_TOKEN_BUDGET", 4000)
+    streamed = []
+
+    async def on_file(name, content):
+        streamed.append(name)
+
+    files = await service.refactor_code(existing, "outline_app", "Say hello", ["Shows hello"], [], on_file=on_file)
+
+    assert service.last_prompt.outlined == {"app.js"}
+    assert files["app.js"] == big_js
+    assert files["index.html"] == "<h1>new</h1>"
+    assert streamed == ["index.html"]
+
+
+def sse_events(events):
+    return "".join(f"event: {e['type']}\ndata: {json.dumps(e)}\n\n" for e in events)
+
+
+@pytest.mark.asyncio
+async def test_truncated_stream_falls_back_and_is_not_cached(tmp_path):
+    full = json.dumps({"index.html": "<h1>hi</h1>", "app.js": "run()"})
+    # The connection drops after the first file: no closing brace, no response.completed
+    truncated = sse_events([{"type": "response.output_text.delta", "delta": full[:full.index("app.js") + 12]}])
+    calls = []
+
+    def handler(request):
+        calls.append(request.url.host)
+        if is_gemini(request):
+            return httpx.Response(200, json=gemini_body({"index.html": "from gemini"}))
+        return httpx.Response(200, text=truncated, headers={"Content-Type": "text/event-stream"})
+
+    service = service_with_transport(handler, tmp_path, hedging=HedgePolicy(initial_delay=60))
+    service.streaming = True
+
+    async def on_file(name, content):
+        pass
+
+    files = await service.generate_code("cut_app", "Say hi", ["Shows hi"], [], on_file=on_file)
+    assert files["index.html"] == "from gemini"
+    assert service.hedging.stats()["fallbacks"] == 1
+
+    # The partial AIPipe answer was not cached: a retry goes back to the provider
+    prompt = service.last_prompt.text
+    key = service.cache.make_key("aipipe", llm_module.AIPIPE_MODEL, prompt)
+    assert service.cache.get(key) is None
+
+
+@pytest.mark.asyncio
+async def test_length_cut_stream_is_rejected(tmp_path):
+    incomplete = sse_events([
+        {"type": "response.output_text.delta", "delta": '{"index.html": "<h1>hi</h1>", "app.js": "ru'},
+        {"type": "response.incomplete", "response": {"incomplete_details": {"reason": "max_output_tokens"}}},
+    ])
+    service = service_with_transport(
+        lambda request: httpx.Response(200, text=incomplete, headers={"Content-Type": "text/event-stream"}), tmp_path
+    )
+
+    async def on_file(name, content):
+        pass
+
+    with pytest.raises(llm_module.LLMProviderError, match="max_output_tokens"):
+        await service._stream_aipipe("prompt", on_file)
+
+
+@pytest.mark.asyncio
+async def test_slow_primary_is_hedged_and_cancelled(tmp_path):
+    import asyncio
+    cancelled = asyncio.Event()
+
+    async def handler(request):
+        if is_gemini(request):
+            return httpx.Response(200, json=gemini_body({"index.html": "from gemini"}))
+        try:
+            await asyncio.sleep(5)
+        except asyncio.CancelledError:
+            cancelled.set()
+            raise
+        return httpx.Response(200, json=aipipe_body({"index.html": "from aipipe"}))
+
+    policy = HedgePolicy(initial_delay=0.05)
+    service = service_with_transport(handler, tmp_path, hedging=policy)
+    files = await service.generate_code("hedge_app", "Say hi", ["Shows hi"], [])
+
+    assert files["index.html"] == "from gemini"
+    assert cancelled.is_set()
+    stats = policy.stats()
+    assert stats["hedged"] == 1 and stats["hedge_wins"] == 1
+    assert stats["wins"] == {"gemini": 1}
+
+
+@pytest.mark.asyncio
+async def test_failed_primary_falls_back_without_waiting(tmp_path):
+    def handler(request):
+        if is_gemini(request):
+            return httpx.Response(200, json=gemini_body({"index.html": "from gemini"}))
+        return httpx.Response(500, text="upstream error")
+
+    policy = HedgePolicy(initial_delay=60)
+    service = service_with_transport(handler, tmp_path, hedging=policy)
+    files = await service.generate_code("fallback_app", "Say hi", ["Shows hi"], [])
+
+    assert files["index.html"] == "from gemini"
+    assert policy.stats()["fallbacks"] == 1 and policy.stats()["hedged"] == 0
+
+
+def test_hedge_delay_tracks_primary_percentile():
+    policy = HedgePolicy(percentile=90, initial_delay=30, min_delay=1, max_delay=20, min_samples=5)
+    assert policy.hedge_delay("aipipe") == 30
+    for seconds in range(1, 11):
+        policy.record_latency("aipipe", float(seconds))
+    assert policy.hedge_delay("aipipe") == 9.0
+    policy.record_latency("aipipe", 500.0)
+    assert LatencyTracker().percentile(50) is None
+    assert policy.hedge_delay("aipipe") <= 20
+    assert HedgePolicy(enabled=False).hedge_delay("aipipe") is None
+
+
+def test_breaker_opens_on_errors_and_recovers_through_half_open(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr("services.circuit_breaker.time.monotonic", lambda: now[0])
+    breaker = CircuitBreaker("aipipe", window=10, min_calls=4, error_rate=0.5, open_seconds=30)
+
+    for ok in (True, False, True, False):
+        breaker.record(ok, 1.0)
+    assert breaker.state == BreakerState.OPEN
+    assert not breaker.available() and not breaker.allow()
+
+    now[0] += 31
+    assert breaker.allow() and breaker.state == BreakerState.HALF_OPEN
+    assert not breaker.allow()  # only one probe at a time
+    breaker.record(False, 1.0)
+    assert breaker.state == BreakerState.OPEN
+
+    now[0] += 31
+    assert breaker.allow()
+    breaker.record(True, 1.0)
+    assert breaker.state == BreakerState.CLOSED
+
+
+def test_breaker_opens_on_slow_calls():
+    breaker = CircuitBreaker("gemini", min_calls=3, slow_call_seconds=10, slow_rate=0.6)
+    for _ in range(3):
+        breaker.record(True, 12.0)
+    assert breaker.state == BreakerState.OPEN
+
+
+@pytest.mark.asyncio
+async def test_open_provider_is_skipped(tmp_path):
+    calls = []
+
+    def handler(request):
+        calls.append(request.url.host)
+        return httpx.Response(200, json=gemini_body({"index.html": "from gemini"}))
+
+    breakers = BreakerRegistry(min_calls=1, open_seconds=300)
+    breakers.get("aipipe").record(False, 1.0, "down")
+    service = service_with_transport(handler, tmp_path, hedging=HedgePolicy(initial_delay=60), breakers=breakers)
+    files = await service.generate_code("breaker_app", "Say hi", ["Shows hi"], [])
+
+    assert files["index.html"] == "from gemini"
+    assert calls == ["gemini.test"]
+    assert breakers.status()["aipipe"]["state"] == "open"
+    assert breakers.status()["gemini"]["state"] == "closed"
@@ -0,0 +1,51 @@
+import json
+import pytest
+from utils.stream_parser import IncrementalFileParser
+from utils.workspace import StreamingWorkspaceWriter
+
+FILES = {
+    "index.html": "<h1 class=\"title\">Hi</h1>\n<script src=\"app.js\"></script>",
+    "app.js": "console.log('{ not a brace }');\n// \\ backslash",
+    "package.json": {"name": "demo", "scripts": {"start": "serve ."}},
+}
+
+
+@pytest.mark.parametrize("chunk_size", [1, 5, 64, 10_000])
+def test_files_are_emitted_as_soon_as_complete(chunk_size):
+    text = "```json\n" + json.dumps(FILES, indent=2) + "\n```"
+    parser = IncrementalFileParser()
+    emitted = []
+    for i in range(0, len(text), chunk_size):
+        emitted.extend(parser.feed(text[i:i + chunk_size]))
+
+    assert [name for name, _ in emitted] == ["index.html", "app.js", "package.json"]
+    assert dict(emitted)["index.html"] == FILES["index.html"]
+    assert dict(emitted)["app.js"] == FILES["app.js"]
+    assert json.loads(dict(emitted)["package.json"]) == FILES["package.json"]
+    assert parser.done
+
+
+def test_first_file_is_available_before_stream_ends():
+    text = json.dumps({"a.txt": "first", "b.txt": "x" * 1000})
+    parser = IncrementalFileParser()
+    cut = text.index("b.txt")
+    assert parser.feed(text[:cut]) == [("a.txt", "first")]
+    assert parser.feed(text[cut:]) == [("b.txt", "x" * 1000)]
+
+
+@pytest.mark.asyncio
+async def test_writer_reconciles_streamed_files(tmp_path):
+    (tmp_path / "keep.txt").write_text("existing", encoding="utf-8")
+    writer = StreamingWorkspaceWriter(tmp_path)
+    await writer.on_file("partial.js", "from a failed stream")
+    await writer.on_file("keep.txt", "rewritten mid-stream")
+    assert writer.time_to_first_file is not None
+
+    saved = await writer.finalize({"index.html": "<p>final</p>"})
+    assert saved == [str(tmp_path / "index.html")]
+    assert not (tmp_path / "partial.js").exists()
+    # pre-existing files are never deleted by reconciliation
+    assert (tmp_path / "keep.txt").exists()
+
+    with pytest.raises(ValueError):
+        await writer.on_file("../escape.txt", "nope")
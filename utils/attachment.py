@@ -1,33 +1,172 @@
 from pathlib import Path
 import base64
+import binascii
 import logging
 import csv
+import os
 import shutil
+import tempfile
+import time
 import mimetypes
+import hashlib
+import json
+from typing import Dict, List, Tuple
+
+from utils.config import get_settings
+from utils.workspace import resolve_workspace_path, write_workspace_file
 
 logger = logging.getLogger("llm_agent.utils.attachments")
 
 PROJECT_ROOT = Path(__file__).resolve().parent.parent  # adjust as needed
 ATTACHMENT_DIR = PROJECT_ROOT / "data" / "attachments"
 ATTACHMENT_DIR.mkdir(parents=True, exist_ok=True)
+# Content-addressed store: objects/<sha256[:2]>/<sha256>, plus name->hash manifests per request
+OBJECTS_DIR = ATTACHMENT_DIR / "objects"
+MANIFEST_DIR = ATTACHMENT_DIR / "manifests"
+
+# base64 characters decoded per step (multiple of 4 -> 192 KiB of output)
+B64_CHUNK_CHARS = 256 * 1024
+
+# Leading bytes of common binary formats, used to check the declared MIME type
+MAGIC_NUMBERS = [
+    (b"\x89PNG\r\n\x1a\n", "image/png"),
+    (b"\xff\xd8\xff", "image/jpeg"),
+    (b"GIF87a", "image/gif"),
+    (b"GIF89a", "image/gif"),
+    (b"%PDF-", "application/pdf"),
+    (b"PK\x03\x04", "application/zip"),
+    (b"\x1f\x8b", "application/gzip"),
+]
+
+
+class AttachmentTooLargeError(ValueError):
+    """Raised when an attachment or a request's attachments exceed the configured byte limits."""
+
+
+def _split_data_url(url: str):
+    """Return (mime, offset of the base64 payload) for a data: URL."""
+    comma = url.index(",")
+    mime = url[:comma].split(";")[0].replace("data:", "")
+    return mime, comma + 1
+
+
+def estimate_decoded_size(url: str) -> int:
+    """Decoded byte size of a base64 data: URL, computed without decoding it."""
+    if not url.startswith("data:") or "," not in url:
+        return 0
+    _, start = _split_data_url(url)
+    payload_chars = len(url) - start
+    padding = len(url) - len(url.rstrip("=")) if payload_chars else 0
+    return max(0, payload_chars * 3 // 4 - padding)
+
+
+def check_attachment_limits(attachments, max_bytes=None, max_total_bytes=None):
+    """
+    Cheap pre-check of attachment sizes from the encoded length alone.
+    Raises AttachmentTooLargeError if any limit is exceeded.
+    """
+    settings = get_settings()
+    max_bytes = max_bytes or settings.ATTACHMENT_MAX_BYTES
+    max_total_bytes = max_total_bytes or settings.ATTACHMENT_MAX_TOTAL_BYTES
+    total = 0
+    for att in attachments or []:
+        name = att.get("name") or "attachment"
+        size = estimate_decoded_size(att.get("url", ""))
+        if size > max_bytes:
+            raise AttachmentTooLargeError(f"Attachment '{name}' is {size} bytes (limit {max_bytes})")
+        total += size
+    if total > max_total_bytes:
+        raise AttachmentTooLargeError(f"Attachments total {total} bytes (limit {max_total_bytes})")
+    return total
 
 
-def decode_attachments(attachments):
+def sniff_mime(head: bytes, declared: str) -> str:
+    """
+    Check the declared MIME type against the first bytes of the content and
+    return the type to trust.
+    """
+    for magic, mime in MAGIC_NUMBERS:
+        if head.startswith(magic):
+            # zip-based formats (docx, xlsx, ...) keep their specific declared type
+            if mime == "application/zip" and declared.startswith("application/"):
+                return declared
+            return mime
+    if head.startswith(b"RIFF") and head[8:12] == b"WEBP":
+        return "image/webp"
+    if declared.startswith("text/") or declared in ("application/json", "image/svg+xml"):
+        if b"\x00" in head:
+            return "application/octet-stream"
+        return declared
+    if declared.startswith("image/") and declared != "image/svg+xml":
+        # claims to be a raster image but has no known signature
+        return "application/octet-stream"
+    return declared
+
+
+def object_path(sha256: str) -> Path:
+    return OBJECTS_DIR / sha256[:2] / sha256
+
+
+def _decode_to_file(url: str, start: int, fh, limit: int, name: str, digest) -> Tuple[int, bytes]:
+    """
+    Base64-decode url[start:] into `fh` in fixed-size chunks, feeding `digest`.
+    Returns the number of bytes written and the first bytes of the content
+    (for MIME sniffing).
+    """
+    written = 0
+    head = b""
+    carry = ""
+    for offset in range(start, len(url), B64_CHUNK_CHARS):
+        chunk = carry + "".join(url[offset:offset + B64_CHUNK_CHARS].split())
+        usable = len(chunk) - len(chunk) % 4
+        chunk, carry = chunk[:usable], chunk[usable:]
+        if not chunk:
+            continue
+        data = binascii.a2b_base64(chunk)
+        written += len(data)
+        if written > limit:
+            raise AttachmentTooLargeError(f"Attachment '{name}' exceeds {limit} bytes")
+        if len(head) < 16:
+            head += data[:16 - len(head)]
+        digest.update(data)
+        fh.write(data)
+    if carry:
+        raise binascii.Error(f"Truncated base64 payload ({len(carry)} trailing chars)")
+    return written, head
+
+
+def decode_attachments(attachments, max_bytes=None, max_total_bytes=None):
     """
     Decode base64-encoded attachments and save them locally.
-    
+
+    Payloads are decoded in fixed-size chunks straight to a temp file, so memory
+    use does not grow with attachment size, and stored once by SHA-256 under
+    `objects/`. Content that is already stored is not written again. Declared
+    MIME types are checked against the file signature.
+
     Parameters:
         attachments (list of dict): Each dict has keys 'name' and 'url'.
             'url' must be in the format "data:<mime>;base64,<b64data>"
-    
+        max_bytes (int, optional): Per-attachment limit (default ATTACHMENT_MAX_BYTES)
+        max_total_bytes (int, optional): Per-request limit (default ATTACHMENT_MAX_TOTAL_BYTES)
+
     Returns:
         list of dict: Each dict contains:
             - name: filename
-            - path: local path
-            - mime: MIME type
+            - path: local path (the content-addressed object)
+            - mime: MIME type (verified against the content)
             - size: file size in bytes
+            - sha256: content hash
+
+    Raises:
+        AttachmentTooLargeError: if a size limit is exceeded.
     """
+    settings = get_settings()
+    max_bytes = max_bytes or settings.ATTACHMENT_MAX_BYTES
+    max_total_bytes = max_total_bytes or settings.ATTACHMENT_MAX_TOTAL_BYTES
+
     saved = []
+    total = 0
     for att in attachments or []:
         name = att.get("name") or "attachment"
         url = att.get("url", "")
@@ -35,31 +174,54 @@ def decode_attachments(attachments):
             logger.warning(f"Skipping attachment '{name}': not a data: URL")
             continue
 
-        try:
-            header, b64data = url.split(",", 1)
-            mime = header.split(";")[0].replace("data:", "")
-            data = base64.b64decode(b64data)
-
-            # Avoid overwriting existing files
-            print("TMP_DIR:", ATTACHMENT_DIR.resolve())
-            path = ATTACHMENT_DIR / name
-            counter = 1
-            while path.exists():
-                path = ATTACHMENT_DIR / f"{path.stem}_{counter}{path.suffix}"
-                counter += 1
-
-            with open(path, "wb") as f:
-                f.write(data)
+        limit = min(max_bytes, max_total_bytes - total)
+        if estimate_decoded_size(url) > limit:
+            raise AttachmentTooLargeError(f"Attachment '{name}' would exceed the attachment size limit ({limit} bytes left)")
 
+        tmp_path = None
+        try:
+            declared, start = _split_data_url(url)
+            started = time.perf_counter()
+            digest = hashlib.sha256()
+            fd, tmp_path = tempfile.mkstemp(dir=ATTACHMENT_DIR, prefix=".decode-", suffix=".tmp")
+            with os.fdopen(fd, "wb") as fh:
+                size, head = _decode_to_file(url, start, fh, limit, name, digest)
+            elapsed = time.perf_counter() - started
+
+            mime = sniff_mime(head, declared)
+            if mime != declared:
+                logger.warning(f"Attachment '{name}' declared {declared} but content looks like {mime}")
+
+            sha256 = digest.hexdigest()
+            path = object_path(sha256)
+            reused = path.exists()
+            if not reused:
+                path.parent.mkdir(parents=True, exist_ok=True)
+                # Objects are shared by hardlink across workspaces; never modify them in place
+                os.chmod(tmp_path, 0o444)
+                os.replace(tmp_path, path)
+                tmp_path = None
+            total += size
+
+            rate = size / elapsed / (1024 * 1024) if elapsed > 0 else float("inf")
             saved.append({
                 "name": name,
                 "path": str(path),
                 "mime": mime,
-                "size": len(data)
+                "size": size,
+                "sha256": sha256,
             })
-            logger.info(f"Decoded and saved attachment: {saved}")
+            logger.info(
+                f"Decoded attachment '{name}' ({mime}, {size} bytes) in {elapsed:.3f}s ({rate:.1f} MB/s)"
+                f"{' - already stored' if reused else ''} [{sha256[:12]}]"
+            )
+        except AttachmentTooLargeError:
+            raise
         except Exception as e:
             logger.exception(f"Failed to decode attachment '{name}': {e}")
+        finally:
+            if tmp_path is not None:
+                Path(tmp_path).unlink(missing_ok=True)
 
     return saved
 
@@ -142,19 +304,66 @@ def generate_readme_fallback(brief: str, checks=None, attachments_meta=None, rou
 This README was generated as a fallback (OpenAI did not return an explicit README).
 """
 
-def copy_required_attachments(app_dir: Path, attachment_names: list[str]):
-    src_dir = Path("data/attachments")
-    for name in attachment_names:
-        src = src_dir / name
-        dst = app_dir / name
-        if src.exists():
-            shutil.copy(src, dst)
-            
+def _link_or_copy(src: Path, dst: Path) -> None:
+    """
+    Place `src` at `dst` as a hardlink, falling back to a copy across filesystems
+    or where links are not permitted. The swap is atomic via a temp name.
+    """
+    if dst.exists() and os.path.samefile(src, dst):
+        return
+    dst.parent.mkdir(parents=True, exist_ok=True)
+    tmp = dst.with_name(f".{dst.name}.link")
+    tmp.unlink(missing_ok=True)
+    try:
+        os.link(src, tmp)
+    except OSError:
+        shutil.copyfile(src, tmp)
+    os.replace(tmp, dst)
+
+
+def materialize_attachments(app_dir: Path, saved: List[Dict]) -> List[str]:
+    """
+    Link decoded attachments into `app_dir` under their original names.
+
+    Parameters:
+        app_dir (Path): Workspace directory of the task.
+        saved (list of dict): Output from decode_attachments.
+
+    Returns:
+        list of str: Workspace paths of the linked attachments.
+    """
+    paths = []
+    for att in saved:
+        dst = resolve_workspace_path(app_dir, att["name"])
+        _link_or_copy(Path(att["path"]), dst)
+        paths.append(str(dst))
+    if paths:
+        logger.info(f"Linked {len(paths)} attachment(s) into {app_dir}")
+    return paths
+
+
+def write_attachment_manifest(saved: List[Dict], manifest_name: str) -> Path:
+    """
+    Record the name -> content hash mapping of one request's attachments.
+    """
+    manifest = {att["name"]: {"sha256": att["sha256"], "size": att["size"], "mime": att["mime"]} for att in saved}
+    return write_workspace_file(MANIFEST_DIR, f"{manifest_name}.json", json.dumps(manifest, indent=2, sort_keys=True))
+
+
+def read_attachment_manifest(manifest_name: str) -> Dict[str, Dict]:
+    """
+    Load a manifest written by write_attachment_manifest ({} if there is none).
+    """
+    try:
+        return json.loads((MANIFEST_DIR / f"{manifest_name}.json").read_text(encoding="utf-8"))
+    except (FileNotFoundError, ValueError):
+        return {}
+
 
-def prepare_attachments_for_prompt(attachments):
+def prepare_attachments_for_prompt(attachments, max_chars=8000):
     """
     Prepares a formatted summary of attachments with actual inline content for text/code files
-    and short base64 previews for image/binary files.
+    (truncated to `max_chars` each) and short base64 previews for image/binary files.
     """
 
     parts = []
@@ -162,26 +371,31 @@ def prepare_attachments_for_prompt(attachments):
     for att in attachments:
         # Support both dict-based and object-based attachments
         file_path = Path(att.get("path") if isinstance(att, dict) else att.path)
-        mime, _ = mimetypes.guess_type(file_path.name)
+        # Prefer the original attachment name so the prompt does not depend on on-disk de-duplication
+        name = (att.get("name") if isinstance(att, dict) else getattr(att, "name", None)) or file_path.name
+        mime, _ = mimetypes.guess_type(name)
         mime = mime or "application/octet-stream"
 
-        header = f"### {file_path.name} ({mime}) ###"
+        header = f"### {name} ({mime}) ###"
 
         # --- Text and code files ---
-        if mime.startswith("text/") or file_path.suffix in (".py", ".js", ".json", ".md", ".html", ".css", ".ts"):
+        if mime.startswith("text/") or Path(name).suffix in (".py", ".js", ".json", ".md", ".html", ".css", ".ts"):
             try:
-                content = file_path.read_text(encoding="utf-8")
-                if len(content) > 8000:
-                    content = content[:8000] + "\n... [truncated for length]\n"
-                parts.append(f"{header}\n{content}\n--- End of {file_path.name} ---\n")
+                with open(file_path, "r", encoding="utf-8") as f:
+                    content = f.read(max_chars + 1)
+                if len(content) > max_chars:
+                    content = content[:max_chars] + "\n... [truncated for length]\n"
+                parts.append(f"{header}\n{content}\n--- End of {name} ---\n")
             except Exception as e:
                 parts.append(f"{header}\n[Error reading file: {e}]\n")
 
         # --- Image files ---
         elif mime.startswith("image/"):
             try:
-                b64data = base64.b64encode(file_path.read_bytes()).decode("utf-8")
-                preview = b64data[:300] + "..." if len(b64data) > 300 else b64data
+                with open(file_path, "rb") as f:
+                    head = f.read(226)  # 225 bytes -> 300 base64 chars
+                b64data = base64.b64encode(head).decode("utf-8")
+                preview = b64data[:300] + "..." if len(head) > 225 else b64data
                 parts.append(f"{header}\n(Image attachment)\nBase64 preview:\n{preview}\n")
             except Exception as e:
                 parts.append(f"{header}\n[Error encoding image: {e}]\n")
@@ -0,0 +1,63 @@
+import os
+import stat
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, Tuple, Union
+
+# Git tree modes
+REGULAR = "100644"
+EXECUTABLE = "100755"
+
+
+@dataclass
+class BundleFile:
+    data: bytes
+    mode: str = REGULAR
+
+
+@dataclass
+class FileBundle:
+    """
+    The files of one build or revision, in memory: repo-relative path -> bytes
+    and git mode. Produced by the generator/reviser and committed by the deployer
+    as-is, so nothing has to be read back from the workspace and binary files
+    (e.g. PNG attachments) travel untouched.
+    """
+    files: Dict[str, BundleFile] = field(default_factory=dict)
+
+    def add(self, path: str, content: Union[str, bytes], mode: str = REGULAR) -> None:
+        data = content.encode("utf-8") if isinstance(content, str) else bytes(content)
+        self.files[path] = BundleFile(data, mode)
+
+    def update(self, files: Dict[str, Union[str, bytes]]) -> "FileBundle":
+        for path, content in files.items():
+            self.add(path, content)
+        return self
+
+    @classmethod
+    def from_paths(cls, paths: Iterable[Union[str, Path]]) -> "FileBundle":
+        """Load files from disk by basename, keeping the executable bit (legacy path-based metadata)."""
+        bundle = cls()
+        for path in map(Path, paths):
+            executable = path.stat().st_mode & stat.S_IXUSR
+            bundle.add(os.path.basename(path), path.read_bytes(), EXECUTABLE if executable else REGULAR)
+        return bundle
+
+    def contents(self) -> Dict[str, bytes]:
+        return {path: f.data for path, f in self.files.items()}
+
+    def modes(self) -> Dict[str, str]:
+        return {path: f.mode for path, f in self.files.items()}
+
+    @property
+    def total_bytes(self) -> int:
+        return sum(len(f.data) for f in self.files.values())
+
+    def __contains__(self, path: str) -> bool:
+        return path in self.files
+
+    def __iter__(self) -> Iterator[Tuple[str, BundleFile]]:
+        return iter(self.files.items())
+
+    def __len__(self) -> int:
+        return len(self.files)
@@ -14,6 +14,64 @@ class Settings(BaseSettings):
     HUGGING_FACE_TOKEN: str | None = None
     AIPIPE_URL: AnyHttpUrl = Field(..., env="AIPIPE_URL")
     GEMINI_BASE_URL: AnyHttpUrl = Field(..., env="GEMINI_BASE_URL")
+    JOB_WORKERS: int = Field(8, env="JOB_WORKERS")
+    LLM_STAGE_CONCURRENCY: int = Field(4, env="LLM_STAGE_CONCURRENCY")
+    GITHUB_STAGE_CONCURRENCY: int = Field(4, env="GITHUB_STAGE_CONCURRENCY")
+    BATCH_MAX_ITEMS: int = Field(500, env="BATCH_MAX_ITEMS")
+    JOB_QUEUE_MAXSIZE: int = Field(100, env="JOB_QUEUE_MAXSIZE")
+    JOB_RETENTION_SECONDS: int = Field(3600, env="JOB_RETENTION_SECONDS")
+    IDEMPOTENCY_TTL_SECONDS: int = Field(86400, env="IDEMPOTENCY_TTL_SECONDS")
+    HTTP_MAX_CONNECTIONS: int = Field(100, env="HTTP_MAX_CONNECTIONS")
+    HTTP_MAX_KEEPALIVE_CONNECTIONS: int = Field(20, env="HTTP_MAX_KEEPALIVE_CONNECTIONS")
+    HTTP_KEEPALIVE_EXPIRY: float = Field(30.0, env="HTTP_KEEPALIVE_EXPIRY")
+    HTTP2_ENABLED: bool = Field(True, env="HTTP2_ENABLED")
+    HTTP_DEFAULT_TIMEOUT: float = Field(30.0, env="HTTP_DEFAULT_TIMEOUT")
+    GITHUB_RATE_LIMIT_RPS: float = Field(10.0, env="GITHUB_RATE_LIMIT_RPS")
+    RATE_LIMIT_BURST: int = Field(20, env="RATE_LIMIT_BURST")
+    RATE_LIMIT_MAX_RETRIES: int = Field(5, env="RATE_LIMIT_MAX_RETRIES")
+    RATE_LIMIT_MAX_WAIT: float = Field(120.0, env="RATE_LIMIT_MAX_WAIT")
+    GITHUB_CACHE_ENABLED: bool = Field(True, env="GITHUB_CACHE_ENABLED")
+    GITHUB_CACHE_USER_TTL: float = Field(3600.0, env="GITHUB_CACHE_USER_TTL")
+    GITHUB_CACHE_REPO_TTL: float = Field(600.0, env="GITHUB_CACHE_REPO_TTL")
+    GITHUB_CACHE_REF_TTL: float = Field(0.0, env="GITHUB_CACHE_REF_TTL")
+    REPO_POOL_SIZE: int = Field(0, env="REPO_POOL_SIZE")
+    REPO_POOL_PREFIX: str = Field("agent-pool-", env="REPO_POOL_PREFIX")
+    PAGES_WAIT_ENABLED: bool = Field(True, env="PAGES_WAIT_ENABLED")
+    PAGES_READY_TIMEOUT: float = Field(300.0, env="PAGES_READY_TIMEOUT")
+    PAGES_POLL_INITIAL_DELAY: float = Field(2.0, env="PAGES_POLL_INITIAL_DELAY")
+    PAGES_POLL_MAX_DELAY: float = Field(30.0, env="PAGES_POLL_MAX_DELAY")
+    GITHUB_BLOB_CONCURRENCY: int = Field(8, env="GITHUB_BLOB_CONCURRENCY")
+    GITHUB_INLINE_MAX_BYTES: int = Field(512 * 1024, env="GITHUB_INLINE_MAX_BYTES")
+    LLM_STREAMING_ENABLED: bool = Field(False, env="LLM_STREAMING_ENABLED")
+    LLM_HEDGE_ENABLED: bool = Field(True, env="LLM_HEDGE_ENABLED")
+    LLM_HEDGE_PERCENTILE: float = Field(95.0, env="LLM_HEDGE_PERCENTILE")
+    LLM_HEDGE_INITIAL_DELAY: float = Field(30.0, env="LLM_HEDGE_INITIAL_DELAY")
+    LLM_HEDGE_MIN_DELAY: float = Field(2.0, env="LLM_HEDGE_MIN_DELAY")
+    LLM_HEDGE_MAX_DELAY: float = Field(120.0, env="LLM_HEDGE_MAX_DELAY")
+    LLM_HEDGE_MIN_SAMPLES: int = Field(10, env="LLM_HEDGE_MIN_SAMPLES")
+    LLM_HEDGE_WINDOW: int = Field(100, env="LLM_HEDGE_WINDOW")
+    LLM_BREAKER_WINDOW: int = Field(20, env="LLM_BREAKER_WINDOW")
+    LLM_BREAKER_MIN_CALLS: int = Field(5, env="LLM_BREAKER_MIN_CALLS")
+    LLM_BREAKER_ERROR_RATE: float = Field(0.5, env="LLM_BREAKER_ERROR_RATE")
+    LLM_BREAKER_SLOW_CALL_SECONDS: float = Field(90.0, env="LLM_BREAKER_SLOW_CALL_SECONDS")
+    LLM_BREAKER_SLOW_RATE: float = Field(0.8, env="LLM_BREAKER_SLOW_RATE")
+    LLM_BREAKER_OPEN_SECONDS: float = Field(60.0, env="LLM_BREAKER_OPEN_SECONDS")
+    LLM_PROMPT_TOKEN_BUDGET: int = Field(96000, env="LLM_PROMPT_TOKEN_BUDGET")
+    REVISION_MODE: str = Field("patch", env="REVISION_MODE")  # "patch" or "full"
+    REVISION_REHYDRATE_TIMEOUT: float = Field(60.0, env="REVISION_REHYDRATE_TIMEOUT")
+    LLM_CACHE_ENABLED: bool = Field(True, env="LLM_CACHE_ENABLED")
+    LLM_CACHE_DIR: str = Field("data/llm_cache", env="LLM_CACHE_DIR")
+    LLM_CACHE_TTL_SECONDS: int = Field(86400, env="LLM_CACHE_TTL_SECONDS")
+    LLM_CACHE_MAX_ENTRIES: int = Field(500, env="LLM_CACHE_MAX_ENTRIES")
+    LLM_CACHE_MAX_BYTES: int = Field(256 * 1024 * 1024, env="LLM_CACHE_MAX_BYTES")
+    OUTBOX_DB_PATH: str = Field("data/outbox.db", env="OUTBOX_DB_PATH")
+    OUTBOX_WORKERS: int = Field(8, env="OUTBOX_WORKERS")
+    OUTBOX_PER_HOST_LIMIT: int = Field(2, env="OUTBOX_PER_HOST_LIMIT")
+    OUTBOX_MAX_ATTEMPTS: int = Field(9, env="OUTBOX_MAX_ATTEMPTS")
+    OUTBOX_BASE_DELAY: float = Field(1.0, env="OUTBOX_BASE_DELAY")
+    OUTBOX_MAX_DELAY: float = Field(300.0, env="OUTBOX_MAX_DELAY")
+    ATTACHMENT_MAX_BYTES: int = Field(20 * 1024 * 1024, env="ATTACHMENT_MAX_BYTES")
+    ATTACHMENT_MAX_TOTAL_BYTES: int = Field(50 * 1024 * 1024, env="ATTACHMENT_MAX_TOTAL_BYTES")
     class Config:
         env_file = ".env"
         env_file_encoding = "utf-8"
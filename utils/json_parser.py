@@ -1,3 +1,4 @@
+import re
 import json
 import logging
 
@@ -29,15 +30,26 @@ def parse_aipipe_response(raw_response: str) -> dict:
     for item in data.get("output", []):
         for block in item.get("content", []):
             if "text" in block:
-                text = block["text"]
-                # Try to extract a JSON code block if present
-                if text.strip().startswith("```json"):
-                    import re
-                    match = re.search(r"```json\s*(\{.*\})\s*```", text, re.DOTALL)
-                    if match:
-                        try:
-                            return json.loads(match.group(1))
-                        except json.JSONDecodeError:
-                            logger.warning("⚠️ Inner code block was not valid JSON.")
-                return {"assistant_text": text}
+                return parse_assistant_text(block["text"])
     return {}
+
+
+def parse_assistant_text(text: str) -> dict:
+    """
+    Extract the files JSON from the assistant's output text.
+
+    Args:
+        text (str): Assistant message text, possibly wrapped in a ```json fence
+
+    Returns:
+        dict: Parsed JSON block, or {"assistant_text": text} if none was found
+    """
+    # Try to extract a JSON code block if present
+    if text.strip().startswith("```json"):
+        match = re.search(r"```json\s*(\{.*\})\s*```", text, re.DOTALL)
+        if match:
+            try:
+                return json.loads(match.group(1))
+            except json.JSONDecodeError:
+                logger.warning("⚠️ Inner code block was not valid JSON.")
+    return {"assistant_text": text}
@@ -0,0 +1,120 @@
+import re
+import logging
+from dataclasses import dataclass
+from difflib import SequenceMatcher
+from typing import List, Optional, Tuple
+
+logger = logging.getLogger("llm_agent.utils.patcher")
+
+_BLOCK = re.compile(
+    r"^<{5,9} ?SEARCH[^\n]*\n(.*?)^={5,9}[ \t]*\n(.*?)^>{5,9} ?REPLACE[^\n]*$",
+    re.DOTALL | re.MULTILINE,
+)
+_SEARCH_MARKER = re.compile(r"^[ \t]*<{5,9} ?SEARCH", re.MULTILINE)
+_ANY_MARKER = re.compile(r"^[ \t]*(<{5,9} ?SEARCH|>{5,9} ?REPLACE)", re.MULTILINE)
+
+# Minimum similarity for a fuzzy (near-miss) SEARCH match
+FUZZY_THRESHOLD = 0.9
+
+
+class PatchError(Exception):
+    """Raised when an edit cannot be located in the file it targets."""
+
+
+@dataclass
+class Edit:
+    search: str
+    replace: str
+
+
+def parse_edits(text: str) -> Optional[List[Edit]]:
+    """
+    Parse SEARCH/REPLACE blocks from a model response for one file.
+    Returns None if `text` has no markers at all (i.e. it is a full file body).
+    Raises PatchError if markers are present but do not form complete blocks
+    (e.g. a truncated response), so the raw edit text is never used as content.
+    """
+    if not _ANY_MARKER.search(text):
+        return None
+    text = text.replace("\r\n", "\n")
+    edits = [Edit(m.group(1), m.group(2)) for m in _BLOCK.finditer(text)]
+    expected = len(_SEARCH_MARKER.findall(text))
+    if not edits or len(edits) != expected:
+        raise PatchError(f"Malformed SEARCH/REPLACE blocks ({len(edits)} of {max(expected, 1)} parsed)")
+    return edits
+
+
+def _line_spans(text: str) -> List[Tuple[int, int]]:
+    """(start, end) character offsets of each line, including its newline."""
+    spans, pos = [], 0
+    for line in text.splitlines(keepends=True):
+        spans.append((pos, pos + len(line)))
+        pos += len(line)
+    return spans
+
+
+def _locate(content: str, search: str) -> Tuple[int, int]:
+    """
+    Find `search` in `content` and return its character span. Tries an exact
+    match, then a whitespace-insensitive line match, then the most similar
+    window of lines above FUZZY_THRESHOLD.
+    """
+    if not search.strip():
+        raise PatchError("Empty SEARCH block")
+
+    count = content.count(search)
+    if count == 1:
+        start = content.index(search)
+        return start, start + len(search)
+    if count > 1:
+        raise PatchError(f"SEARCH block matches {count} places")
+
+    lines = content.splitlines(keepends=True)
+    spans = _line_spans(content)
+    wanted = [line.strip() for line in search.splitlines() if line.strip()]
+    if not wanted:
+        raise PatchError("Empty SEARCH block")
+
+    # Whitespace-insensitive: compare stripped lines, ignoring blank ones
+    stripped = [(i, line.strip()) for i, line in enumerate(lines) if line.strip()]
+    keys = [text for _, text in stripped]
+    matches = [
+        i for i in range(len(keys) - len(wanted) + 1)
+        if keys[i:i + len(wanted)] == wanted
+    ]
+    if len(matches) == 1:
+        first = stripped[matches[0]][0]
+        last = stripped[matches[0] + len(wanted) - 1][0]
+        return spans[first][0], spans[last][1]
+    if len(matches) > 1:
+        raise PatchError(f"SEARCH block matches {len(matches)} places (ignoring whitespace)")
+
+    # Fuzzy: best window of the same number of non-blank lines
+    target = "\n".join(wanted)
+    best_ratio, best_index = 0.0, None
+    for i in range(len(keys) - len(wanted) + 1):
+        ratio = SequenceMatcher(None, "\n".join(keys[i:i + len(wanted)]), target).ratio()
+        if ratio > best_ratio:
+            best_ratio, best_index = ratio, i
+    if best_index is None or best_ratio < FUZZY_THRESHOLD:
+        raise PatchError(f"SEARCH block not found (best similarity {best_ratio:.2f})")
+
+    first = stripped[best_index][0]
+    last = stripped[best_index + len(wanted) - 1][0]
+    logger.debug(f"Fuzzy-matched SEARCH block at line {first + 1} (similarity {best_ratio:.2f})")
+    return spans[first][0], spans[last][1]
+
+
+def apply_edits(content: str, edits: List[Edit]) -> str:
+    """
+    Apply SEARCH/REPLACE edits in order. Raises PatchError if any edit cannot
+    be placed; the original content is then left untouched by the caller.
+    """
+    for edit in edits:
+        start, end = _locate(content, edit.search)
+        replace = edit.replace
+        # Keep the line structure when the matched span ends with a newline
+        if content[start:end].endswith("\n") and replace and not replace.endswith("\n"):
+            replace += "\n"
+        content = content[:start] + replace + content[end:]
+    return content
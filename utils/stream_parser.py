@@ -0,0 +1,151 @@
+import json
+import logging
+from typing import List, Tuple
+
+logger = logging.getLogger("llm_agent.utils.stream_parser")
+
+# LLMs occasionally emit raw newlines inside JSON strings; accept them
+_decoder = json.JSONDecoder(strict=False)
+
+# Parser states
+_SEEK_OBJECT = 0
+_SEEK_KEY = 1
+_IN_KEY = 2
+_SEEK_COLON = 3
+_SEEK_VALUE = 4
+_IN_STRING = 5
+_IN_RAW = 6
+_AFTER_VALUE = 7
+_DONE = 8
+
+
+class IncrementalFileParser:
+    """
+    Incrementally parses a streamed `{"filename": "content", ...}` JSON object.
+
+    Feed it text chunks as they arrive; `feed()` returns every (filename, content)
+    pair whose value has been fully received. Anything before the first `{`
+    (e.g. a ```json fence) and after the closing `}` is ignored. Non-string
+    values are captured raw and re-serialized as JSON text.
+    """
+
+    def __init__(self):
+        self.state = _SEEK_OBJECT
+        self.text: List[str] = []        # full text seen so far, for non-streaming fallback parsing
+        self._token: List[str] = []      # raw characters of the current key/value
+        self._escape = False
+        self._depth = 0
+        self._raw_in_string = False
+        self._key = ""
+        self.files_emitted = 0
+
+    @property
+    def done(self) -> bool:
+        return self.state == _DONE
+
+    @property
+    def full_text(self) -> str:
+        return "".join(self.text)
+
+    def feed(self, chunk: str) -> List[Tuple[str, str]]:
+        self.text.append(chunk)
+        completed: List[Tuple[str, str]] = []
+        for ch in chunk:
+            state = self.state
+            if state == _DONE:
+                break
+            if state == _SEEK_OBJECT:
+                if ch == "{":
+                    self.state = _SEEK_KEY
+            elif state == _SEEK_KEY:
+                if ch == '"':
+                    self._token = []
+                    self.state = _IN_KEY
+                elif ch == "}":
+                    self.state = _DONE
+            elif state in (_IN_KEY, _IN_STRING):
+                if self._escape:
+                    self._token.append(ch)
+                    self._escape = False
+                elif ch == "\\":
+                    self._token.append(ch)
+                    self._escape = True
+                elif ch == '"':
+                    value = self._decode_string("".join(self._token))
+                    if state == _IN_KEY:
+                        self._key = value
+                        self.state = _SEEK_COLON
+                    else:
+                        completed.append((self._key, value))
+                        self.state = _AFTER_VALUE
+                else:
+                    self._token.append(ch)
+            elif state == _SEEK_COLON:
+                if ch == ":":
+                    self.state = _SEEK_VALUE
+            elif state == _SEEK_VALUE:
+                if ch == '"':
+                    self._token = []
+                    self.state = _IN_STRING
+                elif not ch.isspace():
+                    self._token = [ch]
+                    self._depth = 1 if ch in "{[" else 0
+                    self._raw_in_string = False
+                    self.state = _IN_RAW
+            elif state == _IN_RAW:
+                pair = self._feed_raw(ch)
+                if pair is not None:
+                    completed.append(pair)
+                    if self.state == _DONE:
+                        break
+            elif state == _AFTER_VALUE:
+                if ch == ",":
+                    self.state = _SEEK_KEY
+                elif ch == "}":
+                    self.state = _DONE
+
+        self.files_emitted += len(completed)
+        return completed
+
+    def _feed_raw(self, ch: str):
+        """Accumulate a non-string value (object, array, number, literal)."""
+        if self._depth == 0:
+            # scalar: ends at the next delimiter
+            if ch in ",}" or ch.isspace():
+                pair = (self._key, "".join(self._token).strip())
+                self.state = _DONE if ch == "}" else (_SEEK_KEY if ch == "," else _AFTER_VALUE)
+                return pair
+            self._token.append(ch)
+            return None
+
+        self._token.append(ch)
+        if self._raw_in_string:
+            if self._escape:
+                self._escape = False
+            elif ch == "\\":
+                self._escape = True
+            elif ch == '"':
+                self._raw_in_string = False
+            return None
+        if ch == '"':
+            self._raw_in_string = True
+        elif ch in "{[":
+            self._depth += 1
+        elif ch in "}]":
+            self._depth -= 1
+            if self._depth == 0:
+                self.state = _AFTER_VALUE
+                raw = "".join(self._token)
+                try:
+                    return (self._key, json.dumps(_decoder.decode(raw), ensure_ascii=False))
+                except json.JSONDecodeError:
+                    return (self._key, raw)
+        return None
+
+    @staticmethod
+    def _decode_string(raw: str) -> str:
+        try:
+            return _decoder.decode(f'"{raw}"')
+        except json.JSONDecodeError:
+            logger.warning("⚠️ Could not decode streamed JSON string; using raw text")
+            return raw
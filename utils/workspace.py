@@ -0,0 +1,151 @@
+import os
+import time
+import asyncio
+import logging
+import tempfile
+from pathlib import Path
+from typing import Awaitable, Dict, List, Optional, Set, Union
+
+from utils.metrics import time_stage
+
+logger = logging.getLogger("llm_agent.utils.workspace")
+
+
+def resolve_workspace_path(root: Path, filename: str) -> Path:
+    """
+    Resolve `filename` inside `root`, rejecting absolute paths and `..` escapes.
+    """
+    root = Path(root).resolve()
+    path = (root / filename).resolve()
+    if path != root and root not in path.parents:
+        raise ValueError(f"Refusing to write outside workspace: {filename}")
+    return path
+
+
+def write_workspace_file(root: Path, filename: str, content: Union[str, bytes]) -> Path:
+    """
+    Atomically write a file into the workspace (temp file + rename).
+
+    Replacing rather than truncating means readers never see a half-written file
+    and any hardlink previously at that path is left untouched.
+    """
+    path = resolve_workspace_path(root, filename)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    data = content.encode("utf-8") if isinstance(content, str) else content
+
+    fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)
+    except BaseException:
+        Path(tmp).unlink(missing_ok=True)
+        raise
+    return path
+
+
+def write_workspace_files(root: Path, files: Dict[str, bytes]) -> List[Path]:
+    """Write several files into the workspace with `write_workspace_file`."""
+    return [write_workspace_file(root, filename, content) for filename, content in files.items()]
+
+
+async def write_workspace_file_async(root: Path, filename: str, content: Union[str, bytes]) -> Path:
+    """`write_workspace_file` run off the event loop."""
+    return await asyncio.to_thread(write_workspace_file, root, filename, content)
+
+
+# Workspace writes still in flight, per workspace directory
+_pending_writes: Dict[Path, Set[asyncio.Task]] = {}
+
+
+def write_in_background(root: Path, work: Awaitable) -> asyncio.Task:
+    """
+    Run a workspace update off the critical path, after any earlier ones for
+    the same root. Failures are logged, not raised: the workspace is a cache.
+    """
+    key = Path(root).resolve()
+    previous = list(_pending_writes.get(key, ()))
+
+    async def run():
+        # Writes to the same workspace apply in submission order
+        if previous:
+            await asyncio.gather(*previous, return_exceptions=True)
+        with time_stage("workspace_write"):
+            return await work
+
+    task = asyncio.ensure_future(run())
+    _pending_writes.setdefault(key, set()).add(task)
+
+    def _done(t: asyncio.Task) -> None:
+        pending = _pending_writes.get(key)
+        if pending is not None:
+            pending.discard(t)
+            if not pending:
+                del _pending_writes[key]
+        if not t.cancelled() and t.exception() is not None:
+            logger.warning(f"Background workspace write failed for {key}: {t.exception()!r}")
+
+    task.add_done_callback(_done)
+    return task
+
+
+async def wait_for_workspace(root: Path) -> None:
+    """Wait for background writes to `root` to finish before reading it."""
+    pending = _pending_writes.get(Path(root).resolve())
+    if pending:
+        await asyncio.gather(*list(pending), return_exceptions=True)
+
+
+async def drain_background_writes() -> None:
+    """Wait for every background workspace write (used at shutdown)."""
+    tasks = [t for pending in _pending_writes.values() for t in pending]
+    if tasks:
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+
+class StreamingWorkspaceWriter:
+    """
+    Materializes generated files into a workspace as they arrive from the LLM.
+
+    `on_file` is passed to LLMService as the per-file callback for live streams.
+    `finalize` then reconciles the workspace with the authoritative final file
+    dict: files that were never streamed (cached, non-streamed or hedged
+    responses, or ones changed afterwards, e.g. a fallback README) are
+    written, and files this writer created that are missing from the final
+    result (e.g. from a provider that failed mid-stream) are removed.
+    """
+
+    def __init__(self, root: Path):
+        self.root = Path(root)
+        self.written: Dict[str, str] = {}
+        self.created: set = set()
+        self.started_at = time.perf_counter()
+        self.first_file_at: Optional[float] = None
+
+    @property
+    def time_to_first_file(self) -> Optional[float]:
+        """Seconds from generation start to the first file landing on disk."""
+        if self.first_file_at is None:
+            return None
+        return round(self.first_file_at - self.started_at, 3)
+
+    async def on_file(self, filename: str, content: str) -> None:
+        if self.written.get(filename) == content:
+            return
+        if filename not in self.written and not resolve_workspace_path(self.root, filename).exists():
+            self.created.add(filename)
+        await write_workspace_file_async(self.root, filename, content)
+        self.written[filename] = content
+        if self.first_file_at is None:
+            self.first_file_at = time.perf_counter()
+            logger.info(f"⚡ First file ready in {self.time_to_first_file}s: {filename}")
+        logger.debug(f"Saved generated file: {self.root / filename}")
+
+    async def finalize(self, files: Dict[str, str]) -> List[str]:
+        for filename, content in files.items():
+            await self.on_file(filename, content)
+        for stray in (self.created & set(self.written)) - set(files):
+            resolve_workspace_path(self.root, stray).unlink(missing_ok=True)
+            del self.written[stray]
+            logger.debug(f"Removed stray streamed file: {stray}")
+        return [str(self.root / filename) for filename in files]